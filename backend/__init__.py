@@ -0,0 +1,6 @@
+"""
+Backend package for GTK4 Installer
+
+System-facing logic (catalogs, hardware and networking) used by the pages.
+Modules here do not create widgets and are imported directly by path.
+"""
@@ -0,0 +1,117 @@
+"""
+Merging scanned access points into the networks the Wi-Fi page lists
+
+A scan reports every BSSID separately, so one office network shows up
+once per access point and band. NetworkAggregator folds each scan into one
+Network per SSID and security, smooths every BSSID's signal strength with
+an exponential moving average so rows do not twitch between scans, keeps a
+BSSID for a few scans after it was last seen, and returns only the
+networks whose row would visibly change. Keys sort the way the list is
+shown, so the page can bisect them into a sorted model and update rows in
+place.
+"""
+
+from collections import namedtuple
+
+# Weight of each new strength sample
+SMOOTHING = 0.4
+# Scans a BSSID may be missing from before it is dropped; single scans in a
+# crowded room often miss a few access points
+MISSED_SCANS = 2
+# Smallest strength change worth redrawing a row for
+STRENGTH_STEP = 3
+
+# strength is the smoothed 0-100 strength of the best BSSID, path its
+# NetworkManager object path; bands are labels such as "2.4 GHz"
+Network = namedtuple("Network", "ssid security strength bands path")
+
+def network_key(ssid, security):
+    """Sort key identifying a network: by name, case-insensitively"""
+    return (ssid.casefold(), ssid, security)
+
+def band_of(frequency):
+    """Band label for a frequency in MHz"""
+    if frequency >= 5925:
+        return "6 GHz"
+    if frequency >= 4900:
+        return "5 GHz"
+    if frequency:
+        return "2.4 GHz"
+    return None
+
+class Sighting:
+    """One BSSID: its latest scan entry and smoothed strength"""
+    def __init__(self, key, access_point):
+        self.key = key
+        self.access_point = access_point
+        self.strength = float(access_point.strength)
+        self.missed = 0
+
+    def update(self, access_point, smoothing):
+        self.access_point = access_point
+        self.strength += smoothing * (access_point.strength - self.strength)
+        self.missed = 0
+
+class NetworkAggregator:
+    def __init__(self, smoothing=SMOOTHING, missed_scans=MISSED_SCANS,
+                 strength_step=STRENGTH_STEP):
+        self.smoothing = smoothing
+        self.missed_scans = missed_scans
+        self.strength_step = strength_step
+        # BSSID -> Sighting
+        self.sightings = {}
+        # key -> Network as last returned
+        self.networks = {}
+
+    def update(self, access_points):
+        """Fold in one scan; return {key: Network or None} for changed networks"""
+        seen = set()
+        for access_point in access_points:
+            bssid = access_point.bssid or access_point.path
+            seen.add(bssid)
+            key = network_key(access_point.ssid, access_point.security)
+            sighting = self.sightings.get(bssid)
+            if sighting is None or sighting.key != key:
+                self.sightings[bssid] = Sighting(key, access_point)
+            else:
+                sighting.update(access_point, self.smoothing)
+        for bssid, sighting in list(self.sightings.items()):
+            if bssid not in seen:
+                sighting.missed += 1
+                if sighting.missed > self.missed_scans:
+                    del self.sightings[bssid]
+
+        grouped = {}
+        for sighting in self.sightings.values():
+            grouped.setdefault(sighting.key, []).append(sighting)
+        networks = {}
+        changes = {key: None for key in self.networks if key not in grouped}
+        for key, sightings in grouped.items():
+            network = self.merge(sightings)
+            previous = self.networks.get(key)
+            if previous is not None:
+                if abs(network.strength - previous.strength) < self.strength_step:
+                    network = network._replace(strength=previous.strength)
+                if network == previous:
+                    networks[key] = previous
+                    continue
+            networks[key] = network
+            changes[key] = network
+        self.networks = networks
+        return changes
+
+    def merge(self, sightings):
+        """One Network from the sightings of its BSSIDs"""
+        # Prefer BSSIDs in the latest scan; a missing one may be gone
+        best = max(sightings, key=lambda sighting: (not sighting.missed, sighting.strength))
+        bands = {band_of(sighting.access_point.frequency) for sighting in sightings}
+        bands.discard(None)
+        return Network(best.access_point.ssid, best.access_point.security,
+                       round(best.strength), tuple(sorted(bands)), best.access_point.path)
+
+    def reset(self):
+        """Forget every network; return their removals"""
+        changes = dict.fromkeys(self.networks)
+        self.sightings = {}
+        self.networks = {}
+        return changes
@@ -0,0 +1,53 @@
+"""
+On-disk cache for parsed system catalogs
+
+Entries are JSON files under $XDG_CACHE_HOME/zenos, each stored with a key
+(usually describing the source file) and discarded when the key changes.
+"""
+
+import json
+import os
+
+CACHE_VERSION = 1
+
+def cache_dir():
+    """Directory for cached build artifacts"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "zenos")
+
+def source_key(*paths):
+    """Cache key describing source files by path, size and mtime"""
+    key = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            key.append([path, st.st_size, st.st_mtime_ns])
+        except OSError:
+            key.append([path, None, None])
+    return key
+
+def load(name, key):
+    """Return the data cached under name if it was stored with key"""
+    path = os.path.join(cache_dir(), f"{name}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("version") != CACHE_VERSION or entry.get("key") != key:
+        return None
+    return entry.get("data")
+
+def store(name, key, data):
+    """Cache data under name; failures are reported but not fatal"""
+    directory = cache_dir()
+    path = os.path.join(directory, f"{name}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "key": key, "data": data},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write cache {path}: {e}")
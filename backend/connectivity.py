@@ -0,0 +1,171 @@
+"""
+Mirror reachability for fetching updates during installation
+
+check_mirrors() decides quickly whether the installer can download
+anything, and from where. Without a default route in /proc/net/route (or
+/proc/net/ipv6_route) it answers offline at once. Otherwise every mirror
+is probed concurrently on an asyncio loop: a timed TCP connect (with the
+TLS handshake for https), then a HEAD request for the mirror's URL timed
+to the status line. Probes still running at the deadline are abandoned,
+so the answer never takes longer than the deadline however many mirrors
+are down or slow to resolve. Mirrors that answered are ranked fastest
+first; the page keeps the ranking in the installer state for the install
+step.
+
+Mirrors are listed one URL per line in MIRRORS_FILE, or space-separated
+in ZENOS_MIRRORS.
+"""
+
+import asyncio
+import os
+import ssl
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .disks import PROCFS_ROOT
+
+MIRRORS_ENV_VAR = "ZENOS_MIRRORS"
+MIRRORS_FILE = "/etc/zenos/mirrors"
+
+# Seconds for the whole check, whatever the number of mirrors
+DEADLINE = 3.0
+# Longest status line or header block read from a mirror
+MAX_RESPONSE_BYTES = 16 * 1024
+USER_AGENT = "zenos-installer"
+
+# connect_time and response_time in seconds (None if not reached); status
+# is the HTTP status, error a message for mirrors that did not answer
+MirrorProbe = namedtuple("MirrorProbe", "url connect_time response_time status error")
+# mirrors: URLs of the reachable mirrors, fastest first
+MirrorRanking = namedtuple("MirrorRanking", "online mirrors probes reason")
+
+class ProbeError(Exception):
+    """A mirror answered with something other than HTTP"""
+
+def read_mirrors(path=MIRRORS_FILE):
+    """Configured mirror URLs"""
+    override = os.environ.get(MIRRORS_ENV_VAR)
+    if override is not None:
+        return override.split()
+    try:
+        with open(path) as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+def has_default_route(procfs_root=PROCFS_ROOT):
+    """Whether the kernel has a default route, IPv4 or IPv6"""
+    try:
+        with open(os.path.join(procfs_root, "net", "route")) as f:
+            next(f, None)  # Header
+            for line in f:
+                fields = line.split()
+                # Iface Destination Gateway Flags ...; Flags bit 0 is RTF_UP
+                if len(fields) > 7 and fields[1] == "00000000" and fields[7] == "00000000" \
+                        and int(fields[3], 16) & 1:
+                    return True
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(procfs_root, "net", "ipv6_route")) as f:
+            for line in f:
+                fields = line.split()
+                # Destination, prefix length, ..., device; skip the loopback
+                # catch-all unreachable route
+                if len(fields) > 9 and fields[0] == "0" * 32 and fields[1] == "00" \
+                        and fields[9] != "lo":
+                    return True
+    except OSError:
+        pass
+    return False
+
+def rank(probes):
+    """URLs of the mirrors that answered, fastest first"""
+    answered = [probe for probe in probes if probe.error is None]
+    answered.sort(key=lambda probe: probe.connect_time + probe.response_time)
+    return [probe.url for probe in answered]
+
+async def probe_mirror(url, ssl_context=None):
+    """Time a connect and a HEAD request to url"""
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    if secure and ssl_context is None:
+        ssl_context = ssl.create_default_context()
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    reader, writer = await asyncio.open_connection(parts.hostname, port,
+                                                   ssl=ssl_context if secure else None,
+                                                   limit=MAX_RESPONSE_BYTES)
+    try:
+        connected = loop.time()
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        writer.write(f"HEAD {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                     f"Connection: close\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        status_line = await reader.readline()
+        responded = loop.time()
+        fields = status_line.split()
+        if len(fields) < 2 or not fields[0].startswith(b"HTTP/") or not fields[1].isdigit():
+            raise ProbeError(f"not an HTTP answer: {status_line[:40]!r}")
+        return MirrorProbe(url, connected - start, responded - connected, int(fields[1]), None)
+    finally:
+        writer.close()
+
+async def probe_all(urls, deadline, ssl_context=None):
+    """Probe every URL concurrently; return a MirrorProbe per URL in order"""
+    tasks = [asyncio.ensure_future(probe_mirror(url, ssl_context)) for url in urls]
+    if tasks:
+        await asyncio.wait(tasks, timeout=deadline)
+    probes = []
+    for url, task in zip(urls, tasks):
+        if not task.done():
+            task.cancel()
+            probes.append(MirrorProbe(url, None, None, None, "Timed out"))
+        elif task.exception() is not None:
+            error = task.exception()
+            probes.append(MirrorProbe(url, None, None, None, str(error) or type(error).__name__))
+        else:
+            probe = task.result()
+            if probe.status >= 400:
+                probe = probe._replace(error=f"HTTP {probe.status}")
+            probes.append(probe)
+    return probes
+
+def check_mirrors(urls=None, deadline=DEADLINE, procfs_root=PROCFS_ROOT, ssl_context=None):
+    """Probe the mirrors and return a MirrorRanking within deadline seconds"""
+    if urls is None:
+        urls = read_mirrors()
+    if not urls:
+        return MirrorRanking(False, [], [], "No mirrors are configured")
+    if not has_default_route(procfs_root):
+        return MirrorRanking(False, [], [], "No network route")
+
+    # Not asyncio.run(): it would wait for name lookups still running in
+    # the default executor after the deadline
+    loop = asyncio.new_event_loop()
+    try:
+        probes = loop.run_until_complete(probe_all(urls, deadline, ssl_context))
+        # Let cancelled probes unwind and close their connections
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    finally:
+        loop.close()
+
+    mirrors = rank(probes)
+    if not mirrors:
+        return MirrorRanking(False, [], probes, "No mirror answered")
+    return MirrorRanking(True, mirrors, probes, "")
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="connectivity")
+
+def submit_check(urls=None, deadline=DEADLINE, procfs_root=PROCFS_ROOT):
+    """Check the mirrors on a worker thread and return a Future of the MirrorRanking"""
+    return _executor.submit(check_mirrors, urls, deadline, procfs_root)
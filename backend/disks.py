@@ -0,0 +1,196 @@
+"""
+Block device discovery for the disk page
+
+Reads /sys/block and /proc/partitions directly instead of running lsblk
+per device. Only sysfs attributes are read, never the devices themselves,
+so a slow USB stick or an empty optical drive cannot stall the scan.
+The roots can be pointed at a fixture tree (or set through
+ZENOS_SYSFS_ROOT / ZENOS_PROCFS_ROOT) to run without real disks.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+SYSFS_ROOT = os.environ.get("ZENOS_SYSFS_ROOT", "/sys")
+PROCFS_ROOT = os.environ.get("ZENOS_PROCFS_ROOT", "/proc")
+
+# /sys/block/*/size and partition start/size are always in 512-byte units
+SECTOR_SIZE = 512
+
+Queue = namedtuple("Queue", "logical_block_size physical_block_size minimum_io_size "
+                            "optimal_io_size discard_granularity write_zeroes_max_bytes")
+Partition = namedtuple("Partition", "name path number start size")
+Disk = namedtuple("Disk", "name path size model vendor serial transport rotational "
+                          "removable read_only queue partitions")
+
+def read_attribute(path, default=""):
+    """Return a stripped sysfs attribute, or default if it cannot be read"""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+def read_int(path, default=0):
+    """Return an integer sysfs attribute, or default"""
+    try:
+        return int(read_attribute(path))
+    except ValueError:
+        return default
+
+def read_proc_partitions(procfs_root=PROCFS_ROOT):
+    """Return {name: size in bytes} from /proc/partitions"""
+    sizes = {}
+    try:
+        with open(os.path.join(procfs_root, "partitions"), encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 4 and fields[2].isdigit():
+                    sizes[fields[3]] = int(fields[2]) * 1024
+    except OSError:
+        pass
+    return sizes
+
+def read_queue(device_dir):
+    """Return the request queue limits of a disk"""
+    queue_dir = os.path.join(device_dir, "queue")
+    return Queue(*(read_int(os.path.join(queue_dir, field)) for field in Queue._fields))
+
+def read_device_queue(device_number, sysfs_root=SYSFS_ROOT):
+    """Return the queue limits for a device node's st_rdev (disk or partition)"""
+    device_dir = os.path.join(sysfs_root, "dev", "block",
+                              f"{os.major(device_number)}:{os.minor(device_number)}")
+    if os.path.exists(os.path.join(device_dir, "partition")):
+        # Partitions share their disk's queue
+        device_dir = os.path.dirname(os.path.realpath(device_dir))
+    return read_queue(device_dir)
+
+def detect_transport(device_dir):
+    """Guess how a disk is attached from its resolved sysfs device path"""
+    resolved = os.path.realpath(device_dir)
+    for marker, transport in (("/usb", "usb"), ("/nvme", "nvme"), ("/mmc_host", "mmc"),
+                              ("/virtio", "virtio"), ("/ata", "sata")):
+        if marker in resolved:
+            return transport
+    return ""
+
+def is_virtual(device_dir):
+    """Loop, zram, device-mapper and other software block devices"""
+    return "/devices/virtual/" in os.path.realpath(device_dir)
+
+def read_partitions(name, device_dir, proc_sizes):
+    """Return the partitions of a disk, ordered by start sector"""
+    partitions = []
+    try:
+        entries = list(os.scandir(device_dir))
+    except OSError:
+        return partitions
+    for entry in entries:
+        if not entry.name.startswith(name):
+            continue
+        number = read_int(os.path.join(entry.path, "partition"), None)
+        if number is None:
+            continue
+        start = read_int(os.path.join(entry.path, "start")) * SECTOR_SIZE
+        size = proc_sizes.get(entry.name)
+        if size is None:
+            size = read_int(os.path.join(entry.path, "size")) * SECTOR_SIZE
+        partitions.append(Partition(entry.name, f"/dev/{entry.name}", number, start, size))
+    partitions.sort(key=lambda partition: partition.start)
+    return partitions
+
+def read_disk(name, sysfs_root=SYSFS_ROOT, proc_sizes=None):
+    """Return the Disk record for one /sys/block entry"""
+    if proc_sizes is None:
+        proc_sizes = {}
+    device_dir = os.path.join(sysfs_root, "block", name)
+    hardware_dir = os.path.join(device_dir, "device")
+    model = read_attribute(os.path.join(hardware_dir, "model"))
+    vendor = read_attribute(os.path.join(hardware_dir, "vendor"))
+    return Disk(
+        name=name,
+        path=f"/dev/{name}",
+        size=read_int(os.path.join(device_dir, "size")) * SECTOR_SIZE,
+        model=model,
+        vendor=vendor,
+        serial=read_attribute(os.path.join(hardware_dir, "serial")),
+        transport=detect_transport(device_dir),
+        rotational=read_attribute(os.path.join(device_dir, "queue", "rotational")) == "1",
+        removable=read_attribute(os.path.join(device_dir, "removable")) == "1",
+        read_only=read_attribute(os.path.join(device_dir, "ro")) == "1",
+        queue=read_queue(device_dir),
+        partitions=read_partitions(name, device_dir, proc_sizes),
+    )
+
+def is_installable(disk):
+    """Whether the installer may offer a disk as a target"""
+    return disk.size > 0 and not disk.read_only and not disk.name.startswith("sr")
+
+def scan_disks(sysfs_root=SYSFS_ROOT, procfs_root=PROCFS_ROOT, include_all=False):
+    """Return the installable disks sorted by name"""
+    block_dir = os.path.join(sysfs_root, "block")
+    try:
+        names = sorted(entry.name for entry in os.scandir(block_dir))
+    except OSError as e:
+        print(f"Warning: Could not list block devices in {block_dir}: {e}")
+        return []
+    proc_sizes = read_proc_partitions(procfs_root)
+    disks = []
+    for name in names:
+        if not include_all and is_virtual(os.path.join(block_dir, name)):
+            continue
+        disk = read_disk(name, sysfs_root, proc_sizes)
+        if include_all or is_installable(disk):
+            disks.append(disk)
+    return disks
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disks")
+
+def submit_scan(sysfs_root=SYSFS_ROOT, procfs_root=PROCFS_ROOT):
+    """Scan on the disk worker thread and return a Future of the disk list"""
+    return _executor.submit(scan_disks, sysfs_root, procfs_root)
+
+def read_installable(names, sysfs_root=SYSFS_ROOT, procfs_root=PROCFS_ROOT):
+    """Return {name: Disk, or None if it is gone or not installable}"""
+    proc_sizes = read_proc_partitions(procfs_root)
+    disks = {}
+    for name in names:
+        device_dir = os.path.join(sysfs_root, "block", name)
+        disk = None
+        if os.path.isdir(device_dir) and not is_virtual(device_dir):
+            disk = read_disk(name, sysfs_root, proc_sizes)
+            if not is_installable(disk):
+                disk = None
+        disks[name] = disk
+    return disks
+
+def submit_read(names, sysfs_root=SYSFS_ROOT, procfs_root=PROCFS_ROOT):
+    """Re-read some disks on the worker thread; Future of read_installable()"""
+    return _executor.submit(read_installable, list(names), sysfs_root, procfs_root)
+
+def format_size(size):
+    """Format bytes in the decimal units disks are sold in, e.g. '500 GB'"""
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1000 or unit == "TB":
+            break
+        size /= 1000
+    return f"{size:.0f} {unit}" if size >= 10 or unit == "B" else f"{size:.1f} {unit}"
+
+def describe_kind(disk):
+    """Short human description of the disk type, e.g. 'NVMe SSD'"""
+    if disk.transport == "usb":
+        return "USB drive"
+    if disk.transport == "mmc":
+        return "SD card"
+    if disk.transport == "nvme":
+        return "NVMe SSD"
+    if disk.transport == "virtio":
+        return "Virtual disk"
+    return "HDD" if disk.rotational else "SSD"
+
+def describe_model(disk):
+    """Vendor and model, or a placeholder when the device reports neither"""
+    # SATA disks report the bus as vendor, virtio and some NVMe devices a PCI ID
+    vendor = "" if disk.vendor == "ATA" or disk.vendor.startswith("0x") else disk.vendor
+    return " ".join(part for part in (vendor, disk.model) if part) or "Unknown model"
@@ -0,0 +1,229 @@
+"""
+Parallel file-tree copy for installs from a root directory
+
+copy_tree() walks the source root (e.g. the live system's mounted
+squashfs) on the calling thread, creating directories as it goes, and
+hands regular files, symlinks and device nodes to a thread pool in
+batches. File data moves with os.copy_file_range, falling back to
+os.sendfile where the kernel or filesystem cannot do it. Ownership, mode,
+xattrs and timestamps are applied through the descriptors already open
+for the copy, hardlinks are recreated from an inode map once their first
+name exists, and directory metadata is applied last, deepest first, so
+creating entries does not disturb it. Like `cp -ax`, the walk stays on the
+source root's filesystem.
+"""
+
+import errno
+import os
+import stat
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .progress import ProgressChannel
+
+WORKERS = 8
+# Small files are grouped into one task per batch to keep pool and
+# progress-lock overhead per file low
+BATCH_FILES = 64
+BATCH_BYTES = 8 * 1024 * 1024
+# Batches queued per worker before the walk waits for the pool
+QUEUED_BATCHES_PER_WORKER = 4
+
+# errnos after which copy_file_range is given up for sendfile
+COPY_FILE_RANGE_UNSUPPORTED = (errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL)
+XATTR_UNSUPPORTED = (errno.ENOTSUP, errno.EOPNOTSUPP, errno.EPERM)
+
+def copy_data(source_fd, target_fd, size, use_copy_file_range=True):
+    """Copy size bytes between descriptors in the kernel; return the bytes copied"""
+    copied = 0
+    if use_copy_file_range and hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                count = os.copy_file_range(source_fd, target_fd, size - copied)
+                if not count:
+                    return copied  # File shrank
+                copied += count
+            return copied
+        except OSError as e:
+            if copied or e.errno not in COPY_FILE_RANGE_UNSUPPORTED:
+                raise
+    while copied < size:
+        count = os.sendfile(target_fd, source_fd, copied, size - copied)
+        if not count:
+            break
+        copied += count
+    return copied
+
+def copy_xattrs(source, target, follow_symlinks=True):
+    """Copy extended attributes between paths or descriptors"""
+    # follow_symlinks may only be passed with paths
+    options = {} if follow_symlinks else {"follow_symlinks": False}
+    try:
+        names = os.listxattr(source, **options)
+    except OSError as e:
+        if e.errno in XATTR_UNSUPPORTED:
+            return
+        raise
+    for name in names:
+        try:
+            os.setxattr(target, name, os.getxattr(source, name, **options), **options)
+        except OSError as e:
+            if e.errno not in XATTR_UNSUPPORTED:
+                raise
+
+class TreeCopier:
+    """One tree copy: the walk, the pool of file copies and the inode map"""
+    def __init__(self, source_root, target_root, channel=None, workers=WORKERS,
+                 use_copy_file_range=True):
+        self.source_root = source_root
+        self.target_root = target_root
+        self.channel = channel or ProgressChannel()
+        self.workers = workers
+        self.use_copy_file_range = use_copy_file_range
+        # Ownership can only be kept when running as root. New entries are
+        # created owned by us (directories are made without setgid until
+        # the end), so chown is only needed when the owner differs
+        self.keep_owner = os.geteuid() == 0
+        self.creator = (os.geteuid(), os.getegid())
+        # (st_dev, st_ino) -> first target path, for files with several links
+        self.inodes = {}
+        self.links = []
+        self.directories = []
+
+    def apply_metadata(self, target, st, follow_symlinks=True):
+        """Set owner, mode and times; target is a descriptor or a path"""
+        options = {} if follow_symlinks else {"follow_symlinks": False}
+        if self.keep_owner and (st.st_uid, st.st_gid) != self.creator:
+            os.chown(target, st.st_uid, st.st_gid, **options)
+        # chown clears setuid bits, so the mode comes after it; Linux
+        # cannot change the mode of a symlink
+        if follow_symlinks:
+            os.chmod(target, stat.S_IMODE(st.st_mode))
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns), **options)
+
+    def copy_file(self, source_path, target_path, st):
+        """Copy a regular file's data and metadata; return the bytes copied"""
+        source_fd = os.open(source_path, os.O_RDONLY | os.O_CLOEXEC | os.O_NOFOLLOW)
+        try:
+            target_fd = os.open(target_path,
+                                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC | os.O_NOFOLLOW,
+                                0o600)
+            try:
+                copied = 0
+                if st.st_size:
+                    copied = copy_data(source_fd, target_fd, st.st_size, self.use_copy_file_range)
+                copy_xattrs(source_fd, target_fd)
+                self.apply_metadata(target_fd, st)
+            finally:
+                os.close(target_fd)
+        finally:
+            os.close(source_fd)
+        return copied
+
+    def copy_special(self, source_path, target_path, st):
+        """Recreate a symlink, device node or FIFO"""
+        if stat.S_ISLNK(st.st_mode):
+            os.symlink(os.readlink(source_path), target_path)
+            copy_xattrs(source_path, target_path, follow_symlinks=False)
+            self.apply_metadata(target_path, st, follow_symlinks=False)
+            return
+        os.mknod(target_path, st.st_mode, st.st_rdev)
+        copy_xattrs(source_path, target_path)
+        self.apply_metadata(target_path, st)
+
+    def copy_batch(self, batch):
+        """Copy a batch of (source, target, stat) entries on a worker"""
+        done = 0
+        written = 0
+        for source_path, target_path, st in batch:
+            self.channel.check_cancelled()
+            if stat.S_ISREG(st.st_mode):
+                written += self.copy_file(source_path, target_path, st)
+                done += st.st_size
+            else:
+                self.copy_special(source_path, target_path, st)
+        self.channel.advance(done, written)
+
+    def walk(self, submit):
+        """Create directories and submit batches of everything else"""
+        root_st = os.stat(self.source_root)
+        self.directories.append((self.source_root, self.target_root, root_st))
+        batch = []
+        batch_bytes = 0
+        pending = [(self.source_root, self.target_root)]
+        while pending:
+            source_dir, target_dir = pending.pop()
+            self.channel.check_cancelled()
+            with os.scandir(source_dir) as entries:
+                for entry in entries:
+                    st = entry.stat(follow_symlinks=False)
+                    target_path = os.path.join(target_dir, entry.name)
+                    if stat.S_ISDIR(st.st_mode):
+                        try:
+                            os.mkdir(target_path, 0o700)
+                        except FileExistsError:
+                            # mkfs already made lost+found; its mode and
+                            # owner are still applied at the end
+                            if not os.path.isdir(target_path) or os.path.islink(target_path):
+                                raise
+                        self.directories.append((entry.path, target_path, st))
+                        if st.st_dev == root_st.st_dev:
+                            pending.append((entry.path, target_path))
+                        continue
+                    if stat.S_ISSOCK(st.st_mode):
+                        continue  # Sockets belong to running programs
+                    if st.st_nlink > 1:
+                        key = (st.st_dev, st.st_ino)
+                        first = self.inodes.setdefault(key, target_path)
+                        if first != target_path:
+                            self.links.append((first, target_path))
+                            continue
+                    if stat.S_ISREG(st.st_mode):
+                        self.channel.add_total(st.st_size)
+                        batch_bytes += st.st_size
+                    batch.append((entry.path, target_path, st))
+                    if len(batch) >= BATCH_FILES or batch_bytes >= BATCH_BYTES:
+                        submit(batch)
+                        batch = []
+                        batch_bytes = 0
+        if batch:
+            submit(batch)
+
+    def finish_directories(self):
+        """Apply directory metadata, children before parents"""
+        for source_path, target_path, st in reversed(self.directories):
+            copy_xattrs(source_path, target_path)
+            self.apply_metadata(target_path, st)
+
+    def copy(self):
+        """Run the copy; return the bytes of file data written"""
+        self.channel.start_phase("Copying system files")
+        written_before = self.channel.snapshot().written
+        futures = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="file-copy") as pool:
+
+            def submit(batch):
+                # Bound the queue so the walk does not run far ahead of the copies
+                while len(futures) >= self.workers * QUEUED_BATCHES_PER_WORKER:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        futures.discard(future)
+                        future.result()
+                futures.add(pool.submit(self.copy_batch, batch))
+
+            try:
+                self.walk(submit)
+                for future in list(futures):
+                    future.result()
+            except BaseException:
+                # Make queued batches stop at their first file
+                self.channel.cancel()
+                raise
+        for first, target_path in self.links:
+            os.link(first, target_path, follow_symlinks=False)
+        self.finish_directories()
+        return self.channel.snapshot().written - written_before
+
+def copy_tree(source_root, target_root, channel=None, workers=WORKERS, use_copy_file_range=True):
+    """Copy the tree under source_root into the existing directory target_root"""
+    copier = TreeCopier(source_root, target_root, channel, workers, use_copy_file_range)
+    return copier.copy()
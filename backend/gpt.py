@@ -0,0 +1,188 @@
+"""
+GUID partition table encoding
+
+Builds a complete GPT (protective MBR, primary header and entry array,
+backup entry array and header) as two contiguous buffers, one for the start
+and one for the end of the disk, so a table is written with one pwrite per
+region. CRC32s are computed with zlib over the packed buffers. Works the
+same on block devices and on (sparse) image files.
+"""
+
+import fcntl
+import os
+import stat
+import struct
+import uuid
+import zlib
+from collections import namedtuple
+
+SIGNATURE = b"EFI PART"
+REVISION = 0x00010000
+HEADER_SIZE = 92
+ENTRY_SIZE = 128
+ENTRY_COUNT = 128
+NAME_BYTES = 72
+
+# signature, revision, header size, header CRC, reserved, current LBA,
+# backup LBA, first usable LBA, last usable LBA, disk GUID, entries LBA,
+# entry count, entry size, entries CRC
+HEADER_FORMAT = struct.Struct("<8sIIIIQQQQ16sQIII")
+# type GUID, unique GUID, first LBA, last LBA (inclusive), attributes, name
+ENTRY_FORMAT = struct.Struct("<16s16sQQQ72s")
+HEADER_CRC_OFFSET = 16
+
+MBR_PARTITION_OFFSET = 446
+MBR_SIGNATURE_OFFSET = 510
+PROTECTIVE_TYPE = 0xEE
+
+BLKRRPART = 0x125F
+
+GptEntry = namedtuple("GptEntry", "type_guid unique_guid first_lba last_lba attributes name")
+
+class GptError(Exception):
+    """The table does not fit the disk or could not be written"""
+
+def entry_array_sectors(sector_size):
+    """Sectors taken by the partition entry array"""
+    return -(-ENTRY_COUNT * ENTRY_SIZE // sector_size)
+
+def usable_lbas(disk_size, sector_size):
+    """Return (first, last) LBA available to partitions, last inclusive"""
+    total_sectors = disk_size // sector_size
+    array_sectors = entry_array_sectors(sector_size)
+    first = 2 + array_sectors
+    last = total_sectors - 2 - array_sectors
+    if last < first:
+        raise GptError(f"Disk of {disk_size} bytes is too small for a GPT")
+    return first, last
+
+def pack_entries(entries):
+    """Pack entries into the fixed-size entry array; None leaves a slot empty"""
+    if len(entries) > ENTRY_COUNT:
+        raise GptError(f"At most {ENTRY_COUNT} partitions fit in a GPT")
+    array = bytearray(ENTRY_COUNT * ENTRY_SIZE)
+    for index, entry in enumerate(entries):
+        if entry is None:
+            continue
+        ENTRY_FORMAT.pack_into(array, index * ENTRY_SIZE,
+                               entry.type_guid.bytes_le, entry.unique_guid.bytes_le,
+                               entry.first_lba, entry.last_lba, entry.attributes,
+                               entry.name.encode("utf-16-le")[:NAME_BYTES])
+    return array
+
+def pack_header(sector_size, current_lba, backup_lba, first_usable, last_usable,
+                disk_guid, entries_lba, entries_crc):
+    """Pack a header sector, filling in its CRC"""
+    header = bytearray(sector_size)
+    HEADER_FORMAT.pack_into(header, 0, SIGNATURE, REVISION, HEADER_SIZE, 0, 0,
+                            current_lba, backup_lba, first_usable, last_usable,
+                            disk_guid.bytes_le, entries_lba, ENTRY_COUNT, ENTRY_SIZE, entries_crc)
+    struct.pack_into("<I", header, HEADER_CRC_OFFSET, zlib.crc32(header[:HEADER_SIZE]))
+    return header
+
+def pack_protective_mbr(sector_size, total_sectors):
+    """Pack an MBR whose single 0xEE partition covers the whole disk"""
+    mbr = bytearray(sector_size)
+    # status, CHS start, type, CHS end, start LBA, sector count
+    struct.pack_into("<B3sB3sII", mbr, MBR_PARTITION_OFFSET, 0, b"\x00\x02\x00",
+                     PROTECTIVE_TYPE, b"\xff\xff\xff", 1, min(total_sectors - 1, 0xFFFFFFFF))
+    mbr[MBR_SIGNATURE_OFFSET:MBR_SIGNATURE_OFFSET + 2] = b"\x55\xaa"
+    return mbr
+
+def build_regions(entries, disk_size, sector_size, disk_guid):
+    """Return [(offset, buffer)] for the start and end of the disk"""
+    total_sectors = disk_size // sector_size
+    first_usable, last_usable = usable_lbas(disk_size, sector_size)
+    for entry in entries:
+        if entry is not None and not first_usable <= entry.first_lba <= entry.last_lba <= last_usable:
+            raise GptError(f"Partition {entry.name!r} is outside the usable area")
+
+    array = pack_entries(entries)
+    array_crc = zlib.crc32(array)
+    array_sectors = entry_array_sectors(sector_size)
+    last_lba = total_sectors - 1
+    backup_array_lba = last_lba - array_sectors
+
+    primary = bytearray()
+    primary += pack_protective_mbr(sector_size, total_sectors)
+    primary += pack_header(sector_size, 1, last_lba, first_usable, last_usable,
+                           disk_guid, 2, array_crc)
+    primary += array
+    primary += bytes(array_sectors * sector_size - len(array))
+
+    backup = bytearray(array)
+    backup += bytes(array_sectors * sector_size - len(array))
+    backup += pack_header(sector_size, last_lba, 1, first_usable, last_usable,
+                          disk_guid, backup_array_lba, array_crc)
+
+    return [(0, bytes(primary)), (backup_array_lba * sector_size, bytes(backup))]
+
+def parse_header(buffer, offset=0):
+    """Return the header fields at offset as a dict, or None if it is not valid"""
+    if len(buffer) < offset + HEADER_SIZE:
+        return None
+    fields = HEADER_FORMAT.unpack_from(buffer, offset)
+    if fields[0] != SIGNATURE or fields[2] < HEADER_SIZE:
+        return None
+    header = bytearray(buffer[offset:offset + HEADER_SIZE])
+    struct.pack_into("<I", header, HEADER_CRC_OFFSET, 0)
+    if zlib.crc32(header) != fields[3]:
+        return None
+    return {
+        "current_lba": fields[5], "backup_lba": fields[6],
+        "first_usable": fields[7], "last_usable": fields[8],
+        "disk_guid": uuid.UUID(bytes_le=fields[9]), "entries_lba": fields[10],
+        "entry_count": fields[11], "entry_size": fields[12], "entries_crc": fields[13],
+    }
+
+def parse_entries(buffer, header, offset=0):
+    """Return the entry slots (None for empty ones) of a validated header
+
+    Raises GptError if the array does not match the header's CRC.
+    """
+    length = header["entry_count"] * header["entry_size"]
+    array = buffer[offset:offset + length]
+    if len(array) != length or zlib.crc32(array) != header["entries_crc"]:
+        raise GptError("Partition entry array is damaged")
+    slots = []
+    for index in range(header["entry_count"]):
+        type_le, unique_le, first_lba, last_lba, attributes, name = ENTRY_FORMAT.unpack_from(
+            array, index * header["entry_size"])
+        if type_le == bytes(16):
+            slots.append(None)
+            continue
+        slots.append(GptEntry(uuid.UUID(bytes_le=type_le), uuid.UUID(bytes_le=unique_le),
+                              first_lba, last_lba, attributes,
+                              name.decode("utf-16-le", "replace").rstrip("\0")))
+    # Trailing empty slots carry no numbering information
+    while slots and slots[-1] is None:
+        slots.pop()
+    return slots
+
+def write_regions(path, regions, min_size=0):
+    """Write each region with a single pwrite, then flush
+
+    Block devices are asked to re-read their partition table afterwards.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CLOEXEC)
+    try:
+        if os.lseek(fd, 0, os.SEEK_END) < min_size:
+            raise GptError(f"{path} is smaller than the planned disk")
+        for offset, buffer in regions:
+            written = os.pwrite(fd, buffer, offset)
+            if written != len(buffer):
+                raise GptError(f"Short write to {path} at offset {offset}")
+        os.fsync(fd)
+        if stat.S_ISBLK(os.fstat(fd).st_mode):
+            try:
+                fcntl.ioctl(fd, BLKRRPART)
+            except OSError as e:
+                print(f"Warning: Kernel did not re-read the partition table of {path}: {e}")
+    finally:
+        os.close(fd)
+
+def write_gpt(path, entries, disk_size, sector_size=512, disk_guid=None):
+    """Write a fresh GPT with the given entries; return the disk GUID"""
+    disk_guid = disk_guid or uuid.uuid4()
+    write_regions(path, build_regions(entries, disk_size, sector_size, disk_guid), disk_size)
+    return disk_guid
@@ -0,0 +1,265 @@
+"""
+Block device hotplug events for the disk page
+
+HotplugWatcher delivers kernel uevents for the block subsystem on the GLib
+main loop. It listens on a NETLINK_KOBJECT_UEVENT socket attached as an fd
+source, so nothing polls; only when netlink is unavailable does it fall
+back to listing /sys/block every few seconds, since sysfs does not report
+changes through inotify. ReplaySource feeds recorded events
+(`udevadm monitor --kernel --property --subsystem-match=block` output)
+instead, to exercise the disk list without plugging anything in.
+"""
+
+import os
+import socket
+from collections import namedtuple
+
+from gi.repository import GLib
+
+from .disks import SYSFS_ROOT
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast group of raw kernel events (udev re-broadcasts on group 2)
+KERNEL_GROUP = 1
+RECEIVE_SIZE = 64 * 1024
+# Seconds between /sys/block listings when netlink is unavailable
+POLL_INTERVAL_SECONDS = 2
+
+REPLAY_ENV_VAR = "ZENOS_HOTPLUG_REPLAY"
+
+Uevent = namedtuple("Uevent", "action devpath subsystem devtype devname properties")
+
+def make_uevent(properties):
+    """Build a Uevent from its KEY=VALUE properties"""
+    devpath = properties.get("DEVPATH", "")
+    return Uevent(
+        action=properties.get("ACTION", ""),
+        devpath=devpath,
+        subsystem=properties.get("SUBSYSTEM", ""),
+        devtype=properties.get("DEVTYPE", ""),
+        devname=properties.get("DEVNAME", "") or os.path.basename(devpath),
+        properties=properties,
+    )
+
+def parse_uevent(data):
+    """Parse a kernel uevent datagram ('add@/devices/...\\0ACTION=add\\0...')"""
+    fields = data.decode("utf-8", "replace").split("\0")
+    properties = {}
+    for field in fields[1:]:
+        key, separator, value = field.partition("=")
+        if separator:
+            properties[key] = value
+    return make_uevent(properties)
+
+def parse_recording(text):
+    """Parse `udevadm monitor --property` output into Uevents
+
+    Events are blank-line separated blocks of KEY=VALUE lines; header lines
+    such as 'KERNEL[12.3] add /devices/... (block)' are skipped.
+    """
+    events = []
+    properties = {}
+    for line in text.splitlines() + [""]:
+        line = line.strip()
+        if not line:
+            if properties:
+                events.append(make_uevent(properties))
+                properties = {}
+            continue
+        key, separator, value = line.partition("=")
+        if separator and " " not in key:
+            properties[key] = value
+    return events
+
+def disk_name(event):
+    """Name of the whole disk an event concerns, or None to ignore it
+
+    Partition events map to their parent disk, whose partition list changed.
+    """
+    if event.subsystem != "block" or event.devpath.startswith("/devices/virtual/"):
+        return None
+    if event.devtype == "partition":
+        return os.path.basename(os.path.dirname(event.devpath)) or None
+    return event.devname or None
+
+class NetlinkSource:
+    """Kernel uevents from a netlink socket, dispatched by a GLib fd watch"""
+    def __init__(self):
+        self.socket = None
+        self.source_id = 0
+
+    def start(self, callback):
+        """Open the socket and start dispatching; raises OSError if unavailable"""
+        self.socket = socket.socket(socket.AF_NETLINK,
+                                    socket.SOCK_DGRAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC,
+                                    NETLINK_KOBJECT_UEVENT)
+        try:
+            self.socket.bind((0, KERNEL_GROUP))
+        except OSError:
+            self.socket.close()
+            self.socket = None
+            raise
+        self.callback = callback
+        self.source_id = GLib.unix_fd_add_full(GLib.PRIORITY_DEFAULT, self.socket.fileno(),
+                                               GLib.IOCondition.IN, self.on_readable)
+
+    def on_readable(self, fd, condition):
+        """Drain every queued datagram, then wait for the next wakeup"""
+        while True:
+            try:
+                data = self.socket.recv(RECEIVE_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # ENOBUFS: events were dropped; the next ones still arrive
+                print(f"Warning: uevent socket error: {e}")
+                break
+            self.callback(parse_uevent(data))
+        return True
+
+    def stop(self):
+        """Remove the fd watch and close the socket"""
+        if self.source_id:
+            GLib.source_remove(self.source_id)
+            self.source_id = 0
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+class PollingSource:
+    """Fallback: /sys/block listed every few seconds and compared
+
+    sysfs sends no inotify events, so without netlink the only way to see
+    disks come and go is to look. Only names and sizes are read, so a poll
+    costs a directory listing and one small read per disk.
+    """
+    def __init__(self, block_dir=os.path.join(SYSFS_ROOT, "block"),
+                 interval_seconds=POLL_INTERVAL_SECONDS):
+        self.block_dir = block_dir
+        self.interval_seconds = interval_seconds
+        self.source_id = 0
+
+    def read_disks(self):
+        """{name: size file contents} for every entry of the block directory"""
+        disks = {}
+        for name in os.listdir(self.block_dir):
+            try:
+                with open(os.path.join(self.block_dir, name, "size")) as f:
+                    disks[name] = f.read().strip()
+            except OSError:
+                disks[name] = None
+        return disks
+
+    def start(self, callback):
+        """Start polling; raises OSError if the directory cannot be read"""
+        self.callback = callback
+        self.disks = self.read_disks()
+        self.source_id = GLib.timeout_add_seconds(self.interval_seconds, self.on_poll)
+
+    def on_poll(self):
+        """Report disks that appeared, went away or changed size"""
+        try:
+            disks = self.read_disks()
+        except OSError as e:
+            print(f"Warning: Could not list {self.block_dir}: {e}")
+            return True
+        for name in sorted(self.disks.keys() | disks.keys()):
+            if name not in disks:
+                action = "remove"
+            elif name not in self.disks:
+                action = "add"
+            elif disks[name] != self.disks[name]:
+                action = "change"
+            else:
+                continue
+            self.callback(make_uevent({"ACTION": action, "SUBSYSTEM": "block", "DEVTYPE": "disk",
+                                       "DEVNAME": name, "DEVPATH": f"/block/{name}"}))
+        self.disks = disks
+        return True
+
+    def stop(self):
+        """Stop polling"""
+        if self.source_id:
+            GLib.source_remove(self.source_id)
+            self.source_id = 0
+
+class ReplaySource:
+    """Recorded uevents played back from the main loop at a fixed interval"""
+    def __init__(self, events, interval_ms=500):
+        self.events = list(events)
+        self.interval_ms = interval_ms
+        self.source_id = 0
+
+    @classmethod
+    def from_file(cls, path, interval_ms=500):
+        """Load a `udevadm monitor --kernel --property` recording"""
+        with open(path, encoding="utf-8") as f:
+            return cls(parse_recording(f.read()), interval_ms)
+
+    def start(self, callback):
+        """Start playback from the first event"""
+        self.callback = callback
+        self.position = 0
+        self.source_id = GLib.timeout_add(self.interval_ms, self.on_tick)
+
+    def on_tick(self):
+        """Deliver the next event"""
+        if self.position >= len(self.events):
+            self.source_id = 0
+            return False  # Don't repeat timeout
+        event = self.events[self.position]
+        self.position += 1
+        self.callback(event)
+        return True
+
+    def stop(self):
+        """Stop playback"""
+        if self.source_id:
+            GLib.source_remove(self.source_id)
+            self.source_id = 0
+
+class HotplugWatcher:
+    """Report disks whose state may have changed to a main-loop callback
+
+    on_disk_changed(name, action) is called with the whole-disk name and the
+    uevent action ('add', 'remove', 'change', ...).
+    """
+    def __init__(self, on_disk_changed, source=None):
+        self.on_disk_changed = on_disk_changed
+        self.source = source
+        self.active = None
+
+    def start(self):
+        """Start the first event source that works; return False if none did"""
+        if self.active is not None:
+            return True
+        # (name, factory); the name is reported when the factory itself fails
+        if self.source is not None:
+            factories = [(type(self.source).__name__, lambda: self.source)]
+        elif os.environ.get(REPLAY_ENV_VAR):
+            factories = [("ReplaySource",
+                          lambda: ReplaySource.from_file(os.environ[REPLAY_ENV_VAR]))]
+        else:
+            factories = [("NetlinkSource", NetlinkSource), ("PollingSource", PollingSource)]
+        for name, factory in factories:
+            try:
+                source = factory()
+                source.start(self.on_event)
+            except (OSError, GLib.Error) as e:
+                print(f"Warning: {name} unavailable: {e}")
+                continue
+            self.active = source
+            return True
+        return False
+
+    def on_event(self, event):
+        """Filter raw events down to whole-disk changes"""
+        name = disk_name(event)
+        if name is not None:
+            self.on_disk_changed(name, event.action)
+
+    def stop(self):
+        """Stop the active event source"""
+        if self.active is not None:
+            self.active.stop()
+            self.active = None
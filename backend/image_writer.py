@@ -0,0 +1,463 @@
+"""
+Streaming root image writer
+
+write_image() copies a raw, xz or zstd image to a partition (or to an
+offset inside an image file) through a two-stage pipeline: a producer
+thread reads and decompresses into a small pool of page-aligned mmap
+buffers while the calling thread pwrites the filled ones. zstd is decoded
+by the zstandard module when installed, otherwise by a `zstd -dc` child
+process; xz uses lzma, which releases the GIL while decoding. The target
+is opened with O_DIRECT when the kernel and filesystem allow it.
+
+Before writing, the target range is discarded (BLKDISCARD and an offloaded
+BLKZEROOUT on block devices, FALLOC_FL_PUNCH_HOLE on image files). When
+that guarantees the range reads back as zeros, holes in a raw image (found
+with SEEK_DATA/SEEK_HOLE) and all-zero blocks in the decoded stream are
+skipped instead of written.
+"""
+
+import ctypes
+import errno
+import fcntl
+import lzma
+import mmap
+import os
+import queue
+import shutil
+import stat
+import struct
+import subprocess
+import threading
+
+from .disks import read_device_queue
+from .progress import ProgressChannel
+
+BUFFER_SIZE = 4 * 1024 * 1024
+QUEUE_DEPTH = 4
+READ_SIZE = 1024 * 1024
+# O_DIRECT needs offsets, lengths and memory aligned to the logical block
+# size; mmap buffers are page aligned and 4096 covers 512e and 4Kn disks
+DIRECT_ALIGNMENT = 4096
+# Granularity of zero detection in the decoded stream, and the size of
+# the chunks it is first tried on
+ZERO_BLOCK_SIZE = DIRECT_ALIGNMENT
+ZERO_BLOCK = bytes(ZERO_BLOCK_SIZE)
+ZERO_CHUNK_SIZE = 64 * 1024
+ZERO_CHUNK = bytes(ZERO_CHUNK_SIZE)
+
+BLKDISCARD = 0x1277
+BLKZEROOUT = 0x127F
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+XZ_MAGIC = b"\xfd7zXZ\x00"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class ImageError(Exception):
+    """The image is unreadable or does not fit the target"""
+
+def detect_format(path):
+    """Return 'xz', 'zstd' or 'raw' from the file's magic bytes"""
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    if magic.startswith(XZ_MAGIC):
+        return "xz"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "raw"
+
+def read_full(file, view):
+    """readinto until view is full; a short count means end of file"""
+    filled = 0
+    while filled < len(view):
+        count = file.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+class RawSource:
+    """Reads an uncompressed image, jumping over holes when sparse is set"""
+    def __init__(self, path, sparse=False):
+        self.fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        self.size = os.fstat(self.fd).st_size
+        self.sparse = sparse
+        self.position = 0
+        # End of the data extent the position is in
+        self.data_end = 0 if sparse else self.size
+
+    @property
+    def consumed(self):
+        return self.position
+
+    def next_extent(self):
+        """Move to the next data extent; False at the end of the image"""
+        try:
+            start = os.lseek(self.fd, self.position, os.SEEK_DATA)
+            self.data_end = os.lseek(self.fd, start, os.SEEK_HOLE)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Only a hole is left
+                self.position = self.size
+                return False
+            if e.errno != errno.EINVAL:
+                raise
+            # Filesystem without SEEK_DATA: read everything
+            start, self.data_end, self.sparse = self.position, self.size, False
+        self.position = start
+        return True
+
+    def read_block(self, view):
+        """Read the next data into view; return (image offset, count), count 0 at the end"""
+        if self.position >= self.data_end and not (self.sparse and self.next_extent()):
+            return self.position, 0
+        view = view[:self.data_end - self.position]
+        start = self.position
+        filled = 0
+        while filled < len(view):
+            count = os.preadv(self.fd, [view[filled:]], start + filled)
+            if not count:
+                break
+            filled += count
+        self.position += filled
+        return start, filled
+
+    def close(self):
+        os.close(self.fd)
+
+class StreamSource:
+    """Base for decoders, which produce the image front to back"""
+    position = 0
+
+    def read_block(self, view):
+        """Decode into view; return (image offset, count), count 0 at the end"""
+        start = self.position
+        count = self.readinto(view)
+        self.position += count
+        return start, count
+
+class XzSource(StreamSource):
+    """Decodes (possibly multi-stream) xz with bounded output per call"""
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.decompressor = lzma.LZMADecompressor()
+        self.consumed = 0
+
+    def readinto(self, view):
+        filled = 0
+        while filled < len(view):
+            if self.decompressor.eof:
+                leftover = self.decompressor.unused_data
+                if not leftover:
+                    leftover = self.file.read(READ_SIZE)
+                    self.consumed += len(leftover)
+                if not leftover.strip(b"\0"):
+                    break  # End of file or stream padding
+                self.decompressor = lzma.LZMADecompressor()
+                data = leftover
+            elif self.decompressor.needs_input:
+                data = self.file.read(READ_SIZE)
+                if not data:
+                    raise ImageError("xz image is truncated")
+                self.consumed += len(data)
+            else:
+                data = b""
+            output = self.decompressor.decompress(data, len(view) - filled)
+            view[filled:filled + len(output)] = output
+            filled += len(output)
+        return filled
+
+    def close(self):
+        self.file.close()
+
+class ZstdModuleSource(StreamSource):
+    """Decodes zstd with the zstandard module"""
+    def __init__(self, path):
+        self.compressed = open(path, "rb")
+        self.file = zstandard.ZstdDecompressor().stream_reader(self.compressed, read_size=READ_SIZE)
+
+    @property
+    def consumed(self):
+        return self.compressed.tell()
+
+    def readinto(self, view):
+        return read_full(self.file, view)
+
+    def close(self):
+        self.file.close()
+        self.compressed.close()
+
+class ZstdProcessSource(StreamSource):
+    """Decodes zstd in a `zstd -dc` child process fed by a thread"""
+    def __init__(self, path):
+        executable = shutil.which("zstd")
+        if executable is None:
+            raise ImageError("zstd images need the zstandard module or the zstd tool")
+        self.process = subprocess.Popen([executable, "-dc", "-q"], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        self.consumed = 0
+        self.feeder = threading.Thread(target=self.feed, args=(path,), daemon=True,
+                                       name="zstd-feeder")
+        self.feeder.start()
+
+    def feed(self, path):
+        """Copy the compressed image into the decoder, counting progress"""
+        try:
+            with open(path, "rb") as f:
+                while True:
+                    data = f.read(READ_SIZE)
+                    if not data:
+                        break
+                    self.process.stdin.write(data)
+                    self.consumed += len(data)
+        except (BrokenPipeError, ValueError):
+            pass  # Decoder exited or was closed early
+        finally:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def readinto(self, view):
+        filled = read_full(self.process.stdout, view)
+        if filled < len(view) and self.process.wait() != 0:
+            raise ImageError(f"zstd exited with status {self.process.returncode}")
+        return filled
+
+    def close(self):
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.feeder.join()
+
+def open_source(path, sparse=False):
+    """Open an image for streaming in its detected format"""
+    image_format = detect_format(path)
+    if image_format == "xz":
+        return XzSource(path)
+    if image_format == "zstd":
+        return ZstdModuleSource(path) if zstandard else ZstdProcessSource(path)
+    return RawSource(path, sparse)
+
+def open_target(path, offset, direct):
+    """Open the target for writing; return (fd, whether O_DIRECT is active)"""
+    flags = os.O_WRONLY | os.O_CLOEXEC
+    if direct and hasattr(os, "O_DIRECT") and offset % DIRECT_ALIGNMENT == 0:
+        try:
+            return os.open(path, flags | os.O_DIRECT), True
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            # Filesystem (e.g. tmpfs) does not support O_DIRECT
+    return os.open(path, flags), False
+
+def pwrite_all(fd, view, position):
+    """pwrite until the whole view is written"""
+    while view:
+        written = os.pwrite(fd, view, position)
+        view = view[written:]
+        position += written
+
+def punch_hole(fd, offset, length):
+    """Deallocate a file range so it reads back as zeros"""
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    if libc.fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, length) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+def block_range_ioctl(fd, request, offset, length):
+    fcntl.ioctl(fd, request, struct.pack("QQ", offset, length))
+
+def discard_target(fd, offset, length):
+    """Discard [offset, offset + length) of the target
+
+    Returns True when the range is now guaranteed to read back as zeros, so
+    zero regions of the image need not be written.
+    """
+    mode = os.fstat(fd).st_mode
+    try:
+        if stat.S_ISREG(mode):
+            punch_hole(fd, offset, length)
+            return True
+        if not stat.S_ISBLK(mode):
+            return False
+        try:
+            block_range_ioctl(fd, BLKDISCARD, offset, length)
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise
+            # No discard support (e.g. dm-crypt without allow-discards)
+        # Discarded blocks may read back as anything; only trust zeroing
+        # the device offloads, as the fallback writes every block
+        if not read_device_queue(os.fstat(fd).st_rdev).write_zeroes_max_bytes:
+            return False
+        block_range_ioctl(fd, BLKZEROOUT, offset, length)
+        return True
+    except OSError as e:
+        if e.errno in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+            return False
+        raise
+
+def is_zero(buffer, start, end, zeros):
+    """Whether buffer[start:end] is all zeros; mmap.find compares in place"""
+    if end - start != len(zeros):
+        zeros = zeros[:end - start]
+    return buffer.find(zeros, start, end) == start
+
+def data_runs(buffer, count):
+    """[(start, end)] of the parts of mmap buffer[:count] that are not zero blocks
+
+    Works a chunk at a time so that all-zero and all-data chunks (the common
+    cases) cost one search in C instead of a loop per block.
+    """
+    runs = []
+
+    def add(start, end):
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
+
+    for chunk_start in range(0, count, ZERO_CHUNK_SIZE):
+        chunk_end = min(chunk_start + ZERO_CHUNK_SIZE, count)
+        if is_zero(buffer, chunk_start, chunk_end, ZERO_CHUNK):
+            continue
+        if (chunk_end - chunk_start == ZERO_CHUNK_SIZE
+                and buffer.find(ZERO_BLOCK, chunk_start, chunk_end) == -1):
+            add(chunk_start, chunk_end)
+            continue
+        for start in range(chunk_start, chunk_end, ZERO_BLOCK_SIZE):
+            end = min(start + ZERO_BLOCK_SIZE, chunk_end)
+            if not is_zero(buffer, start, end, ZERO_BLOCK):
+                add(start, end)
+    return runs
+
+class ImageWriter:
+    """Producer/consumer pipeline for one image write"""
+    def __init__(self, buffer_size=BUFFER_SIZE, queue_depth=QUEUE_DEPTH, direct=True,
+                 discard=True):
+        if buffer_size % DIRECT_ALIGNMENT:
+            raise ValueError(f"buffer_size must be a multiple of {DIRECT_ALIGNMENT}")
+        self.buffer_size = buffer_size
+        self.queue_depth = queue_depth
+        self.direct = direct
+        self.discard = discard
+
+    def produce(self, source, skip_zeroes, free, filled, stop):
+        """Fill free buffers from the source until it ends or stop is set"""
+        try:
+            while not stop.is_set():
+                buffer = free.get()
+                if buffer is None:
+                    break
+                position, count = source.read_block(memoryview(buffer))
+                if skip_zeroes:
+                    runs = data_runs(buffer, count)
+                else:
+                    runs = [(0, count)] if count else []
+                filled.put((buffer, position, count, runs, source.consumed))
+                if not count:
+                    break
+        except BaseException as e:
+            filled.put(e)
+
+    def write_run(self, view, position):
+        """pwrite one run, through the page cache if O_DIRECT cannot take it"""
+        if self.direct_active and (position % DIRECT_ALIGNMENT or len(view) % DIRECT_ALIGNMENT):
+            if self.buffered_fd is None:
+                self.buffered_fd = os.open(self.target_path, os.O_WRONLY | os.O_CLOEXEC)
+            pwrite_all(self.buffered_fd, view, position)
+            return
+        try:
+            pwrite_all(self.fd, view, position)
+        except OSError as e:
+            if not self.direct_active or e.errno != errno.EINVAL:
+                raise
+            # Device refused direct I/O after all
+            os.close(self.fd)
+            self.fd, self.direct_active = open_target(self.target_path, position, False)
+            pwrite_all(self.fd, view, position)
+
+    def write(self, source_path, target_path, offset=0, limit=None, channel=None):
+        """Write an image to target_path at offset; return the image size"""
+        channel = channel or ProgressChannel()
+        channel.start_phase("Writing system image", os.path.getsize(source_path))
+        self.target_path = target_path
+        self.fd, self.direct_active = open_target(target_path, offset, self.direct)
+        self.buffered_fd = None
+        try:
+            skip_zeroes = False
+            if self.discard:
+                if limit is None:
+                    length = os.lseek(self.fd, 0, os.SEEK_END) - offset
+                else:
+                    length = limit
+                skip_zeroes = discard_target(self.fd, offset, length)
+            image_size = self.run_pipeline(source_path, offset, limit, skip_zeroes, channel)
+            for target_fd in (self.fd, self.buffered_fd):
+                if target_fd is not None:
+                    os.fsync(target_fd)
+        finally:
+            os.close(self.fd)
+            if self.buffered_fd is not None:
+                os.close(self.buffered_fd)
+        return image_size
+
+    def run_pipeline(self, source_path, offset, limit, skip_zeroes, channel):
+        """Decode on a producer thread and write the filled buffers here"""
+        source = open_source(source_path, sparse=skip_zeroes)
+        free = queue.Queue()
+        buffers = [mmap.mmap(-1, self.buffer_size) for _ in range(self.queue_depth)]
+        for buffer in buffers:
+            free.put(buffer)
+        filled = queue.Queue()
+        stop = threading.Event()
+        producer = threading.Thread(target=self.produce,
+                                    args=(source, skip_zeroes, free, filled, stop),
+                                    daemon=True, name="image-decoder")
+        producer.start()
+
+        consumed = 0
+        try:
+            while True:
+                item = filled.get()
+                if isinstance(item, BaseException):
+                    raise item
+                buffer, position, count, runs, source_consumed = item
+                if limit is not None and position + count > limit:
+                    raise ImageError("The image is larger than the target partition")
+                written = 0
+                with memoryview(buffer) as view:
+                    for start, end in runs:
+                        self.write_run(view[start:end], offset + position + start)
+                        written += end - start
+                channel.advance(source_consumed - consumed, written)
+                consumed = source_consumed
+                free.put(buffer)
+                if not count:
+                    return position
+                channel.check_cancelled()
+        finally:
+            stop.set()
+            free.put(None)
+            producer.join()
+            source.close()
+            for buffer in buffers:
+                buffer.close()
+
+def write_image(source_path, target_path, offset=0, limit=None, channel=None, direct=True,
+                buffer_size=BUFFER_SIZE, queue_depth=QUEUE_DEPTH, discard=True):
+    """Stream an image to a partition or into an image file at offset
+
+    Returns the size of the image. With discard set, the target range is
+    discarded first and zero regions are skipped where that is safe.
+    """
+    writer = ImageWriter(buffer_size, queue_depth, direct, discard)
+    return writer.write(source_path, target_path, offset, limit, channel)
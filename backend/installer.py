@@ -0,0 +1,228 @@
+"""
+Installation engine
+
+install() runs the steps chosen on the earlier pages on a worker thread:
+write the partition table (the erase plan or the manual editor's table),
+open the LUKS container when encryption was requested, and then either
+stream the root image onto the root partition or, when the live system
+provides a root directory instead, create a filesystem there and copy the
+tree into it. Progress and the final outcome go through a
+backend.progress.ProgressChannel that the install page polls.
+
+ZENOS_INSTALL_TARGET redirects every write to an image file (the table and
+the root image land at the partition's offset inside it), or, for a root
+directory, to a directory the tree is copied into. That is how the engine
+is exercised without a spare disk.
+"""
+
+import os
+import subprocess
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+from .file_copier import copy_tree
+from .gpt import GptError
+from .image_writer import ImageError, write_image
+from .partition_table import TableError
+from .partitioning import LINUX_DATA_TYPE, ROOT_TYPES, partition_path, write_plan
+from .progress import Cancelled, ProgressChannel
+
+TARGET_ENV_VAR = "ZENOS_INSTALL_TARGET"
+IMAGE_ENV_VAR = "ZENOS_ROOT_IMAGE"
+TREE_ENV_VAR = "ZENOS_ROOT_TREE"
+
+# Where live media keep the root filesystem image, most compact first
+IMAGE_CANDIDATES = [
+    "/run/initramfs/live/LiveOS/rootfs.img.zst",
+    "/run/initramfs/live/LiveOS/rootfs.img.xz",
+    "/run/initramfs/live/LiveOS/rootfs.img",
+]
+# Mounted live root filesystems, copied file by file when there is no image
+TREE_CANDIDATES = [
+    "/run/rootfsbase",
+]
+
+LUKS_NAME = "zenos-root"
+
+# Seconds to wait for udev to create the root partition's device node after
+# the kernel re-reads the table, and the interval between checks
+PARTITION_NODE_TIMEOUT = 10
+PARTITION_NODE_POLL = 0.1
+
+class InstallError(Exception):
+    """An installation step failed"""
+
+def find_root_source():
+    """Path of the root filesystem image, or root directory, to install"""
+    for variable in (IMAGE_ENV_VAR, TREE_ENV_VAR):
+        override = os.environ.get(variable)
+        if override:
+            return override
+    for path in IMAGE_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    for path in TREE_CANDIDATES:
+        if os.path.isdir(path):
+            return path
+    raise InstallError("No root filesystem was found on the installation media")
+
+def root_partition(state):
+    """Return (path, start, size, encrypted) of the partition receiving the image"""
+    plan = state.get("partition_plan")
+    if plan is not None:
+        for partition in plan.partitions:
+            if partition.mountpoint == "/":
+                return partition.path, partition.start, partition.size, partition.encrypted
+        raise InstallError("The partition plan has no root partition")
+
+    table = state.get("partition_table")
+    if table is None:
+        raise InstallError("No partition layout was chosen")
+    # Prefer a partition typed as root, then the largest Linux filesystem
+    root_types = set(ROOT_TYPES.values())
+    candidates = [partition for partition in table.partitions
+                  if partition.type_guid in root_types or partition.type_guid == LINUX_DATA_TYPE]
+    if not candidates:
+        raise InstallError("Create a Linux filesystem partition to install to")
+    partition = max(candidates, key=lambda partition: (partition.type_guid in root_types,
+                                                       partition.size))
+    return (partition_path(state["disk"], partition.number), partition.start, partition.size,
+            bool(state.get("encrypt")))
+
+def run_command(arguments, input=None):
+    """Run a system tool, raising InstallError with its message on failure"""
+    try:
+        result = subprocess.run(arguments, input=input, capture_output=True)
+    except OSError as e:
+        raise InstallError(f"Could not run {arguments[0]}: {e}") from e
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip()
+        raise InstallError(f"{' '.join(arguments[:2])} failed: {message}")
+
+def run_cryptsetup(arguments, password):
+    """Run cryptsetup with the passphrase on stdin"""
+    run_command(["cryptsetup", *arguments, "--key-file=-"], password.encode("utf-8"))
+
+def open_luks(path, password):
+    """Format path as LUKS2 and open it; return the mapped device"""
+    run_cryptsetup(["luksFormat", "--type", "luks2", "--batch-mode", path], password)
+    run_cryptsetup(["open", path, LUKS_NAME], password)
+    return f"/dev/mapper/{LUKS_NAME}"
+
+def close_luks():
+    subprocess.run(["cryptsetup", "close", LUKS_NAME], capture_output=True)
+
+def write_partition_table(state, target):
+    """Write the erase plan or the edited table; target overrides the disk"""
+    plan = state.get("partition_plan")
+    try:
+        if plan is not None:
+            write_plan(plan, target)
+        elif state.get("partition_table") is not None:
+            state["partition_table"].commit(target or state["disk"])
+        else:
+            raise InstallError("No partition layout was chosen")
+    except (GptError, TableError) as e:
+        raise InstallError(f"Could not write the partition table: {e}") from e
+
+def wait_for_partition(path, channel, timeout=PARTITION_NODE_TIMEOUT):
+    """Wait until udev has created the block device node at path"""
+    if shutil.which("udevadm"):
+        subprocess.run(["udevadm", "settle", f"--timeout={timeout}"], capture_output=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if stat.S_ISBLK(os.stat(path).st_mode):
+                return
+        except FileNotFoundError:
+            pass
+        if time.monotonic() >= deadline:
+            raise InstallError(f"The root partition {path} did not appear after "
+                               f"writing the partition table")
+        channel.check_cancelled()
+        time.sleep(PARTITION_NODE_POLL)
+
+def install_tree(source, device, offset, size, channel):
+    """Create an ext4 filesystem on device (at offset, for image files) and copy source into it"""
+    channel.start_phase("Creating file system")
+    mkfs = ["mkfs.ext4", "-q", "-F"]
+    mount = ["mount"]
+    if offset:
+        mkfs += ["-E", f"offset={offset}", device, str(size // 1024)]
+        mount += ["-o", f"loop,offset={offset},sizelimit={size}"]
+    else:
+        mkfs.append(device)
+    run_command(mkfs)
+    channel.check_cancelled()
+
+    mountpoint = tempfile.mkdtemp(prefix="zenos-root-")
+    try:
+        run_command(mount + [device, mountpoint])
+        try:
+            copy_tree(source, mountpoint, channel)
+        finally:
+            run_command(["umount", mountpoint])
+    finally:
+        os.rmdir(mountpoint)
+
+def install(state, channel):
+    """Run the installation; raises InstallError (or OSError) on failure"""
+    source = find_root_source()
+    target = os.environ.get(TARGET_ENV_VAR)
+    if target and os.path.isdir(target):
+        # Directory target: no disk at all, just the file copy
+        if not os.path.isdir(source):
+            raise InstallError(f"A directory {TARGET_ENV_VAR} needs a root directory to copy")
+        copy_tree(source, target, channel)
+        return
+    path, start, size, encrypted = root_partition(state)
+    if target and encrypted:
+        raise InstallError(f"Encryption is not supported with {TARGET_ENV_VAR}")
+
+    channel.start_phase("Writing partition table")
+    write_partition_table(state, target)
+    channel.check_cancelled()
+
+    offset = 0
+    if target:
+        # Image file: write at the partition's offset
+        path, offset = target, start
+    else:
+        wait_for_partition(path, channel)
+        if encrypted:
+            channel.start_phase("Setting up encryption")
+            path = open_luks(path, state.get("encryption_password", ""))
+            # LUKS2 header takes 16 MiB of the partition
+            size -= 16 * 1024 * 1024
+
+    try:
+        if os.path.isdir(source):
+            install_tree(source, path, offset, size, channel)
+        else:
+            write_image(source, path, offset=offset, limit=size, channel=channel)
+    except ImageError as e:
+        raise InstallError(str(e)) from e
+    finally:
+        if encrypted and not target:
+            close_luks()
+
+def start_install(state):
+    """Run install() on a worker thread; return the ProgressChannel to poll"""
+    channel = ProgressChannel()
+
+    def run():
+        try:
+            install(state, channel)
+        except (Cancelled, InstallError, OSError) as e:
+            channel.finish(str(e))
+        except Exception as e:
+            print(f"Warning: Installation failed unexpectedly: {e!r}")
+            channel.finish(f"Unexpected error: {e}")
+        else:
+            channel.finish()
+
+    threading.Thread(target=run, daemon=True, name="installer").start()
+    return channel
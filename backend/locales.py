@@ -0,0 +1,151 @@
+"""
+Locale catalog for the language page
+
+Builds the list of selectable locales from glibc's SUPPORTED file (or
+`locale -a` when it is missing), names each one from its locale source
+and caches the result keyed by the source files' mtimes.
+"""
+
+import os
+import subprocess
+from collections import namedtuple
+
+from . import cache
+from .search import fold_text
+
+SUPPORTED_PATH = "/usr/share/i18n/SUPPORTED"
+LOCALES_DIR = "/usr/share/i18n/locales"
+ISO3166_PATH = "/usr/share/zoneinfo/iso3166.tab"
+DEFAULT_LOCALE = "en_US.UTF-8"
+
+Locale = namedtuple("Locale", "code language territory name english_name territory_name search_key")
+
+# Endonyms for languages whose native name differs from the English one
+NATIVE_LANGUAGE_NAMES = {
+    "af": "Afrikaans", "am": "አማርኛ", "ar": "العربية", "az": "Azərbaycan",
+    "be": "Беларуская", "bg": "Български", "bn": "বাংলা", "bs": "Bosanski",
+    "ca": "Català", "cs": "Čeština", "cy": "Cymraeg", "da": "Dansk",
+    "de": "Deutsch", "el": "Ελληνικά", "en": "English", "eo": "Esperanto",
+    "es": "Español", "et": "Eesti", "eu": "Euskara", "fa": "فارسی",
+    "fi": "Suomi", "fil": "Filipino", "fr": "Français", "ga": "Gaeilge",
+    "gl": "Galego", "gu": "ગુજરાતી", "he": "עברית", "hi": "हिन्दी",
+    "hr": "Hrvatski", "hu": "Magyar", "hy": "Հայերեն", "id": "Bahasa Indonesia",
+    "is": "Íslenska", "it": "Italiano", "ja": "日本語", "ka": "ქართული",
+    "kk": "Қазақ", "km": "ខ្មែរ", "kn": "ಕನ್ನಡ", "ko": "한국어",
+    "ky": "Кыргызча", "lo": "ລາວ", "lt": "Lietuvių", "lv": "Latviešu",
+    "mk": "Македонски", "ml": "മലയാളം", "mn": "Монгол", "mr": "मराठी",
+    "ms": "Bahasa Melayu", "my": "မြန်မာ", "nb": "Norsk bokmål", "ne": "नेपाली",
+    "nl": "Nederlands", "nn": "Norsk nynorsk", "pa": "ਪੰਜਾਬੀ", "pl": "Polski",
+    "pt": "Português", "ro": "Română", "ru": "Русский", "si": "සිංහල",
+    "sk": "Slovenčina", "sl": "Slovenščina", "sq": "Shqip", "sr": "Српски",
+    "sv": "Svenska", "sw": "Kiswahili", "ta": "தமிழ்", "te": "తెలుగు",
+    "th": "ไทย", "tr": "Türkçe", "uk": "Українська", "ur": "اردو",
+    "uz": "Oʻzbek", "vi": "Tiếng Việt", "zh": "中文",
+}
+
+# Used when neither SUPPORTED nor `locale -a` is available
+FALLBACK_LOCALES = [
+    "en_US.UTF-8", "es_ES.UTF-8", "fr_FR.UTF-8", "de_DE.UTF-8",
+    "it_IT.UTF-8", "pt_PT.UTF-8", "ru_RU.UTF-8", "zh_CN.UTF-8",
+    "ja_JP.UTF-8", "ko_KR.UTF-8", "ar_EG.UTF-8", "hi_IN.UTF-8",
+]
+
+def split_locale(code):
+    """Split 'sr_RS.UTF-8@latin' into ('sr', 'RS', 'sr_RS@latin')"""
+    base, _, modifier = code.partition("@")
+    base = base.split(".", 1)[0]
+    language, _, territory = base.partition("_")
+    source_name = f"{base}@{modifier}" if modifier else base
+    return language, territory, source_name
+
+def read_supported(path=SUPPORTED_PATH):
+    """Return the UTF-8 locale codes listed in glibc's SUPPORTED file"""
+    codes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 2 and fields[1] == "UTF-8" and not fields[0].startswith("#"):
+                codes.append(fields[0])
+    return codes
+
+def read_installed():
+    """Return the UTF-8 locales reported by `locale -a`"""
+    try:
+        output = subprocess.run(["locale", "-a"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    codes = []
+    for name in output.split():
+        base, _, charset = name.partition(".")
+        if charset.lower().replace("-", "") == "utf8" and "_" in base:
+            codes.append(f"{base}.UTF-8")
+    return codes
+
+def read_identification(path):
+    """Return the English (language, territory) names from a locale source"""
+    names = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            in_identification = False
+            for line in f:
+                line = line.strip()
+                if line == "LC_IDENTIFICATION":
+                    in_identification = True
+                elif line == "END LC_IDENTIFICATION":
+                    break
+                elif in_identification and line.startswith(("language ", "territory ")):
+                    key, _, value = line.partition(" ")
+                    names[key] = value.strip().strip('"')
+    except OSError:
+        pass
+    return names.get("language"), names.get("territory")
+
+def read_country_names(path=ISO3166_PATH):
+    """Return a mapping of ISO 3166 country codes to English names"""
+    names = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.startswith("#") and "\t" in line:
+                    code, name = line.rstrip("\n").split("\t", 1)
+                    names[code] = name
+    except OSError:
+        pass
+    return names
+
+def build_catalog(codes, locales_dir):
+    """Build the serialisable catalog rows for a list of locale codes"""
+    country_names = read_country_names()
+    rows = []
+    seen = set()
+    for code in codes:
+        if code in seen:
+            continue
+        seen.add(code)
+        language, territory, source_name = split_locale(code)
+        english_name, territory_name = read_identification(os.path.join(locales_dir, source_name))
+        english_name = english_name or language
+        territory_name = territory_name or country_names.get(territory, territory)
+        rows.append([code, language, territory, english_name, territory_name])
+    return rows
+
+def load_locales(supported_path=SUPPORTED_PATH, locales_dir=LOCALES_DIR):
+    """Return the sorted list of selectable locales"""
+    key = cache.source_key(supported_path, locales_dir)
+    rows = cache.load("locales", key)
+    if rows is None:
+        try:
+            codes = read_supported(supported_path)
+        except OSError:
+            codes = read_installed()
+        rows = build_catalog(codes or FALLBACK_LOCALES, locales_dir)
+        cache.store("locales", key, rows)
+
+    locales = []
+    for code, language, territory, english_name, territory_name in rows:
+        name = NATIVE_LANGUAGE_NAMES.get(language, english_name)
+        search_key = fold_text(" ".join((name, english_name, territory_name, code)))
+        locales.append(Locale(code, language, territory, name, english_name,
+                              territory_name, search_key))
+    locales.sort(key=lambda l: (fold_text(l.name), l.territory_name))
+    return locales
@@ -0,0 +1,634 @@
+"""
+Wi-Fi access through NetworkManager's D-Bus API
+
+open_backend() connects to NetworkManager and finds a Wi-Fi device without
+blocking the main loop: every D-Bus round trip is an async call whose
+reply arrives as a main-loop callback. A scan is RequestScan, a wait for
+the device's LastScan property to change, then GetAllAccessPoints and one
+Properties.GetAll per access point, all issued at once. When there is no
+NetworkManager or no Wi-Fi device, a DemoBackend with canned networks is
+used instead. ScanScheduler repeats scans in the background while the
+Wi-Fi page is visible, less often while results stay the same.
+
+Connecting is AddAndActivateConnection followed by the device's
+StateChanged signals, reported to the page as ConnectionState stages
+until the device is activated, fails, or the attempt times out.
+
+ZENOS_NM_BUS selects the bus: "system" (default), "session" to talk to a
+stand-in service such as fake_networkmanager.py, or "demo".
+"""
+
+import os
+from collections import namedtuple
+
+from gi.repository import Gio, GLib
+
+NM_BUS_NAME = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+NM_INTERFACE = "org.freedesktop.NetworkManager"
+DEVICE_INTERFACE = "org.freedesktop.NetworkManager.Device"
+WIRELESS_INTERFACE = "org.freedesktop.NetworkManager.Device.Wireless"
+AP_INTERFACE = "org.freedesktop.NetworkManager.AccessPoint"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+BUS_ENV_VAR = "ZENOS_NM_BUS"
+
+DEVICE_TYPE_WIFI = 2
+# D-Bus call timeout, and how long a requested scan may take to finish
+CALL_TIMEOUT_MS = 10000
+SCAN_TIMEOUT_MS = 15000
+DEMO_SCAN_MS = 1500
+
+# How long a connection attempt may take before it is given up
+CONNECT_TIMEOUT_MS = 45000
+DEMO_CONNECT_STEP_MS = 700
+
+# Background scan interval: back to the minimum whenever results change,
+# doubled after every scan that changes nothing
+SCAN_INTERVAL_MIN_MS = 10000
+SCAN_INTERVAL_MAX_MS = 120000
+SCAN_BACKOFF = 2
+# Refresh requests closer than this to the last scan are merged into one
+REFRESH_MIN_GAP_MS = 3000
+# Rescan this soon after a failed connection; the network may have moved
+FAILED_CONNECTION_SCAN_MS = 2000
+
+# NM80211ApFlags and NM80211ApSecurityFlags
+AP_FLAGS_PRIVACY = 0x1
+KEY_MGMT_PSK = 0x100
+KEY_MGMT_802_1X = 0x200
+KEY_MGMT_SAE = 0x400
+KEY_MGMT_OWE = 0x800
+
+# NMDeviceState
+DEVICE_STATE_DISCONNECTED = 30
+DEVICE_STATE_PREPARE = 40
+DEVICE_STATE_CONFIG = 50
+DEVICE_STATE_NEED_AUTH = 60
+DEVICE_STATE_IP_CONFIG = 70
+DEVICE_STATE_SECONDARIES = 90
+DEVICE_STATE_ACTIVATED = 100
+DEVICE_STATE_FAILED = 120
+
+# NMDeviceStateReason values with a message of their own
+FAILURE_REASONS = {
+    5: "No IP address was offered",  # IP_CONFIG_UNAVAILABLE
+    7: "The password was missing or wrong",  # NO_SECRETS
+    8: "The network rejected the password",  # SUPPLICANT_DISCONNECT
+    9: "The network settings were not accepted",  # SUPPLICANT_CONFIG_FAILED
+    11: "The network did not answer",  # SUPPLICANT_TIMEOUT
+    17: "No IP address was offered",  # DHCP_FAILED
+    53: "The network is out of range",  # SSID_NOT_FOUND
+}
+
+# 802-11-wireless-security key-mgmt per security label
+KEY_MANAGEMENT = {"WPA": "wpa-psk", "WPA2": "wpa-psk", "WPA3": "sae", "WEP": "none"}
+
+# Connection stages reported to the page
+STAGE_ASSOCIATING = "associating"
+STAGE_AUTHENTICATING = "authenticating"
+STAGE_OBTAINING_IP = "obtaining-ip"
+STAGE_CONNECTED = "connected"
+STAGE_FAILED = "failed"
+
+# Progress of a connection attempt; reason explains STAGE_FAILED
+ConnectionState = namedtuple("ConnectionState", "stage ssid reason")
+
+# One BSSID as reported by NetworkManager; strength is 0-100
+AccessPoint = namedtuple("AccessPoint", "path ssid bssid strength frequency security")
+
+def describe_security(flags, wpa_flags, rsn_flags):
+    """Short security label from an access point's flag properties"""
+    if rsn_flags & KEY_MGMT_802_1X or wpa_flags & KEY_MGMT_802_1X:
+        return "Enterprise"
+    if rsn_flags & KEY_MGMT_SAE:
+        return "WPA3"
+    if rsn_flags & KEY_MGMT_PSK:
+        return "WPA2"
+    if wpa_flags & KEY_MGMT_PSK:
+        return "WPA"
+    if rsn_flags & KEY_MGMT_OWE:
+        return "Open"  # Enhanced Open needs no password
+    if flags & AP_FLAGS_PRIVACY:
+        return "WEP"
+    return "Open"
+
+def parse_access_point(path, properties):
+    """Build an AccessPoint from its GetAll properties; None for hidden networks"""
+    ssid = bytes(properties.get("Ssid", b"")).decode("utf-8", "replace")
+    if not ssid.strip("\0"):
+        return None
+    return AccessPoint(path, ssid, properties.get("HwAddress", ""),
+                       properties.get("Strength", 0), properties.get("Frequency", 0),
+                       describe_security(properties.get("Flags", 0),
+                                         properties.get("WpaFlags", 0),
+                                         properties.get("RsnFlags", 0)))
+
+def signal_bars(strength):
+    """Bar glyphs for a 0-100 signal strength"""
+    return "▂▄▆█"[:max(1, min(4, (strength + 24) // 25))]
+
+def failure_reason(reason):
+    """Message for an NMDeviceStateReason"""
+    return FAILURE_REASONS.get(reason, f"NetworkManager gave up (reason {reason})")
+
+def connection_settings(network, password):
+    """AddAndActivateConnection settings for a Network, or None if unsupported"""
+    settings = {
+        "connection": {
+            "id": GLib.Variant("s", network.ssid),
+            "type": GLib.Variant("s", "802-11-wireless"),
+        },
+        "802-11-wireless": {
+            "ssid": GLib.Variant("ay", network.ssid.encode("utf-8")),
+            "mode": GLib.Variant("s", "infrastructure"),
+        },
+    }
+    if network.security == "Open":
+        return settings
+    key_management = KEY_MANAGEMENT.get(network.security)
+    if key_management is None:
+        return None
+    security = {"key-mgmt": GLib.Variant("s", key_management)}
+    if key_management == "none":
+        security["wep-key0"] = GLib.Variant("s", password)
+    else:
+        security["psk"] = GLib.Variant("s", password)
+    settings["802-11-wireless-security"] = security
+    return settings
+
+def error_message(error):
+    """Readable text of a GLib.Error from a D-Bus call"""
+    if Gio.DBusError.is_remote_error(error):
+        Gio.DBusError.strip_remote_error(error)
+    return error.message
+
+def call_soon(function, *args):
+    """Run function(*args) once from the main loop"""
+    def on_idle():
+        function(*args)
+        return False  # Don't repeat idle callback
+    GLib.idle_add(on_idle)
+
+def get_all_properties(connection, bus_name, paths, interface, cancellable, callback):
+    """Fetch all properties of interface on every path concurrently
+
+    Calls callback({path: properties}) once every reply is in; objects that
+    fail (e.g. an access point that vanished) are left out.
+    """
+    results = {}
+    remaining = [len(paths)]
+    if not paths:
+        call_soon(callback, results)
+        return
+
+    def on_reply(source, result, path):
+        try:
+            results[path] = connection.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            if e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                return
+        remaining[0] -= 1
+        if not remaining[0]:
+            callback(results)
+
+    for path in paths:
+        connection.call(bus_name, path, PROPERTIES_INTERFACE, "GetAll",
+                        GLib.Variant("(s)", (interface,)), GLib.VariantType("(a{sv})"),
+                        Gio.DBusCallFlags.NONE, CALL_TIMEOUT_MS, cancellable, on_reply, path)
+
+class NetworkBackend:
+    """What the Wi-Fi page needs from a network service
+
+    Callbacks run on the main loop and take (result, error), where error is
+    None or a message; cancelled operations never call back.
+    """
+    name = ""
+
+    def scan(self, callback, cancellable=None):
+        """Ask for a fresh scan, then deliver callback([AccessPoint], error)"""
+        raise NotImplementedError
+
+    def activate(self, network, password, callback, cancellable=None):
+        """Connect to a backend.access_points.Network
+
+        Delivers callback(ConnectionState) for every stage reached, ending
+        with STAGE_CONNECTED or STAGE_FAILED. Cancelling abandons the
+        attempt without a final state.
+        """
+        raise NotImplementedError
+
+class DemoBackend(NetworkBackend):
+    """Canned networks, for machines without NetworkManager"""
+    name = "demo"
+
+    ACCESS_POINTS = [
+        AccessPoint("/demo/1", "HomeNetwork_5G", "02:00:00:00:00:01", 85, 5180, "WPA2"),
+        AccessPoint("/demo/2", "CoffeeShop_WiFi", "02:00:00:00:00:02", 70, 2437, "Open"),
+        AccessPoint("/demo/3", "Neighbor_WiFi", "02:00:00:00:00:03", 60, 2412, "WPA3"),
+        AccessPoint("/demo/4", "Office_Guest", "02:00:00:00:00:04", 45, 2462, "WPA2"),
+        AccessPoint("/demo/5", "Mobile_Hotspot", "02:00:00:00:00:05", 30, 2437, "WPA2"),
+    ]
+
+    def scan(self, callback, cancellable=None):
+        def on_timeout():
+            if cancellable is None or not cancellable.is_cancelled():
+                callback(list(self.ACCESS_POINTS), None)
+            return False  # Don't repeat timeout
+        GLib.timeout_add(DEMO_SCAN_MS, on_timeout)
+
+    def activate(self, network, password, callback, cancellable=None):
+        secured = network.security != "Open"
+        stages = [ConnectionState(STAGE_ASSOCIATING, network.ssid, "")]
+        if secured:
+            stages.append(ConnectionState(STAGE_AUTHENTICATING, network.ssid, ""))
+        if secured and len(password) < 8:
+            # WPA passphrases are at least 8 characters
+            stages.append(ConnectionState(STAGE_FAILED, network.ssid, failure_reason(8)))
+        else:
+            stages.append(ConnectionState(STAGE_OBTAINING_IP, network.ssid, ""))
+            stages.append(ConnectionState(STAGE_CONNECTED, network.ssid, ""))
+
+        def on_timeout():
+            if cancellable is not None and cancellable.is_cancelled():
+                return False  # Don't repeat timeout
+            callback(stages.pop(0))
+            return bool(stages)
+
+        GLib.timeout_add(DEMO_CONNECT_STEP_MS, on_timeout)
+
+class NetworkManagerBackend(NetworkBackend):
+    """A NetworkManager Wi-Fi device"""
+    name = "networkmanager"
+
+    def __init__(self, connection, bus_name, device_proxy, state_proxy):
+        self.connection = connection
+        self.bus_name = bus_name
+        # Proxy for the Wireless interface; it caches LastScan and follows
+        # PropertiesChanged
+        self.device_proxy = device_proxy
+        # Proxy for the Device interface, whose StateChanged signals follow
+        # a connection attempt
+        self.state_proxy = state_proxy
+
+    def last_scan(self):
+        value = self.device_proxy.get_cached_property("LastScan")
+        return value.unpack() if value is not None else -1
+
+    def scan(self, callback, cancellable=None):
+        previous = self.last_scan()
+
+        def on_requested(proxy, result):
+            try:
+                proxy.call_finish(result)
+            except GLib.Error as e:
+                if e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                    return
+                # NM refuses scans right after the previous one; its list
+                # is fresh then anyway
+                print(f"Warning: Wi-Fi scan request failed: {error_message(e)}")
+                self.get_access_points(callback, cancellable)
+                return
+            self.wait_for_scan(previous, callback, cancellable)
+
+        self.device_proxy.call("RequestScan", GLib.Variant("(a{sv})", ({},)),
+                               Gio.DBusCallFlags.NONE, CALL_TIMEOUT_MS, cancellable, on_requested)
+
+    def wait_for_scan(self, previous, callback, cancellable):
+        """Fetch the list once LastScan moves on (or the scan times out)"""
+        pending = {}
+
+        def finish(fetch):
+            if not pending:
+                return  # Already finished
+            self.device_proxy.disconnect(pending.pop("changed"))
+            timeout_id = pending.pop("timeout")
+            if timeout_id:
+                GLib.source_remove(timeout_id)
+            if cancellable is not None:
+                cancellable.disconnect(pending.pop("cancelled"))
+            if fetch:
+                self.get_access_points(callback, cancellable)
+
+        def on_properties_changed(proxy, changed, invalidated):
+            if "LastScan" in changed.unpack() and self.last_scan() != previous:
+                finish(True)
+
+        def on_timeout():
+            pending["timeout"] = None
+            finish(True)
+            return False  # Don't repeat timeout
+
+        pending["changed"] = self.device_proxy.connect("g-properties-changed",
+                                                       on_properties_changed)
+        pending["timeout"] = GLib.timeout_add(SCAN_TIMEOUT_MS, on_timeout)
+        if cancellable is not None:
+            # Cancellation may be signalled off the main loop, and must not
+            # disconnect from inside its own handler
+            pending["cancelled"] = cancellable.connect(lambda source: call_soon(finish, False))
+
+    def get_access_points(self, callback, cancellable=None):
+        """Deliver callback([AccessPoint], error) for the current scan results"""
+        def on_paths(proxy, result):
+            try:
+                paths = proxy.call_finish(result).unpack()[0]
+            except GLib.Error as e:
+                if not e.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                    callback([], error_message(e))
+                return
+            get_all_properties(self.connection, self.bus_name, paths, AP_INTERFACE,
+                               cancellable, on_properties)
+
+        def on_properties(results):
+            access_points = []
+            for path, properties in results.items():
+                access_point = parse_access_point(path, properties)
+                if access_point is not None:
+                    access_points.append(access_point)
+            callback(access_points, None)
+
+        self.device_proxy.call("GetAllAccessPoints", None, Gio.DBusCallFlags.NONE,
+                               CALL_TIMEOUT_MS, cancellable, on_paths)
+
+    def activate(self, network, password, callback, cancellable=None):
+        settings = connection_settings(network, password)
+        if settings is None:
+            call_soon(callback, ConnectionState(STAGE_FAILED, network.ssid,
+                                                f"{network.security} networks are not supported"))
+            return
+        activation = Activation(self, network, callback, cancellable)
+        # Not cancellable: the reply carries the active connection that
+        # cancelling has to deactivate
+        self.connection.call(self.bus_name, NM_PATH, NM_INTERFACE, "AddAndActivateConnection",
+                             GLib.Variant("(a{sa{sv}}oo)", (settings,
+                                                            self.device_proxy.get_object_path(),
+                                                            network.path or "/")),
+                             GLib.VariantType("(oo)"), Gio.DBusCallFlags.NONE, CALL_TIMEOUT_MS,
+                             None, activation.on_added)
+
+    def deactivate(self, active_connection):
+        """Tear down an active connection, without waiting for the reply"""
+        self.connection.call(self.bus_name, NM_PATH, NM_INTERFACE, "DeactivateConnection",
+                             GLib.Variant("(o)", (active_connection,)), None,
+                             Gio.DBusCallFlags.NONE, CALL_TIMEOUT_MS, None, None)
+
+class Activation:
+    """One connection attempt, followed through the device's StateChanged signals"""
+    def __init__(self, backend, network, callback, cancellable):
+        self.backend = backend
+        self.network = network
+        self.callback = callback
+        self.stage = None
+        # The device may still report states of its previous connection
+        # until this one is being prepared
+        self.started = False
+        self.active_connection = None
+        self.done = False
+        self.signal_id = backend.state_proxy.connect("g-signal", self.on_signal)
+        self.timeout_source = GLib.timeout_add(CONNECT_TIMEOUT_MS, self.on_timeout)
+        self.cancellable = cancellable
+        self.cancelled_id = 0
+        if cancellable is not None:
+            # Disconnecting from inside the cancelled handler would deadlock
+            self.cancelled_id = cancellable.connect(lambda source: call_soon(self.on_cancelled))
+
+    def report(self, stage, reason=""):
+        if self.cancellable is not None and self.cancellable.is_cancelled():
+            return  # Cancelled; cleanup is still to run from the main loop
+        if stage != self.stage:
+            self.stage = stage
+            self.callback(ConnectionState(stage, self.network.ssid, reason))
+
+    def finish(self, stage=None, reason=""):
+        """Stop following the device, reporting a final stage if given"""
+        if self.done:
+            return
+        self.done = True
+        self.backend.state_proxy.disconnect(self.signal_id)
+        if self.timeout_source:
+            GLib.source_remove(self.timeout_source)
+            self.timeout_source = 0
+        if self.cancelled_id:
+            self.cancellable.disconnect(self.cancelled_id)
+            self.cancelled_id = 0
+        if stage is not None:
+            self.report(stage, reason)
+
+    def abandon(self):
+        """Undo what NetworkManager started for this attempt"""
+        if self.active_connection is not None:
+            self.backend.deactivate(self.active_connection)
+
+    def on_added(self, connection, result):
+        try:
+            _, self.active_connection = connection.call_finish(result).unpack()
+        except GLib.Error as e:
+            self.finish(STAGE_FAILED, error_message(e))
+            return
+        if self.done and self.stage != STAGE_CONNECTED:
+            # Cancelled or timed out before NetworkManager answered
+            self.abandon()
+
+    def on_signal(self, proxy, sender, signal, parameters):
+        if signal != "StateChanged" or self.done:
+            return
+        state, old_state, reason = parameters.unpack()
+        if DEVICE_STATE_PREPARE <= state <= DEVICE_STATE_SECONDARIES:
+            self.started = True
+        if not self.started:
+            return
+        if state == DEVICE_STATE_ACTIVATED:
+            self.finish(STAGE_CONNECTED)
+        elif state == DEVICE_STATE_FAILED or state <= DEVICE_STATE_DISCONNECTED:
+            self.finish(STAGE_FAILED, failure_reason(reason))
+        elif state == DEVICE_STATE_PREPARE:
+            self.report(STAGE_ASSOCIATING)
+        elif state == DEVICE_STATE_CONFIG:
+            # CONFIG covers association and the key handshake
+            self.report(STAGE_ASSOCIATING if self.network.security == "Open"
+                        else STAGE_AUTHENTICATING)
+        elif state == DEVICE_STATE_NEED_AUTH:
+            self.report(STAGE_AUTHENTICATING)
+        elif state >= DEVICE_STATE_IP_CONFIG:
+            self.report(STAGE_OBTAINING_IP)
+
+    def on_timeout(self):
+        self.timeout_source = 0
+        self.finish(STAGE_FAILED, "Timed out")
+        self.abandon()
+        return False  # Don't repeat timeout
+
+    def on_cancelled(self):
+        if not self.done:
+            self.finish()
+            self.abandon()
+
+class ScanScheduler:
+    """Background scans for a NetworkBackend while started
+
+    started() is called when a scan begins and finished(access_points,
+    error) when it completes; finished returns whether the results changed
+    anything, which decides between the minimum and a backed-off interval.
+    stop() cancels a scan in flight, so nothing is delivered after it.
+    """
+    def __init__(self, backend, started, finished):
+        self.backend = backend
+        self.started = started
+        self.finished = finished
+        self.running = False
+        self.interval = SCAN_INTERVAL_MIN_MS
+        self.timeout_source = 0
+        # Cancellable of the scan in flight
+        self.cancellable = None
+        self.last_finished = None
+
+    def now_ms(self):
+        return GLib.get_monotonic_time() // 1000
+
+    def since_last_scan(self):
+        if self.last_finished is None:
+            return None
+        return self.now_ms() - self.last_finished
+
+    def start(self):
+        """Scan now if the last results are stale, then keep scanning"""
+        if self.running:
+            return
+        self.running = True
+        elapsed = self.since_last_scan()
+        if elapsed is None or elapsed >= self.interval:
+            self.scan()
+        else:
+            self.schedule(self.interval - elapsed)
+
+    def stop(self):
+        """Stop scanning and cancel the scan in flight"""
+        self.running = False
+        self.unschedule()
+        if self.cancellable is not None:
+            self.cancellable.cancel()
+            self.cancellable = None
+
+    def request_scan(self):
+        """Scan soon on the user's request; repeated requests make one scan"""
+        if not self.running or self.cancellable is not None:
+            return  # The scan in flight answers this request
+        self.interval = SCAN_INTERVAL_MIN_MS
+        elapsed = self.since_last_scan()
+        if elapsed is not None and elapsed < REFRESH_MIN_GAP_MS:
+            self.schedule(REFRESH_MIN_GAP_MS - elapsed)
+        else:
+            self.scan()
+
+    def connection_failed(self):
+        """Scan again shortly and keep the interval short"""
+        self.interval = SCAN_INTERVAL_MIN_MS
+        if self.running and self.cancellable is None:
+            self.schedule(FAILED_CONNECTION_SCAN_MS)
+
+    def schedule(self, delay_ms):
+        self.unschedule()
+        self.timeout_source = GLib.timeout_add(delay_ms, self.on_timeout)
+
+    def unschedule(self):
+        if self.timeout_source:
+            GLib.source_remove(self.timeout_source)
+            self.timeout_source = 0
+
+    def on_timeout(self):
+        self.timeout_source = 0
+        self.scan()
+        return False  # Don't repeat timeout
+
+    def scan(self):
+        self.unschedule()
+        self.cancellable = Gio.Cancellable()
+        self.started()
+        self.backend.scan(self.on_scan_finished, self.cancellable)
+
+    def on_scan_finished(self, access_points, error):
+        self.cancellable = None
+        self.last_finished = self.now_ms()
+        changed = self.finished(access_points, error)
+        if error or changed:
+            self.interval = SCAN_INTERVAL_MIN_MS
+        else:
+            self.interval = min(self.interval * SCAN_BACKOFF, SCAN_INTERVAL_MAX_MS)
+        if self.running:
+            self.schedule(self.interval)
+
+def open_backend(callback, cancellable=None):
+    """Find a NetworkManager Wi-Fi device and deliver callback(NetworkBackend)
+
+    Falls back to a DemoBackend when NetworkManager is not running or has
+    no Wi-Fi device.
+    """
+    bus = os.environ.get(BUS_ENV_VAR, "system")
+
+    def use_demo(reason):
+        print(f"Warning: Using demo Wi-Fi networks: {reason}")
+        callback(DemoBackend())
+
+    if bus == "demo":
+        call_soon(callback, DemoBackend())
+        return
+
+    def on_bus(source, result):
+        try:
+            connection = Gio.bus_get_finish(result)
+        except GLib.Error as e:
+            use_demo(error_message(e))
+            return
+        Gio.DBusProxy.new(connection, Gio.DBusProxyFlags.DO_NOT_AUTO_START, None, NM_BUS_NAME,
+                          NM_PATH, NM_INTERFACE, cancellable, on_manager, connection)
+
+    def on_manager(source, result, connection):
+        try:
+            manager = Gio.DBusProxy.new_finish(result)
+        except GLib.Error as e:
+            use_demo(error_message(e))
+            return
+        if manager.get_name_owner() is None:
+            use_demo("NetworkManager is not running")
+            return
+        manager.call("GetDevices", None, Gio.DBusCallFlags.NONE, CALL_TIMEOUT_MS, cancellable,
+                     on_devices, connection)
+
+    def on_devices(manager, result, connection):
+        try:
+            paths = manager.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            use_demo(error_message(e))
+            return
+        get_all_properties(connection, NM_BUS_NAME, paths, DEVICE_INTERFACE,
+                           cancellable, lambda devices: on_device_properties(connection, devices))
+
+    def on_device_properties(connection, devices):
+        for path in sorted(devices):
+            if devices[path].get("DeviceType") == DEVICE_TYPE_WIFI:
+                Gio.DBusProxy.new(connection, Gio.DBusProxyFlags.DO_NOT_AUTO_START, None,
+                                  NM_BUS_NAME, path, WIRELESS_INTERFACE, cancellable,
+                                  on_device, connection)
+                return
+        use_demo("no Wi-Fi device found")
+
+    def on_device(source, result, connection):
+        try:
+            device_proxy = Gio.DBusProxy.new_finish(result)
+        except GLib.Error as e:
+            use_demo(error_message(e))
+            return
+        Gio.DBusProxy.new(connection, Gio.DBusProxyFlags.DO_NOT_AUTO_START, None, NM_BUS_NAME,
+                          device_proxy.get_object_path(), DEVICE_INTERFACE, cancellable,
+                          on_state_proxy, connection, device_proxy)
+
+    def on_state_proxy(source, result, connection, device_proxy):
+        try:
+            state_proxy = Gio.DBusProxy.new_finish(result)
+        except GLib.Error as e:
+            use_demo(error_message(e))
+            return
+        callback(NetworkManagerBackend(connection, NM_BUS_NAME, device_proxy, state_proxy))
+
+    bus_type = Gio.BusType.SESSION if bus == "session" else Gio.BusType.SYSTEM
+    Gio.bus_get(bus_type, cancellable, on_bus)
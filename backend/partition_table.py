@@ -0,0 +1,301 @@
+"""
+Editable partition table for manual partitioning
+
+read_table() loads an existing GPT (or an MBR with only primary
+partitions) from a device or image file with a single pread covering the
+MBR, GPT header and entry array. PartitionTable keeps the partitions
+sorted by start offset, so overlap checks are a bisect against the
+neighbours, and records every create/delete/resize as a journal of pending
+edits on top of the table as read. Nothing touches the disk until
+commit() writes the final table.
+"""
+
+import bisect
+import fcntl
+import os
+import stat
+import struct
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import gpt
+from .partitioning import (ALIGNMENT, ESP_TYPE, SWAP_TYPE, LINUX_DATA_TYPE, ROOT_TYPES,
+                           align_up, align_down)
+
+BLKSSZGET = 0x1268
+
+MICROSOFT_DATA_TYPE = uuid.UUID("ebd0a0a2-b9e5-4433-87c0-68b6b72699c7")
+LVM_TYPE = uuid.UUID("e6d6d379-f507-44c2-a23c-238f2a3df928")
+
+# Types offered by the editor, in menu order
+PARTITION_TYPES = [
+    ("Linux filesystem", LINUX_DATA_TYPE),
+    ("EFI System", ESP_TYPE),
+    ("Linux swap", SWAP_TYPE),
+    ("Linux LVM", LVM_TYPE),
+    ("Microsoft basic data", MICROSOFT_DATA_TYPE),
+]
+TYPE_LABELS = {type_guid: label for label, type_guid in PARTITION_TYPES}
+TYPE_LABELS.update((type_guid, "Linux root") for type_guid in ROOT_TYPES.values())
+
+# MBR system IDs mapped to their GPT equivalents
+MBR_TYPES = {
+    0x07: MICROSOFT_DATA_TYPE, 0x0B: MICROSOFT_DATA_TYPE, 0x0C: MICROSOFT_DATA_TYPE,
+    0x82: SWAP_TYPE, 0x83: LINUX_DATA_TYPE, 0x8E: LVM_TYPE, 0xEF: ESP_TYPE,
+}
+MBR_EXTENDED_TYPES = (0x05, 0x0F, 0x85)
+MBR_ENTRY_FORMAT = struct.Struct("<B3sB3sII")
+
+TablePartition = namedtuple("TablePartition", "number start size type_guid unique_guid name")
+# unique_guid is chosen when a create is recorded, so replaying the journal
+# after an undo keeps every new partition's GUID
+Edit = namedtuple("Edit", "action number start size type_guid unique_guid name")
+
+class TableError(Exception):
+    """An edit does not fit the table, or the table could not be read"""
+
+def type_label(type_guid):
+    """Human name of a partition type"""
+    return TYPE_LABELS.get(type_guid, "Unknown")
+
+def parse_mbr(buffer, sector_size):
+    """Return the primary partitions of an MBR
+
+    Logical partitions are not read, and committing would convert the disk
+    to GPT without them, so an extended partition is refused.
+    """
+    partitions = []
+    for slot in range(4):
+        _, _, system_id, _, first_lba, sectors = MBR_ENTRY_FORMAT.unpack_from(
+            buffer, gpt.MBR_PARTITION_OFFSET + slot * MBR_ENTRY_FORMAT.size)
+        if system_id in MBR_EXTENDED_TYPES and sectors:
+            raise TableError("Disks with logical partitions cannot be edited here; "
+                             "use erase or another partitioning tool")
+        if system_id == 0 or not sectors:
+            continue
+        partitions.append(TablePartition(slot + 1, first_lba * sector_size, sectors * sector_size,
+                                         MBR_TYPES.get(system_id, LINUX_DATA_TYPE),
+                                         uuid.uuid4(), ""))
+    return partitions
+
+def gpt_partitions(slots, sector_size):
+    """Convert GPT entry slots into TablePartitions numbered by slot"""
+    return [TablePartition(number, entry.first_lba * sector_size,
+                           (entry.last_lba - entry.first_lba + 1) * sector_size,
+                           entry.type_guid, entry.unique_guid, entry.name)
+            for number, entry in enumerate(slots, 1) if entry is not None]
+
+def logical_sector_size(fd):
+    """Logical sector size of a block device, 512 for image files"""
+    if not stat.S_ISBLK(os.fstat(fd).st_mode):
+        return 512
+    return struct.unpack("i", fcntl.ioctl(fd, BLKSSZGET, struct.pack("i", 0)))[0]
+
+def read_table(path):
+    """Read the partition table of a device or image file"""
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        disk_size = os.lseek(fd, 0, os.SEEK_END)
+        sector_size = logical_sector_size(fd)
+        # MBR, primary GPT header and the standard entry array in one read
+        buffer = os.pread(fd, (2 + gpt.entry_array_sectors(sector_size)) * sector_size, 0)
+        signature = buffer[gpt.MBR_SIGNATURE_OFFSET:gpt.MBR_SIGNATURE_OFFSET + 2]
+        if signature != b"\x55\xaa":
+            return PartitionTable(disk_size, sector_size)
+
+        header = gpt.parse_header(buffer, sector_size)
+        array_offset = header["entries_lba"] * sector_size if header else 0
+        if header is None and buffer[gpt.MBR_PARTITION_OFFSET + 4] == gpt.PROTECTIVE_TYPE:
+            # Damaged primary header: fall back to the backup at the last sector
+            backup = os.pread(fd, sector_size, disk_size - sector_size)
+            header = gpt.parse_header(backup)
+            if header is None:
+                raise TableError(f"{path} has a GPT with no valid header")
+            array_offset = header["entries_lba"] * sector_size
+        if header is None:
+            return PartitionTable(disk_size, sector_size, "mbr", parse_mbr(buffer, sector_size))
+
+        array_length = header["entry_count"] * header["entry_size"]
+        if array_offset + array_length > len(buffer):
+            # Entry array outside the usual place
+            buffer = os.pread(fd, array_length, array_offset)
+            array_offset = 0
+    finally:
+        os.close(fd)
+    try:
+        slots = gpt.parse_entries(buffer, header, array_offset)
+    except gpt.GptError as e:
+        raise TableError(f"{path}: {e}") from e
+    return PartitionTable(disk_size, sector_size, "gpt", gpt_partitions(slots, sector_size),
+                          header["disk_guid"])
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="partition-table")
+
+def submit_read_table(path):
+    """Read a table on a worker thread and return a Future of the PartitionTable"""
+    return _executor.submit(read_table, path)
+
+class PartitionTable:
+    """Partitions sorted by start, plus a journal of pending edits
+
+    Offsets and sizes are in bytes. `partitions` is the table with all
+    pending edits applied; `base` is the table as read from the disk.
+    """
+    def __init__(self, disk_size, sector_size=512, scheme=None, partitions=(), disk_guid=None):
+        self.disk_size = disk_size
+        self.sector_size = sector_size
+        self.scheme = scheme
+        self.disk_guid = disk_guid
+        first_lba, last_lba = gpt.usable_lbas(disk_size, sector_size)
+        self.usable_start = first_lba * sector_size
+        self.usable_end = (last_lba + 1) * sector_size
+        self.base = sorted(partitions, key=lambda partition: partition.start)
+        self.journal = []
+        self.reset()
+
+    def reset(self):
+        """Rebuild the current table from the base"""
+        self.partitions = list(self.base)
+        self.starts = [partition.start for partition in self.partitions]
+
+    def index_of(self, number):
+        """Position of a partition number in the sorted table"""
+        for index, partition in enumerate(self.partitions):
+            if partition.number == number:
+                return index
+        raise TableError(f"There is no partition {number}")
+
+    def check_aligned(self, *offsets):
+        """New boundaries must be aligned; existing starts are left as they are"""
+        if any(offset % ALIGNMENT for offset in offsets):
+            raise TableError("Partitions must start and end on 1 MiB boundaries")
+
+    def check_bounds(self, start, end, index, skip=None):
+        """Check [start, end) against the disk and the partitions around index
+
+        index is where a partition starting at start sits in the sorted
+        table; skip is the position of a partition being resized.
+        """
+        if start < self.usable_start or end > self.usable_end:
+            raise TableError("Partition extends outside the usable area of the disk")
+        before = index - 1
+        after = index if skip is None else index + 1
+        if before >= 0 and self.partitions[before].start + self.partitions[before].size > start:
+            raise TableError(f"Overlaps partition {self.partitions[before].number}")
+        if after < len(self.partitions) and self.partitions[after].start < end:
+            raise TableError(f"Overlaps partition {self.partitions[after].number}")
+
+    def next_number(self):
+        """Lowest unused partition number"""
+        used = {partition.number for partition in self.partitions}
+        number = 1
+        while number in used:
+            number += 1
+        if number > gpt.ENTRY_COUNT:
+            raise TableError(f"At most {gpt.ENTRY_COUNT} partitions fit in a GPT")
+        return number
+
+    def apply(self, edit):
+        """Validate and apply one edit to the current table"""
+        if edit.action in ("create", "resize") and edit.size <= 0:
+            raise TableError("Partitions must not be empty")
+        if edit.action == "create":
+            self.check_aligned(edit.start, edit.start + edit.size)
+            index = bisect.bisect_right(self.starts, edit.start)
+            self.check_bounds(edit.start, edit.start + edit.size, index)
+            partition = TablePartition(edit.number, edit.start, edit.size, edit.type_guid,
+                                       edit.unique_guid, edit.name)
+            self.partitions.insert(index, partition)
+            self.starts.insert(index, edit.start)
+        elif edit.action == "delete":
+            index = self.index_of(edit.number)
+            del self.partitions[index]
+            del self.starts[index]
+        elif edit.action == "resize":
+            index = self.index_of(edit.number)
+            partition = self.partitions[index]
+            self.check_aligned(partition.start + edit.size)
+            self.check_bounds(partition.start, partition.start + edit.size, index, skip=index)
+            self.partitions[index] = partition._replace(size=edit.size)
+        else:
+            raise TableError(f"Unknown edit {edit.action!r}")
+
+    def record(self, edit):
+        """Apply an edit and journal it"""
+        self.apply(edit)
+        self.journal.append(edit)
+        return edit
+
+    def create(self, start, size, type_guid=LINUX_DATA_TYPE, name=""):
+        """Queue a new partition; returns its number"""
+        return self.record(Edit("create", self.next_number(), start, size, type_guid,
+                                uuid.uuid4(), name)).number
+
+    def delete(self, number):
+        """Queue deleting a partition"""
+        self.record(Edit("delete", number, None, None, None, None, None))
+
+    def resize(self, number, size):
+        """Queue changing a partition's size; its start stays put"""
+        self.record(Edit("resize", number, None, size, None, None, None))
+
+    def undo(self):
+        """Drop the last pending edit"""
+        if not self.journal:
+            return
+        self.journal.pop()
+        self.reset()
+        for edit in self.journal:
+            self.apply(edit)
+
+    def max_size(self, number):
+        """Largest size a partition can be resized to without moving its start"""
+        index = self.index_of(number)
+        partition = self.partitions[index]
+        limit = self.usable_end
+        if index + 1 < len(self.partitions):
+            limit = self.partitions[index + 1].start
+        return max(align_down(limit) - partition.start, partition.size)
+
+    def free_regions(self):
+        """Aligned [(start, size)] gaps between partitions"""
+        regions = []
+        cursor = align_up(self.usable_start)
+        for partition in self.partitions + [None]:
+            end = self.usable_end if partition is None else partition.start
+            end -= end % ALIGNMENT
+            if end - cursor >= ALIGNMENT:
+                regions.append((cursor, end - cursor))
+            if partition is not None:
+                cursor = max(cursor, align_up(partition.start + partition.size))
+        return regions
+
+    def validate(self):
+        """Check the whole table for overlaps in one pass over sorted starts"""
+        ordered = sorted(self.partitions, key=lambda partition: partition.start)
+        for previous, partition in zip(ordered, ordered[1:]):
+            if previous.start + previous.size > partition.start:
+                raise TableError(f"Partitions {previous.number} and {partition.number} overlap")
+        for partition in ordered:
+            if partition.start < self.usable_start or partition.start + partition.size > self.usable_end:
+                raise TableError(f"Partition {partition.number} is outside the usable area")
+
+    def gpt_entries(self):
+        """Entry slots for the current table, keeping partition numbers"""
+        slots = [None] * max((partition.number for partition in self.partitions), default=0)
+        for partition in self.partitions:
+            first_lba = partition.start // self.sector_size
+            last_lba = (partition.start + partition.size) // self.sector_size - 1
+            slots[partition.number - 1] = gpt.GptEntry(partition.type_guid, partition.unique_guid,
+                                                       first_lba, last_lba, 0, partition.name)
+        return slots
+
+    def commit(self, path):
+        """Write the final table as a GPT (MBR disks are converted)"""
+        self.validate()
+        self.disk_guid = gpt.write_gpt(path, self.gpt_entries(), self.disk_size,
+                                       self.sector_size, self.disk_guid)
+        self.scheme = "gpt"
+        self.base = list(self.partitions)
+        self.journal = []
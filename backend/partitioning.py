@@ -0,0 +1,133 @@
+"""
+Partition layout planning for the "erase" install type
+
+plan_erase() turns a disk record and the page's options into a GPT layout:
+an EFI system partition, an optional swap partition sized from RAM, and a
+root partition (optionally a LUKS container) filling the rest. Every
+boundary is aligned to 1 MiB. Planning is plain arithmetic on its inputs,
+so the same disk and options always give the same plan and the disk page
+can re-plan on every option change.
+"""
+
+import os
+import platform
+import uuid
+from collections import namedtuple
+
+from . import gpt
+from .disks import PROCFS_ROOT
+
+MiB = 1024 * 1024
+GiB = 1024 * MiB
+
+ALIGNMENT = MiB
+ESP_SIZE = 512 * MiB
+MIN_ROOT_SIZE = 8 * GiB
+# Swap never takes more than this share of the disk
+MAX_SWAP_FRACTION = 0.1
+
+ESP_TYPE = uuid.UUID("c12a7328-f81f-11d2-ba4b-00a0c93ec93b")
+SWAP_TYPE = uuid.UUID("0657fd6d-a4ab-43c4-84e5-0933c84b4f4f")
+LINUX_DATA_TYPE = uuid.UUID("0fc63daf-8483-4772-8e79-3d69d8477de4")
+# Discoverable Partitions Specification root types
+ROOT_TYPES = {
+    "x86_64": uuid.UUID("4f68bce3-e8cd-4db1-96e7-fbcaf984b709"),
+    "aarch64": uuid.UUID("b921b045-1df0-41c3-af44-4c6f280d3fae"),
+    "riscv64": uuid.UUID("72ec70a6-cf74-40e6-bd49-4bda08e8f224"),
+}
+
+PlannedPartition = namedtuple("PlannedPartition",
+                              "number path label type_guid start size filesystem mountpoint encrypted")
+Plan = namedtuple("Plan", "disk_path disk_size sector_size partitions")
+
+class PlanError(Exception):
+    """The disk cannot hold the requested layout"""
+
+def align_up(value, alignment=ALIGNMENT):
+    return -(-value // alignment) * alignment
+
+def align_down(value, alignment=ALIGNMENT):
+    return value // alignment * alignment
+
+def read_memory_size(procfs_root=PROCFS_ROOT):
+    """Return MemTotal from /proc/meminfo in bytes, or 0 if unknown"""
+    try:
+        with open(os.path.join(procfs_root, "meminfo"), encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+def swap_size_for(memory_size):
+    """Swap size for an amount of RAM, rounded to the alignment"""
+    if memory_size <= 2 * GiB:
+        size = 2 * memory_size
+    elif memory_size <= 8 * GiB:
+        size = memory_size
+    elif memory_size <= 64 * GiB:
+        size = memory_size // 2
+    else:
+        size = 32 * GiB
+    return align_up(size)
+
+def partition_path(disk_path, number):
+    """'/dev/sda', 1 -> '/dev/sda1'; '/dev/nvme0n1', 1 -> '/dev/nvme0n1p1'"""
+    separator = "p" if disk_path[-1:].isdigit() else ""
+    return f"{disk_path}{separator}{number}"
+
+def plan_erase(disk, swap=True, encrypt=False, memory_size=None, machine=None):
+    """Return the Plan that replaces everything on disk
+
+    disk is a backend.disks.Disk; memory_size and machine default to this
+    system's RAM and architecture.
+    """
+    sector_size = disk.queue.logical_block_size or 512
+    first_lba, last_lba = gpt.usable_lbas(disk.size, sector_size)
+    start = align_up(first_lba * sector_size)
+    end = align_down((last_lba + 1) * sector_size)
+
+    if memory_size is None:
+        memory_size = read_memory_size()
+    swap_size = 0
+    if swap and memory_size:
+        swap_size = min(swap_size_for(memory_size), align_down(int(disk.size * MAX_SWAP_FRACTION)))
+
+    if end - start - ESP_SIZE - swap_size < MIN_ROOT_SIZE:
+        # Give up swap before giving up on the disk
+        swap_size = 0
+    root_size = end - start - ESP_SIZE - swap_size
+    if root_size < MIN_ROOT_SIZE:
+        raise PlanError(f"{disk.path} is too small: at least "
+                        f"{(ESP_SIZE + MIN_ROOT_SIZE) // GiB} GiB is needed")
+
+    root_type = ROOT_TYPES.get(machine or platform.machine(), LINUX_DATA_TYPE)
+    layout = [("EFI System", ESP_TYPE, ESP_SIZE, "vfat", "/boot/efi", False)]
+    if swap_size:
+        layout.append(("swap", SWAP_TYPE, swap_size, "swap", "", encrypt))
+    layout.append(("root", root_type, root_size, "ext4", "/", encrypt))
+
+    partitions = []
+    for number, (label, type_guid, size, filesystem, mountpoint, encrypted) in enumerate(layout, 1):
+        partitions.append(PlannedPartition(number, partition_path(disk.path, number), label,
+                                           type_guid, start, size, filesystem, mountpoint,
+                                           encrypted))
+        start += size
+    return Plan(disk.path, disk.size, sector_size, partitions)
+
+def gpt_entries(plan, guids=None):
+    """GPT entries for a plan; guids optionally fixes the partition GUIDs"""
+    entries = []
+    for index, partition in enumerate(plan.partitions):
+        first_lba = partition.start // plan.sector_size
+        last_lba = (partition.start + partition.size) // plan.sector_size - 1
+        unique_guid = guids[index] if guids else uuid.uuid4()
+        entries.append(gpt.GptEntry(partition.type_guid, unique_guid, first_lba, last_lba,
+                                    0, partition.label))
+    return entries
+
+def write_plan(plan, path=None, disk_guid=None, guids=None):
+    """Write the plan's partition table to its disk (or to path, e.g. an image)"""
+    return gpt.write_gpt(path or plan.disk_path, gpt_entries(plan, guids), plan.disk_size,
+                         plan.sector_size, disk_guid)
@@ -0,0 +1,98 @@
+"""
+Progress reporting between install workers and the UI
+
+Worker threads update a ProgressChannel under a lock as they go; the UI
+polls snapshot() from a main-loop timer, so neither side ever waits on the
+other. Throughput and ETA are smoothed with an exponential moving average
+sampled at most a few times per second.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+# Seconds between rate samples, and the weight of each new sample
+SAMPLE_INTERVAL = 0.25
+SMOOTHING = 0.3
+
+# done/total count source bytes (of the image, or of the files in a tree
+# copy); written counts bytes that reached the target
+Progress = namedtuple("Progress", "phase done total written rate eta finished error")
+
+class Cancelled(Exception):
+    """The installation was cancelled from the UI"""
+
+class ProgressChannel:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+        self.phase = ""
+        self.done = 0
+        self.total = 0
+        self.written = 0
+        self.finished = False
+        self.error = None
+        self.reset_rates()
+
+    def reset_rates(self):
+        self.write_rate = 0.0
+        self.done_rate = 0.0
+        self.sample_time = time.monotonic()
+        self.sample_done = self.done
+        self.sample_written = self.written
+
+    def start_phase(self, phase, total=0):
+        """Begin a new step; done restarts at zero, written keeps counting"""
+        with self.lock:
+            self.phase = phase
+            self.done = 0
+            self.total = total
+            self.reset_rates()
+
+    def add_total(self, amount):
+        """Grow the current phase's total as more work is discovered"""
+        with self.lock:
+            self.total += amount
+
+    def advance(self, done, written=0):
+        """Record finished work units and bytes written"""
+        with self.lock:
+            self.done += done
+            self.written += written
+            now = time.monotonic()
+            elapsed = now - self.sample_time
+            if elapsed >= SAMPLE_INTERVAL:
+                done_rate = (self.done - self.sample_done) / elapsed
+                write_rate = (self.written - self.sample_written) / elapsed
+                if self.done_rate:
+                    done_rate = SMOOTHING * done_rate + (1 - SMOOTHING) * self.done_rate
+                    write_rate = SMOOTHING * write_rate + (1 - SMOOTHING) * self.write_rate
+                self.done_rate = done_rate
+                self.write_rate = write_rate
+                self.sample_time = now
+                self.sample_done = self.done
+                self.sample_written = self.written
+
+    def finish(self, error=None):
+        """Mark the installation as over, successfully or with an error message"""
+        with self.lock:
+            self.finished = True
+            self.error = error
+
+    def cancel(self):
+        """Ask the worker to stop at its next check"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise Cancelled in the worker if the UI asked to stop"""
+        if self.cancel_event.is_set():
+            raise Cancelled("Installation cancelled")
+
+    def snapshot(self):
+        """Return a consistent Progress for the UI"""
+        with self.lock:
+            eta = None
+            if self.done_rate > 0 and self.total > self.done:
+                eta = (self.total - self.done) / self.done_rate
+            return Progress(self.phase, self.done, self.total, self.written,
+                            self.write_rate, eta, self.finished, self.error)
@@ -0,0 +1,55 @@
+"""
+Text normalisation shared by the search filters
+"""
+
+import unicodedata
+
+def fold_text(text):
+    """Lowercase text and strip accents so 'Français' matches 'francais'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+def trigrams(text):
+    """Set of padded character trigrams of already-folded text"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    """Fuzzy matcher over a fixed list of folded keys
+
+    Each key is split into trigrams once; a query only touches the posting
+    lists of its own trigrams, so lookups stay cheap for a few thousand keys.
+    """
+    def __init__(self, keys, postings=None):
+        self.keys = keys
+        if postings is None:
+            postings = {}
+            for position, key in enumerate(keys):
+                for gram in trigrams(key):
+                    postings.setdefault(gram, []).append(position)
+        self.postings = postings
+
+    def search(self, query, limit=10, min_similarity=0.35):
+        """Return [(score, position)] for the best matching keys, best first"""
+        query = fold_text(query).strip()
+        if not query:
+            return []
+        grams = trigrams(query)
+        hits = {}
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                hits[position] = hits.get(position, 0) + 1
+
+        results = []
+        for position, count in hits.items():
+            score = count / len(grams)
+            key = self.keys[position]
+            if key.startswith(query):
+                score += 1.0
+            elif query in key:
+                score += 0.5
+            elif score < min_similarity:
+                continue
+            results.append((score, -len(key), position))
+        results.sort(reverse=True)
+        return [(score, position) for score, _, position in results[:limit]]
@@ -0,0 +1,299 @@
+"""
+Timezone catalog for the timezone page
+
+Reads the system tz database once (zone1970.tab and zone.tab for zones
+with coordinates, tzdata.zi or zoneinfo.available_timezones() as
+fallbacks), indexes it by region and caches the parsed rows keyed by the
+source files' mtimes. The catalog also carries search aliases (tzdata
+links, country names, common city names) for the fuzzy search index.
+"""
+
+import os
+from collections import namedtuple
+
+from . import cache
+from .search import TrigramIndex, fold_text
+
+ZONEINFO_DIR = "/usr/share/zoneinfo"
+DEFAULT_TIMEZONE = "Europe/London"
+
+# Bump when the cached data layout changes
+CATALOG_FORMAT = 3
+
+REGIONS = (
+    "Africa", "America", "Antarctica", "Arctic", "Asia",
+    "Atlantic", "Australia", "Europe", "Indian", "Pacific",
+)
+
+Timezone = namedtuple("Timezone", "name region city latitude longitude countries")
+
+# Names people search for that are not in the tz database
+COMMON_ALIASES = {
+    "Bangalore": "Asia/Kolkata", "Beijing": "Asia/Shanghai",
+    "Boston": "America/New_York", "Delhi": "Asia/Kolkata",
+    "Dubai": "Asia/Dubai", "Hong Kong": "Asia/Hong_Kong",
+    "Miami": "America/New_York", "Montreal": "America/Toronto",
+    "Munich": "Europe/Berlin", "New York City": "America/New_York",
+    "NYC": "America/New_York", "San Francisco": "America/Los_Angeles",
+    "Seattle": "America/Los_Angeles", "Washington": "America/New_York",
+    "Barcelona": "Europe/Madrid", "Milan": "Europe/Rome",
+    "Osaka": "Asia/Tokyo", "Rio de Janeiro": "America/Sao_Paulo",
+    "St Petersburg": "Europe/Moscow", "Zurich": "Europe/Zurich",
+}
+
+# Fallback zone per language when the locale has no territory
+LANGUAGE_TIMEZONES = {
+    "ar": "Asia/Riyadh", "bg": "Europe/Sofia", "cs": "Europe/Prague",
+    "da": "Europe/Copenhagen", "de": "Europe/Berlin", "el": "Europe/Athens",
+    "en": "Europe/London", "es": "Europe/Madrid", "et": "Europe/Tallinn",
+    "fa": "Asia/Tehran", "fi": "Europe/Helsinki", "fr": "Europe/Paris",
+    "he": "Asia/Jerusalem", "hi": "Asia/Kolkata", "hr": "Europe/Zagreb",
+    "hu": "Europe/Budapest", "id": "Asia/Jakarta", "is": "Atlantic/Reykjavik",
+    "it": "Europe/Rome", "ja": "Asia/Tokyo", "ko": "Asia/Seoul",
+    "lt": "Europe/Vilnius", "lv": "Europe/Riga", "ms": "Asia/Kuala_Lumpur",
+    "nb": "Europe/Oslo", "nl": "Europe/Amsterdam", "nn": "Europe/Oslo",
+    "pl": "Europe/Warsaw", "pt": "Europe/Lisbon", "ro": "Europe/Bucharest",
+    "ru": "Europe/Moscow", "sk": "Europe/Bratislava", "sl": "Europe/Ljubljana",
+    "sr": "Europe/Belgrade", "sv": "Europe/Stockholm", "th": "Asia/Bangkok",
+    "tr": "Europe/Istanbul", "uk": "Europe/Kyiv", "vi": "Asia/Ho_Chi_Minh",
+    "zh": "Asia/Shanghai",
+}
+
+# Main zone of countries with several; zone.tab lists them roughly east to
+# west or north to south, not by population
+PRIMARY_TIMEZONES = {
+    "AR": "America/Argentina/Buenos_Aires", "AU": "Australia/Sydney",
+    "BR": "America/Sao_Paulo", "CA": "America/Toronto", "CD": "Africa/Kinshasa",
+    "CL": "America/Santiago", "CN": "Asia/Shanghai", "CY": "Asia/Nicosia",
+    "DE": "Europe/Berlin", "EC": "America/Guayaquil", "ES": "Europe/Madrid",
+    "FM": "Pacific/Pohnpei", "GL": "America/Nuuk", "ID": "Asia/Jakarta",
+    "KI": "Pacific/Tarawa", "KZ": "Asia/Almaty", "MH": "Pacific/Majuro",
+    "MN": "Asia/Ulaanbaatar", "MX": "America/Mexico_City", "MY": "Asia/Kuala_Lumpur",
+    "NZ": "Pacific/Auckland", "PF": "Pacific/Tahiti", "PG": "Pacific/Port_Moresby",
+    "PS": "Asia/Hebron", "PT": "Europe/Lisbon", "RU": "Europe/Moscow",
+    "UA": "Europe/Kyiv", "US": "America/New_York", "UZ": "Asia/Tashkent",
+}
+
+def primary_zone(country, zones, language=""):
+    """The zone to suggest for a country among its zones
+
+    The country's entry in PRIMARY_TIMEZONES wins, then the language's zone
+    when it lies in that country, then the first zone listed.
+    """
+    for name in (PRIMARY_TIMEZONES.get(country), LANGUAGE_TIMEZONES.get(language)):
+        if name in zones:
+            return name
+    return zones[0] if zones else None
+
+def parse_coordinate(text, degree_digits):
+    """Convert a signed ISO 6709 DDMM[SS] / DDDMM[SS] value to degrees"""
+    sign = -1 if text[0] == "-" else 1
+    digits = text[1:]
+    degrees = int(digits[:degree_digits])
+    minutes = int(digits[degree_digits:degree_digits + 2])
+    seconds = int(digits[degree_digits + 2:] or 0)
+    return sign * (degrees + minutes / 60 + seconds / 3600)
+
+def parse_coordinates(text):
+    """Convert an ISO 6709 pair such as '+4030-07400' to (latitude, longitude)"""
+    split = max(text.rfind("+"), text.rfind("-"))
+    return (round(parse_coordinate(text[:split], 2), 4),
+            round(parse_coordinate(text[split:], 3), 4))
+
+def read_zone_tab(path):
+    """Return [name, latitude, longitude, countries] rows from zone1970.tab or zone.tab"""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 3:
+                continue
+            latitude, longitude = parse_coordinates(fields[1])
+            rows.append([fields[2], latitude, longitude, fields[0].split(",")])
+    return rows
+
+def read_tzdata_zi(path):
+    """Return (zone names, {alias: target}) from the compact tzdata.zi"""
+    zones = []
+    links = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Z "):
+                zones.append(line.split(None, 2)[1])
+            elif line.startswith("L "):
+                _, target, alias = line.split()
+                links[alias] = target
+    return zones, links
+
+def is_selectable(name):
+    """Only offer Region/City zones from the geographic regions"""
+    return "/" in name and name.split("/", 1)[0] in REGIONS
+
+def city_label(name):
+    """'America/Argentina/Buenos_Aires' -> 'Buenos Aires, Argentina'"""
+    parts = name.split("/")[1:]
+    return ", ".join(part.replace("_", " ") for part in reversed(parts))
+
+def read_country_names(path):
+    """Return {country code: English name} from iso3166.tab"""
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith("#") and "\t" in line:
+                code, name = line.rstrip("\n").split("\t", 1)
+                names[code] = name
+    return names
+
+def build_data(zoneinfo_dir):
+    """Parse the best available tz sources into serialisable catalog data"""
+    rows = {}
+    country_zones = {}
+    # zone.tab keeps one zone per country (Europe/Oslo, ...) so users find
+    # their own city; zone1970.tab merges zones that agree since 1970
+    for filename in ("zone.tab", "zone1970.tab"):
+        try:
+            for row in read_zone_tab(os.path.join(zoneinfo_dir, filename)):
+                for country in row[3]:
+                    zones = country_zones.setdefault(country, [])
+                    if row[0] not in zones:
+                        zones.append(row[0])
+                if row[0] in rows:
+                    countries = rows[row[0]][3]
+                    countries.extend(c for c in row[3] if c not in countries)
+                else:
+                    rows[row[0]] = row
+        except OSError:
+            pass
+
+    try:
+        zones, links = read_tzdata_zi(os.path.join(zoneinfo_dir, "tzdata.zi"))
+    except OSError:
+        zones, links = [], {}
+    if not rows:
+        if not zones:
+            import zoneinfo
+            zones = sorted(zoneinfo.available_timezones())
+        rows = {name: [name, None, None, []] for name in zones}
+
+    # Search aliases: old and alternative tz names, then common city names,
+    # then country names pointing at the country's main zone
+    aliases = [[alias.replace("_", " "), target] for alias, target in sorted(links.items())
+               if target in rows]
+    aliases.extend([alias, target] for alias, target in sorted(COMMON_ALIASES.items())
+                   if target in rows)
+    try:
+        country_names = read_country_names(os.path.join(zoneinfo_dir, "iso3166.tab"))
+    except OSError:
+        country_names = {}
+    for country, zones in sorted(country_zones.items()):
+        if country in country_names:
+            aliases.append([country_names[country], primary_zone(country, zones)])
+
+    return {"zones": list(rows.values()), "countries": country_zones, "aliases": aliases}
+
+class TimezoneCatalog:
+    def __init__(self, data, cache_key=None):
+        zones = [Timezone(name, name.split("/", 1)[0], city_label(name), latitude, longitude,
+                          tuple(countries))
+                 for name, latitude, longitude, countries in data["zones"] if is_selectable(name)]
+        zones.sort(key=lambda zone: (zone.region, zone.city))
+        self.zones = zones
+        self.regions = [region for region in REGIONS if any(zone.region == region for zone in zones)]
+        # Region -> zones sorted by city, and name -> (region, position)
+        self.by_region = {region: [] for region in self.regions}
+        self.by_name = {}
+        for zone in zones:
+            cities = self.by_region[zone.region]
+            self.by_name[zone.name] = (zone.region, len(cities))
+            cities.append(zone)
+        self.country_zones = data["countries"]
+        self.aliases = data["aliases"]
+        self.cache_key = cache_key
+        self.search_index = None
+        self.search_targets = None
+
+    def cities(self, region):
+        """Zones of a region in display order"""
+        return self.by_region.get(region, [])
+
+    def get(self, name):
+        """Return the Timezone for a zone name, or None"""
+        location = self.by_name.get(name)
+        if location is None:
+            return None
+        region, position = location
+        return self.by_region[region][position]
+
+    def locate(self, name):
+        """Return (region index, city index) for a zone name, or None"""
+        location = self.by_name.get(name)
+        if location is None:
+            return None
+        region, position = location
+        return self.regions.index(region), position
+
+    def build_search_index(self):
+        """Index zone names, city labels and aliases by trigram"""
+        if self.cache_key is not None:
+            cached = cache.load("timezone-search", self.cache_key)
+            if cached is not None:
+                self.search_index = TrigramIndex(cached["keys"], cached["postings"])
+                self.search_targets = cached["targets"]
+                return
+
+        keys = []
+        targets = []
+        for zone in self.zones:
+            keys.append(fold_text(zone.city))
+            targets.append(zone.name)
+            keys.append(fold_text(zone.name.replace("_", " ")))
+            targets.append(zone.name)
+        for alias, target in self.aliases:
+            if target in self.by_name:
+                keys.append(fold_text(alias))
+                targets.append(target)
+        self.search_index = TrigramIndex(keys)
+        self.search_targets = targets
+        if self.cache_key is not None:
+            cache.store("timezone-search", self.cache_key,
+                        {"keys": keys, "targets": targets, "postings": self.search_index.postings})
+
+    def search(self, query, limit=8):
+        """Return the best matching Timezones for a free-text query"""
+        if self.search_index is None:
+            self.build_search_index()
+        results = []
+        seen = set()
+        # Over-fetch since several keys can point at the same zone
+        for score, position in self.search_index.search(query, limit * 3):
+            name = self.search_targets[position]
+            if name not in seen:
+                seen.add(name)
+                results.append(self.get(name))
+                if len(results) == limit:
+                    break
+        return results
+
+    def timezone_for_locale(self, language, territory=""):
+        """Guess a zone from a locale: its territory first, then its language"""
+        zones = [name for name in self.country_zones.get(territory, ()) if name in self.by_name]
+        if zones:
+            return primary_zone(territory, zones, language)
+        name = LANGUAGE_TIMEZONES.get(language)
+        if name in self.by_name:
+            return name
+        return DEFAULT_TIMEZONE
+
+def load_catalog(zoneinfo_dir=ZONEINFO_DIR):
+    """Return the timezone catalog, parsing tzdata only when it changed"""
+    key = [CATALOG_FORMAT] + cache.source_key(os.path.join(zoneinfo_dir, "zone1970.tab"),
+                                              os.path.join(zoneinfo_dir, "zone.tab"),
+                                              os.path.join(zoneinfo_dir, "tzdata.zi"),
+                                              os.path.join(zoneinfo_dir, "iso3166.tab"))
+    data = cache.load("timezones", key)
+    if data is None:
+        data = build_data(zoneinfo_dir)
+        cache.store("timezones", key, data)
+    return TimezoneCatalog(data, key)
@@ -0,0 +1,180 @@
+"""
+XKB layout registry for the keyboard page
+
+Streams /usr/share/X11/xkb/rules/evdev.xml with iterparse, clearing each
+element once it has been read so the file never lives as a full tree, and
+flattens it into array/dict indexes:
+
+    entries            [[layout, variant, description], ...]
+    language_entries   {iso639 code: [entry index, ...]}
+
+The index is cached keyed by the registry's mtime.
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from . import cache
+from .search import fold_text
+
+EVDEV_XML_PATH = "/usr/share/X11/xkb/rules/evdev.xml"
+ISO_CODES_DIR = "/usr/share/iso-codes/json"
+DEFAULT_LANGUAGE = "eng"
+
+# Bump when the cached data layout changes
+INDEX_FORMAT = 1
+
+# Used when the XKB registry is not installed
+FALLBACK_REGISTRY = [
+    # layout, variant, description, languages
+    ("us", "", "English (US)", ["eng"]),
+    ("us", "dvorak", "English (Dvorak)", ["eng"]),
+    ("us", "colemak", "English (Colemak)", ["eng"]),
+    ("gb", "", "English (UK)", ["eng"]),
+    ("es", "", "Spanish", ["spa"]),
+    ("fr", "", "French", ["fra"]),
+    ("fr", "bepo", "French (BEPO)", ["fra"]),
+    ("de", "", "German", ["deu"]),
+    ("it", "", "Italian", ["ita"]),
+    ("pt", "", "Portuguese", ["por"]),
+    ("ru", "", "Russian", ["rus"]),
+    ("cn", "", "Chinese", ["zho"]),
+    ("jp", "", "Japanese", ["jpn"]),
+    ("kr", "", "Korean", ["kor"]),
+    ("ara", "", "Arabic", ["ara"]),
+]
+
+def read_config_item(element):
+    """Return (name, description, languages) of a <configItem>"""
+    name = element.findtext("name", "")
+    description = element.findtext("description", "") or name
+    languages = [code.text for code in element.iterfind("languageList/iso639Id") if code.text]
+    return name, description, languages
+
+def parse_registry(path):
+    """Stream the registry into [(layout, variant, description, languages)]"""
+    registry = []
+    stack = []
+    layout_name = None
+    layout_languages = []
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            stack.append(element.tag)
+            continue
+        stack.pop()
+        tag = element.tag
+        if tag == "configItem" and stack[-2:] == ["layoutList", "layout"]:
+            layout_name, description, layout_languages = read_config_item(element)
+            registry.append((layout_name, "", description, layout_languages))
+        elif tag == "configItem" and stack[-1:] == ["variant"] and layout_name:
+            name, description, languages = read_config_item(element)
+            # Variants without their own language list inherit the layout's
+            registry.append((layout_name, name, description, languages or layout_languages))
+        elif tag == "layout":
+            layout_name = None
+            element.clear()
+        elif tag in ("variant", "model", "group", "option"):
+            element.clear()
+    return registry
+
+def read_language_names(codes, iso_codes_dir=ISO_CODES_DIR):
+    """Return {iso639 code: English name} for the given codes"""
+    names = {}
+    for filename, key in (("iso_639-2.json", "639-2"), ("iso_639-3.json", "639-3")):
+        missing = set(codes) - set(names)
+        if not missing:
+            break
+        try:
+            with open(os.path.join(iso_codes_dir, filename), encoding="utf-8") as f:
+                entries = json.load(f)[key]
+        except (OSError, ValueError, KeyError):
+            continue
+        for entry in entries:
+            name = entry.get("common_name") or entry.get("name")
+            for field in ("alpha_3", "bibliographic"):
+                if entry.get(field) in missing:
+                    names[entry[field]] = name
+    return names
+
+def build_index(registry, iso_codes_dir=ISO_CODES_DIR):
+    """Flatten a parsed registry into the cached index layout"""
+    entries = []
+    language_entries = {}
+    for layout, variant, description, languages in registry:
+        position = len(entries)
+        entries.append([layout, variant, description])
+        for code in languages:
+            language_entries.setdefault(code, []).append(position)
+    names = read_language_names(language_entries, iso_codes_dir)
+    languages = sorted(([code, names.get(code, code)] for code in language_entries),
+                       key=lambda language: language[1].casefold())
+    return {"entries": entries, "languages": languages, "language_entries": language_entries}
+
+class KeyboardIndex:
+    def __init__(self, data):
+        self.entries = data["entries"]
+        # [(iso639 code, English name)] sorted by name
+        self.languages = [tuple(language) for language in data["languages"]]
+        self.language_entries = data["language_entries"]
+        self.language_positions = {code: i for i, (code, _) in enumerate(self.languages)}
+        self.entry_positions = {(layout, variant): i
+                                for i, (layout, variant, _) in enumerate(self.entries)}
+        # Folded search keys, built on first search
+        self.entry_keys = None
+        self.language_keys = None
+
+    def layouts_for_language(self, code):
+        """Return the [layout, variant, description] entries for a language"""
+        return [self.entries[i] for i in self.language_entries.get(code, ())]
+
+    def build_search_index(self):
+        """Fold entry and language names once so matching is a substring test"""
+        self.entry_keys = [fold_text(f"{description} {layout} {variant}")
+                           for layout, variant, description in self.entries]
+        self.language_keys = {code: fold_text(f"{name} {code}") for code, name in self.languages}
+
+    def search(self, query, within=None):
+        """Return (language codes, entry positions) matching a folded query
+
+        A language matches on its own name or through any matching layout.
+        `within` is the result for a substring of the query: a longer query
+        can only drop matches, so only those candidates are re-checked.
+        """
+        if self.entry_keys is None:
+            self.build_search_index()
+        if within is None:
+            candidate_languages = self.language_keys
+            candidate_entries = range(len(self.entries))
+        else:
+            candidate_languages, candidate_entries = within
+        entries = {i for i in candidate_entries if query in self.entry_keys[i]}
+        languages = {code for code in candidate_languages
+                     if query in self.language_keys[code]
+                     or not entries.isdisjoint(self.language_entries[code])}
+        return languages, entries
+
+    def language_matches(self, code, query):
+        """Whether a language's own name contains a folded query"""
+        if self.language_keys is None:
+            self.build_search_index()
+        return query in self.language_keys.get(code, "")
+
+    def find_entry(self, layout, variant=""):
+        """Return the entry for a layout/variant pair, or None"""
+        position = self.entry_positions.get((layout, variant))
+        return None if position is None else self.entries[position]
+
+def load_index(path=EVDEV_XML_PATH, iso_codes_dir=ISO_CODES_DIR):
+    """Return the keyboard index, parsing the registry only when it changed"""
+    key = [INDEX_FORMAT] + cache.source_key(path, os.path.join(iso_codes_dir, "iso_639-3.json"))
+    data = cache.load("xkb", key)
+    if data is None:
+        try:
+            registry = parse_registry(path)
+        except (OSError, ET.ParseError) as e:
+            print(f"Warning: Could not read XKB registry {path}: {e}")
+            registry = FALLBACK_REGISTRY
+        data = build_index(registry, iso_codes_dir)
+        cache.store("xkb", key, data)
+    return KeyboardIndex(data)
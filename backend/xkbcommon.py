@@ -0,0 +1,132 @@
+"""
+Keymap compilation for the keyboard preview
+
+A small ctypes binding to libxkbcommon compiles a layout/variant from the
+XKB data files (no X server or Wayland compositor involved) and reads the
+unshifted and shifted symbol of every key on the main alphanumeric block.
+Compilation takes tens of milliseconds, so it runs on a single worker
+thread and the resulting key caps are kept in a small LRU.
+"""
+
+import ctypes
+import ctypes.util
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# XKB keycodes (evdev + 8) of the alphanumeric block, row by row
+KEY_ROWS = (
+    (49,) + tuple(range(10, 22)),         # TLDE, AE01-AE12
+    tuple(range(24, 36)) + (51,),         # AD01-AD12, BKSL
+    tuple(range(38, 49)),                 # AC01-AC11
+    (94,) + tuple(range(52, 62)),         # LSGT, AB01-AB10
+)
+
+class XkbRuleNames(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_char_p) for name in ("rules", "model", "layout", "variant", "options")]
+
+class XkbError(Exception):
+    """libxkbcommon is missing or could not compile a keymap"""
+
+_library = None
+
+def load_library():
+    """Load and prototype libxkbcommon once"""
+    global _library
+    if _library is not None:
+        return _library
+    name = ctypes.util.find_library("xkbcommon") or "libxkbcommon.so.0"
+    try:
+        lib = ctypes.CDLL(name)
+    except OSError as e:
+        raise XkbError(f"libxkbcommon not available: {e}") from e
+    lib.xkb_context_new.restype = ctypes.c_void_p
+    lib.xkb_context_new.argtypes = [ctypes.c_int]
+    lib.xkb_context_unref.argtypes = [ctypes.c_void_p]
+    lib.xkb_keymap_new_from_names.restype = ctypes.c_void_p
+    lib.xkb_keymap_new_from_names.argtypes = [ctypes.c_void_p, ctypes.POINTER(XkbRuleNames), ctypes.c_int]
+    lib.xkb_keymap_unref.argtypes = [ctypes.c_void_p]
+    lib.xkb_keymap_key_get_syms_by_level.restype = ctypes.c_int
+    lib.xkb_keymap_key_get_syms_by_level.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_uint32,
+        ctypes.POINTER(ctypes.POINTER(ctypes.c_uint32))]
+    lib.xkb_keysym_to_utf8.restype = ctypes.c_int
+    lib.xkb_keysym_to_utf8.argtypes = [ctypes.c_uint32, ctypes.c_char_p, ctypes.c_size_t]
+    _library = lib
+    return lib
+
+def keysym_text(lib, keymap, keycode, level, buffer):
+    """Return the printable text of a key at a shift level, or ''"""
+    syms = ctypes.POINTER(ctypes.c_uint32)()
+    count = lib.xkb_keymap_key_get_syms_by_level(keymap, keycode, 0, level, ctypes.byref(syms))
+    if count < 1:
+        return ""
+    length = lib.xkb_keysym_to_utf8(syms[0], buffer, len(buffer))
+    if length <= 1:
+        return ""
+    text = buffer.value.decode("utf-8", "replace")
+    return text if text.isprintable() else ""
+
+def compile_key_caps(layout, variant=""):
+    """Compile a keymap and return its key caps as rows of (base, shifted)"""
+    lib = load_library()
+    context = lib.xkb_context_new(0)
+    if not context:
+        raise XkbError("Could not create an XKB context")
+    try:
+        names = XkbRuleNames(b"evdev", b"pc105", layout.encode(), variant.encode(), None)
+        keymap = lib.xkb_keymap_new_from_names(context, ctypes.byref(names), 0)
+        if not keymap:
+            raise XkbError(f"Could not compile keymap {layout}({variant})")
+        try:
+            buffer = ctypes.create_string_buffer(8)
+            return tuple(tuple((keysym_text(lib, keymap, keycode, 0, buffer),
+                                keysym_text(lib, keymap, keycode, 1, buffer))
+                               for keycode in row)
+                         for row in KEY_ROWS)
+        finally:
+            lib.xkb_keymap_unref(keymap)
+    finally:
+        lib.xkb_context_unref(context)
+
+class KeymapCompiler:
+    """Compile key caps off the calling thread, caching the latest layouts"""
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.key_caps = OrderedDict()
+        self.lock = threading.Lock()
+        # One worker: compilations queue up instead of competing for CPU
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="xkb")
+
+    def lookup(self, layout, variant=""):
+        """Return cached key caps, or None if not compiled yet"""
+        key = (layout, variant)
+        with self.lock:
+            key_caps = self.key_caps.get(key)
+            if key_caps is not None:
+                self.key_caps.move_to_end(key)
+            return key_caps
+
+    def compile(self, layout, variant=""):
+        """Return the key caps for a layout, compiling on a cache miss"""
+        key_caps = self.lookup(layout, variant)
+        if key_caps is None:
+            key_caps = compile_key_caps(layout, variant)
+            with self.lock:
+                self.key_caps[(layout, variant)] = key_caps
+                if len(self.key_caps) > self.max_entries:
+                    self.key_caps.popitem(last=False)
+        return key_caps
+
+    def submit(self, layout, variant="", work=None):
+        """Compile on the worker thread and return a Future
+
+        `work`, if given, is called on the worker with the key caps and its
+        result becomes the Future's result, so rendering can share the trip.
+        """
+        def run():
+            key_caps = self.compile(layout, variant)
+            return key_caps if work is None else work(key_caps)
+        return self.executor.submit(run)
+
+keymap_compiler = KeymapCompiler()
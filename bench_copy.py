@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+File-tree copy benchmark
+
+Builds a synthetic root tree of many small files (nested directories,
+some hardlinks and symlinks), then copies it with backend.file_copier at
+each requested worker count and reports p50/p95 time and files per second.
+`cp -a` is timed as a baseline when available.
+
+    python3 bench_copy.py --files 20000 --workers 1,4,8 --runs 3
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.file_copier import copy_tree
+from backend.progress import ProgressChannel
+
+FILES_PER_DIRECTORY = 100
+# Every LINK_EVERY-th file gets a hardlink and a symlink next to it
+LINK_EVERY = 50
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def build_tree(root, files, mean_size, seed=0):
+    """Create files spread over two directory levels; return the bytes written"""
+    rng = random.Random(seed)
+    payload = os.urandom(mean_size * 4)
+    total = 0
+    for index in range(files):
+        directory = os.path.join(root, f"d{index // (FILES_PER_DIRECTORY ** 2)}",
+                                 f"d{index // FILES_PER_DIRECTORY}")
+        if index % FILES_PER_DIRECTORY == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"f{index}")
+        size = min(int(rng.expovariate(1 / mean_size)), len(payload))
+        with open(path, "wb") as f:
+            f.write(payload[:size])
+        os.chmod(path, 0o644 if index % 7 else 0o755)
+        total += size
+        if index % LINK_EVERY == 0:
+            os.link(path, path + ".link")
+            os.symlink(f"f{index}", path + ".sym")
+    return total
+
+
+def time_copy(source, target, workers, use_copy_file_range):
+    """Copy into a fresh target; return seconds"""
+    os.mkdir(target)
+    start = time.perf_counter()
+    copy_tree(source, target, ProgressChannel(), workers, use_copy_file_range)
+    return time.perf_counter() - start
+
+
+def time_cp(source, target):
+    """Time `cp -a` into a fresh target"""
+    start = time.perf_counter()
+    subprocess.run(["cp", "-a", source, target], check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="number of files")
+    parser.add_argument("--mean-size", type=int, default=4096, help="mean file size in bytes")
+    parser.add_argument("--workers", default="1,4,8", help="comma-separated worker counts")
+    parser.add_argument("-n", "--runs", type=int, default=3, help="copies per configuration")
+    parser.add_argument("--sendfile", action="store_true",
+                        help="use sendfile only, without copy_file_range")
+    parser.add_argument("--dir", help="directory for the trees (default: a temporary one)")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        source = os.path.join(tmp, "source")
+        total = build_tree(source, args.files, args.mean_size)
+        print(f"tree: {args.files} files, {total / 1024 / 1024:.1f} MiB")
+        print()
+
+        configurations = [(f"{workers} workers", int(workers))
+                          for workers in args.workers.split(",")]
+        if shutil.which("cp"):
+            configurations.append(("cp -a", None))
+        for label, workers in configurations:
+            times = []
+            for run in range(args.runs):
+                target = os.path.join(tmp, "target")
+                if workers is None:
+                    times.append(time_cp(source, target))
+                else:
+                    times.append(time_copy(source, target, workers, not args.sendfile))
+                shutil.rmtree(target)
+            p50 = percentile(times, 50)
+            results[label] = times
+            print(f"{label:10} p50 {p50 * 1000:8.1f} ms ({args.files / p50:8.0f} files/s)  "
+                  f"p95 {percentile(times, 95) * 1000:8.1f} ms")
+
+    if not results:
+        sys.exit("nothing was benchmarked")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Image writer benchmark
+
+Builds a synthetic sparse root image (data extents separated by holes,
+like a freshly built filesystem), compresses it with xz and zstd, then
+streams each variant into a sparse target file at a 1 MiB partition offset
+and reports p50/p95 throughput, the bytes actually written and the space
+allocated in the target (st_blocks). --no-discard writes every block, for
+comparison with the default hole-skipping writes.
+
+    python3 bench_install.py --size 1024 --runs 5 --formats raw,zstd,xz
+    python3 bench_install.py --size 1024 --no-discard
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.image_writer import BUFFER_SIZE, QUEUE_DEPTH, write_image
+from backend.progress import ProgressChannel
+
+MiB = 1024 * 1024
+PARTITION_OFFSET = MiB
+COMPRESSORS = {
+    "xz": (["xz", "-T0", "-1", "-k", "-f"], ".xz"),
+    "zstd": (["zstd", "-T0", "-q", "-k", "-f"], ".zst"),
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def build_image(path, size, fill):
+    """Write a sparse image with data in a fraction `fill` of its MiB blocks"""
+    # Half random, half repetitive so compressors see realistic ratios
+    block = os.urandom(MiB // 2) + bytes(range(256)) * (MiB // 512)
+    stride = max(1, round(1 / fill)) if fill > 0 else 0
+    with open(path, "wb") as f:
+        f.truncate(size)
+        if stride:
+            for index in range(0, size // MiB, stride):
+                f.seek(index * MiB)
+                f.write(block)
+
+
+def allocated(path):
+    """Bytes actually allocated to a file"""
+    return os.stat(path).st_blocks * 512
+
+
+def run_once(image, target, size, args):
+    """Write image into a fresh sparse target; return (seconds, bytes written)"""
+    with open(target, "wb") as f:
+        f.truncate(PARTITION_OFFSET + size)
+    channel = ProgressChannel()
+    start = time.perf_counter()
+    write_image(image, target, offset=PARTITION_OFFSET, channel=channel,
+                direct=not args.no_direct, buffer_size=args.buffer_size * MiB,
+                queue_depth=args.queue_depth, discard=not args.no_discard)
+    return time.perf_counter() - start, channel.snapshot().written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=512, help="image size in MiB")
+    parser.add_argument("--fill", type=float, default=0.25,
+                        help="fraction of the image holding data")
+    parser.add_argument("-n", "--runs", type=int, default=3, help="writes per format")
+    parser.add_argument("--formats", default="raw,zstd,xz", help="comma-separated formats")
+    parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE // MiB,
+                        help="pipeline buffer size in MiB")
+    parser.add_argument("--queue-depth", type=int, default=QUEUE_DEPTH,
+                        help="number of pipeline buffers")
+    parser.add_argument("--no-direct", action="store_true", help="do not try O_DIRECT")
+    parser.add_argument("--no-discard", action="store_true",
+                        help="write zero regions instead of discarding the target")
+    parser.add_argument("--dir", help="directory for the images (default: a temporary one)")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    size = args.size * MiB
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        raw = os.path.join(tmp, "rootfs.img")
+        build_image(raw, size, args.fill)
+        print(f"image: {args.size} MiB, {allocated(raw) / MiB:.0f} MiB allocated")
+
+        images = {}
+        for image_format in args.formats.split(","):
+            if image_format == "raw":
+                images["raw"] = raw
+                continue
+            command, suffix = COMPRESSORS[image_format]
+            if shutil.which(command[0]) is None:
+                print(f"{image_format}: {command[0]} not found, skipped")
+                continue
+            subprocess.run(command + [raw], check=True)
+            images[image_format] = raw + suffix
+            print(f"{image_format}: {os.path.getsize(raw + suffix) / MiB:.1f} MiB compressed")
+
+        target = os.path.join(tmp, "target.img")
+        print()
+        for image_format, image in images.items():
+            times = []
+            for run in range(args.runs):
+                seconds, written = run_once(image, target, size, args)
+                times.append(seconds)
+            p50 = percentile(times, 50)
+            p95 = percentile(times, 95)
+            results[image_format] = {
+                "seconds": times,
+                "written": written,
+                "target_allocated": allocated(target),
+            }
+            print(f"{image_format:5} p50 {p50 * 1000:8.1f} ms ({size / MiB / p50:7.1f} MiB/s)  "
+                  f"p95 {p95 * 1000:8.1f} ms  written {written / MiB:.0f} MiB  "
+                  f"target allocated {allocated(target) / MiB:.0f} MiB")
+
+    if not results:
+        sys.exit("no formats were benchmarked")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
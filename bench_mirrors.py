@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Mirror check benchmark
+
+Starts HTTP servers on loopback that answer HEAD requests after injected
+delays, plus a mirror that accepts connections but never answers and one
+whose port refuses them, then runs backend.connectivity.check_mirrors
+against them behind a fake default route. Reports p50/p95 wall time of
+the check against its deadline and whether the ranking follows the
+delays, and the time to answer offline without a route.
+
+    python3 bench_mirrors.py --delays 50,300,120,900 --deadline 0.5 --runs 10
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.connectivity import check_mirrors
+
+# /proc/net/route with and without a default route via eth0
+ROUTE_HEADER = ("Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\t"
+                "Window\tIRTT\n")
+DEFAULT_ROUTE = "eth0\t00000000\t0102A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n"
+LOCAL_ROUTE = "eth0\t0002A8C0\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0\n"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def start_server(delay):
+    """An HTTP server on a free loopback port answering after delay seconds"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def silent_port():
+    """A listening socket that is never accepted: connects succeed, nothing answers"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    return listener
+
+
+def refused_port():
+    """A loopback port nothing listens on"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def make_procfs(root, default_route):
+    """A procfs directory whose net/route has a default route or not"""
+    os.makedirs(os.path.join(root, "net"), exist_ok=True)
+    with open(os.path.join(root, "net", "route"), "w") as f:
+        f.write(ROUTE_HEADER + (DEFAULT_ROUTE if default_route else LOCAL_ROUTE))
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--delays", default="50,300,120,900",
+                        help="comma-separated answer delays of the mirrors in ms")
+    parser.add_argument("--deadline", type=float, default=0.5, help="check deadline in seconds")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="checks to time")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    delays = [int(delay) / 1000 for delay in args.delays.split(",")]
+    servers = [start_server(delay) for delay in delays]
+    listener = silent_port()
+    urls = [f"http://127.0.0.1:{server.server_address[1]}/zenos/" for server in servers]
+    urls.append(f"http://127.0.0.1:{listener.getsockname()[1]}/silent/")
+    urls.append(f"http://127.0.0.1:{refused_port()}/refused/")
+    expected = [url for delay, url in sorted(zip(delays, urls)) if delay < args.deadline]
+
+    results = {"online": [], "offline": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        online = make_procfs(os.path.join(tmp, "online"), True)
+        offline = make_procfs(os.path.join(tmp, "offline"), False)
+        ranked_correctly = 0
+        for run in range(args.runs):
+            start = time.perf_counter()
+            ranking = check_mirrors(urls, args.deadline, online)
+            results["online"].append(time.perf_counter() - start)
+            ranked_correctly += ranking.mirrors == expected
+
+            start = time.perf_counter()
+            ranking_offline = check_mirrors(urls, args.deadline, offline)
+            results["offline"].append(time.perf_counter() - start)
+            if ranking_offline.online:
+                sys.exit("offline check found a mirror")
+
+    for probe in ranking.probes:
+        if probe.error is None:
+            print(f"{probe.url:40} connect {probe.connect_time * 1000:6.1f} ms  "
+                  f"HEAD {probe.response_time * 1000:6.1f} ms")
+        else:
+            print(f"{probe.url:40} {probe.error}")
+    print()
+    for label, times in results.items():
+        print(f"{label:8} p50 {percentile(times, 50) * 1000:8.1f} ms  "
+              f"p95 {percentile(times, 95) * 1000:8.1f} ms  (deadline {args.deadline * 1000:.0f} ms)")
+    print(f"ranking as expected in {ranked_correctly}/{args.runs} runs")
+
+    listener.close()
+    for server in servers:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
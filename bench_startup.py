@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the installer
+
+Launches main.py repeatedly against a headless GDK backend, lets each run
+exit after its first frame and reports p50/p95 time-to-welcome-screen
+from the startup profiler's JSON reports.
+
+    python3 bench_startup.py --runs 20 --backend broadway
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DISPLAY_NUMBER = 42
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def start_display_server(backend):
+    """Start a headless display server and return (process, environment)"""
+    env = dict(os.environ)
+    if backend == "broadway":
+        server = shutil.which("gtk4-broadwayd")
+        if server is None:
+            sys.exit("gtk4-broadwayd not found; install GTK's broadway backend")
+        process = subprocess.Popen([server, f":{DISPLAY_NUMBER}"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env["GDK_BACKEND"] = "broadway"
+        env["BROADWAY_DISPLAY"] = f":{DISPLAY_NUMBER}"
+    else:
+        server = shutil.which("Xvfb")
+        if server is None:
+            sys.exit("Xvfb not found; install it or use --backend broadway")
+        process = subprocess.Popen([server, f":{DISPLAY_NUMBER}", "-screen", "0", "1280x800x24"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env["GDK_BACKEND"] = "x11"
+        env["DISPLAY"] = f":{DISPLAY_NUMBER}"
+    env.pop("WAYLAND_DISPLAY", None)
+    # Give the server a moment to open its socket
+    time.sleep(0.5)
+    return process, env
+
+
+def run_once(env, report_path, timeout):
+    """Run one cold start and return (wall seconds, report dict)"""
+    env = dict(env, ZENOS_PROFILE_STARTUP=report_path, PYTHONDONTWRITEBYTECODE="1")
+    start = time.monotonic()
+    subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, "main.py"), "--exit-after-first-frame"],
+                   env=env, cwd=SCRIPT_DIR, timeout=timeout,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.monotonic() - start
+    with open(report_path) as f:
+        return wall, json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=10, help="number of cold starts")
+    parser.add_argument("--backend", choices=("broadway", "x11"), default="broadway",
+                        help="headless GDK backend to render into")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-run timeout in seconds")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    server, env = start_display_server(args.backend)
+    first_frame_times = []
+    wall_times = []
+    rss = []
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in range(args.runs):
+                report_path = os.path.join(tmp, f"run-{run}.json")
+                try:
+                    wall, report = run_once(env, report_path, args.timeout)
+                except (subprocess.TimeoutExpired, OSError, ValueError) as e:
+                    print(f"run {run}: failed ({e})")
+                    continue
+                if report.get("time_to_first_frame") is None:
+                    print(f"run {run}: no frame was painted")
+                    continue
+                # Include interpreter startup so the number matches what users see
+                ttff = report["time_to_first_frame"] + (report.get("interpreter_startup") or 0.0)
+                first_frame_times.append(ttff)
+                wall_times.append(wall)
+                if "max_rss_kb" in report:
+                    rss.append(report["max_rss_kb"])
+                results.append(report)
+                print(f"run {run}: first frame {ttff * 1000:.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if not first_frame_times:
+        sys.exit("no successful runs")
+
+    print()
+    print(f"runs:               {len(first_frame_times)}/{args.runs}")
+    print(f"first frame p50:    {percentile(first_frame_times, 50) * 1000:.1f} ms")
+    print(f"first frame p95:    {percentile(first_frame_times, 95) * 1000:.1f} ms")
+    print(f"process wall p50:   {percentile(wall_times, 50) * 1000:.1f} ms")
+    print(f"process wall p95:   {percentile(wall_times, 95) * 1000:.1f} ms")
+    if rss:
+        print(f"max RSS p50:        {percentile(rss, 50) / 1024:.1f} MiB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
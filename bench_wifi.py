@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Wi-Fi list update benchmark
+
+Simulates periodic scans in a crowded office (several BSSIDs per SSID on
+two bands, jittering strengths, a few access points coming and going per
+scan) and feeds them through backend.access_points. Reports the time per
+scan and how many list rows each scan inserts, removes and updates in
+place, against the rows a full rebuild of the list would recreate. A
+smoothing of 1 turns the moving average off for comparison.
+
+    python3 bench_wifi.py --aps 150 --scans 200 --smoothing 0.4,1
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import namedtuple
+
+from backend.access_points import NetworkAggregator
+
+# Same fields as backend.network.AccessPoint, which needs GLib to import
+AccessPoint = namedtuple("AccessPoint", "path ssid bssid strength frequency security")
+
+SECURITIES = ["WPA2", "WPA2", "WPA3", "Enterprise", "Open"]
+FREQUENCIES = [2412, 2437, 2462, 5180, 5240, 5500]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def simulate_scans(count, scans, churn, jitter, seed=0):
+    """Lists of AccessPoints, one per scan, for count BSSIDs over count / 4 SSIDs"""
+    rng = random.Random(seed)
+    networks = [(f"Office-{index:02d}", rng.choice(SECURITIES))
+                for index in range(max(1, count // 4))]
+    base = {}
+    for number in range(count):
+        ssid, security = rng.choice(networks)
+        base[number] = (ssid, security, rng.randint(5, 95), rng.choice(FREQUENCIES))
+    results = []
+    for _ in range(scans):
+        scan = []
+        for number, (ssid, security, strength, frequency) in base.items():
+            if rng.random() < churn:
+                continue  # Missed by this scan
+            strength = max(1, min(100, strength + rng.randint(-jitter, jitter)))
+            scan.append(AccessPoint(f"/ap/{number}", ssid, f"02:00:00:00:{number >> 8:02X}:"
+                                    f"{number & 255:02X}", strength, frequency, security))
+        results.append(scan)
+    return results
+
+
+def run(scans, smoothing):
+    """Feed every scan through an aggregator; return per-scan times and row counts"""
+    aggregator = NetworkAggregator(smoothing=smoothing)
+    rows = set()
+    times = []
+    counts = {"inserted": 0, "removed": 0, "updated": 0, "rebuilt": 0}
+    for scan in scans:
+        start = time.perf_counter()
+        changes = aggregator.update(scan)
+        times.append(time.perf_counter() - start)
+        for key, network in changes.items():
+            if network is None:
+                rows.discard(key)
+                counts["removed"] += 1
+            elif key in rows:
+                counts["updated"] += 1
+            else:
+                rows.add(key)
+                counts["inserted"] += 1
+        counts["rebuilt"] += len(rows)
+    return times, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--aps", type=int, default=150, help="number of BSSIDs")
+    parser.add_argument("--scans", type=int, default=200, help="scans to simulate")
+    parser.add_argument("--churn", type=float, default=0.05,
+                        help="chance that a scan misses an access point")
+    parser.add_argument("--jitter", type=int, default=8, help="strength jitter per scan")
+    parser.add_argument("--smoothing", default="0.4,1",
+                        help="comma-separated moving average weights to compare")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    scans = simulate_scans(args.aps, args.scans, args.churn, args.jitter)
+    print(f"{args.aps} BSSIDs, {args.scans} scans")
+    print()
+
+    results = {}
+    for smoothing in args.smoothing.split(","):
+        times, counts = run(scans, float(smoothing))
+        results[smoothing] = {"times": times, **counts}
+        per_scan = {name: count / args.scans for name, count in counts.items()}
+        print(f"smoothing {smoothing:4}  p50 {percentile(times, 50) * 1e6:7.1f} us  "
+              f"p95 {percentile(times, 95) * 1e6:7.1f} us  rows per scan: "
+              f"+{per_scan['inserted']:.1f} -{per_scan['removed']:.1f} "
+              f"~{per_scan['updated']:.1f} (rebuild: {per_scan['rebuilt']:.1f})")
+
+    if not results:
+        sys.exit("nothing was benchmarked")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Stand-in NetworkManager service for developing the Wi-Fi page
+
+Exports the parts of NetworkManager's D-Bus API the installer uses (one
+Wi-Fi device, its access points and scans) on the session bus, so the
+Wi-Fi page runs without Wi-Fi hardware, root or a system bus:
+
+    dbus-run-session -- sh -c \\
+        'python3 fake_networkmanager.py --aps 120 & ZENOS_NM_BUS=session python3 main.py'
+
+Every scan jitters the signal strengths and lets a few access points
+appear or disappear, like a busy office. Connecting walks the device
+through NetworkManager's states on a script: secured networks accept only
+--password, networks named with --dhcp-fail never get an address, and
+unknown networks are out of range.
+"""
+
+import argparse
+import random
+import sys
+
+from gi.repository import Gio, GLib
+
+NM_BUS_NAME = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+DEVICE_PATH = "/org/freedesktop/NetworkManager/Devices/1"
+AP_PATH_PREFIX = "/org/freedesktop/NetworkManager/AccessPoint/"
+SETTINGS_PATH_PREFIX = "/org/freedesktop/NetworkManager/Settings/"
+ACTIVE_PATH_PREFIX = "/org/freedesktop/NetworkManager/ActiveConnection/"
+
+# NMDeviceState and the NMDeviceStateReason values the script uses
+DISCONNECTED, PREPARE, CONFIG, NEED_AUTH, IP_CONFIG, IP_CHECK, ACTIVATED, DEACTIVATING, FAILED = (
+    30, 40, 50, 60, 70, 80, 100, 110, 120)
+REASON_NONE = 0
+REASON_NO_SECRETS = 7
+REASON_DHCP_FAILED = 17
+REASON_USER_REQUESTED = 39
+REASON_SSID_NOT_FOUND = 53
+
+INTROSPECTION_XML = """
+<node>
+  <interface name="org.freedesktop.NetworkManager">
+    <method name="GetDevices">
+      <arg name="devices" type="ao" direction="out"/>
+    </method>
+    <method name="AddAndActivateConnection">
+      <arg name="connection" type="a{sa{sv}}" direction="in"/>
+      <arg name="device" type="o" direction="in"/>
+      <arg name="specific_object" type="o" direction="in"/>
+      <arg name="path" type="o" direction="out"/>
+      <arg name="active_connection" type="o" direction="out"/>
+    </method>
+    <method name="DeactivateConnection">
+      <arg name="active_connection" type="o" direction="in"/>
+    </method>
+  </interface>
+  <interface name="org.freedesktop.NetworkManager.Device">
+    <signal name="StateChanged">
+      <arg name="new_state" type="u"/>
+      <arg name="old_state" type="u"/>
+      <arg name="reason" type="u"/>
+    </signal>
+    <property name="DeviceType" type="u" access="read"/>
+    <property name="Interface" type="s" access="read"/>
+    <property name="State" type="u" access="read"/>
+  </interface>
+  <interface name="org.freedesktop.NetworkManager.Device.Wireless">
+    <method name="GetAllAccessPoints">
+      <arg name="access_points" type="ao" direction="out"/>
+    </method>
+    <method name="RequestScan">
+      <arg name="options" type="a{sv}" direction="in"/>
+    </method>
+    <property name="AccessPoints" type="ao" access="read"/>
+    <property name="LastScan" type="x" access="read"/>
+  </interface>
+  <interface name="org.freedesktop.NetworkManager.AccessPoint">
+    <property name="Ssid" type="ay" access="read"/>
+    <property name="HwAddress" type="s" access="read"/>
+    <property name="Strength" type="y" access="read"/>
+    <property name="Frequency" type="u" access="read"/>
+    <property name="Flags" type="u" access="read"/>
+    <property name="WpaFlags" type="u" access="read"/>
+    <property name="RsnFlags" type="u" access="read"/>
+  </interface>
+</node>
+"""
+
+# (Flags, WpaFlags, RsnFlags) per security kind
+SECURITY_FLAGS = {
+    "Open": (0, 0, 0),
+    "WPA2": (1, 0, 0x188),
+    "WPA3": (1, 0, 0x488),
+    "Enterprise": (1, 0, 0x288),
+}
+FREQUENCIES = [2412, 2437, 2462, 5180, 5240, 5500]
+
+DEFAULT_NETWORKS = [
+    ("HomeNetwork", "WPA2", 85),
+    ("CoffeeShop_WiFi", "Open", 70),
+    ("Neighbor_WiFi", "WPA3", 60),
+    ("Office_Guest", "WPA2", 45),
+    ("Mobile_Hotspot", "WPA2", 30),
+]
+
+
+class AccessPoint:
+    def __init__(self, number, ssid, security, strength, frequency):
+        self.path = f"{AP_PATH_PREFIX}{number}"
+        self.ssid = ssid
+        self.bssid = ":".join(f"{byte:02X}" for byte in (2, 0, 0, number >> 16 & 255,
+                                                         number >> 8 & 255, number & 255))
+        self.security = security
+        self.strength = strength
+        self.frequency = frequency
+        self.registration = None
+
+    def properties(self):
+        flags, wpa_flags, rsn_flags = SECURITY_FLAGS[self.security]
+        return {
+            "Ssid": GLib.Variant("ay", self.ssid.encode("utf-8")),
+            "HwAddress": GLib.Variant("s", self.bssid),
+            "Strength": GLib.Variant("y", self.strength),
+            "Frequency": GLib.Variant("u", self.frequency),
+            "Flags": GLib.Variant("u", flags),
+            "WpaFlags": GLib.Variant("u", wpa_flags),
+            "RsnFlags": GLib.Variant("u", rsn_flags),
+        }
+
+
+class FakeNetworkManager:
+    def __init__(self, access_points, scan_delay_ms, churn, seed, password="password",
+                 dhcp_fail=(), step_delay_ms=800):
+        self.node_info = Gio.DBusNodeInfo.new_for_xml(INTROSPECTION_XML)
+        self.access_points = {}
+        self.pending_access_points = access_points
+        self.scan_delay_ms = scan_delay_ms
+        self.churn = churn
+        self.random = random.Random(seed)
+        self.next_number = len(access_points) + 1
+        self.last_scan = -1
+        self.scan_source = None
+        self.connection = None
+        self.password = password
+        self.dhcp_fail = set(dhcp_fail)
+        self.step_delay_ms = step_delay_ms
+        self.state = DISCONNECTED
+        # (state, reason) transitions still to come, and the active connection
+        self.script = []
+        self.script_source = None
+        self.active_connection = None
+        self.next_connection = 1
+
+    def interface(self, name):
+        return self.node_info.lookup_interface(name)
+
+    def on_bus_acquired(self, connection, name):
+        self.connection = connection
+        connection.register_object(NM_PATH, self.interface("org.freedesktop.NetworkManager"),
+                                   self.on_method_call, self.on_get_property, None)
+        for interface in ("org.freedesktop.NetworkManager.Device",
+                          "org.freedesktop.NetworkManager.Device.Wireless"):
+            connection.register_object(DEVICE_PATH, self.interface(interface),
+                                       self.on_method_call, self.on_get_property, None)
+        for access_point in self.pending_access_points:
+            self.add_access_point(access_point)
+        self.last_scan = GLib.get_monotonic_time() // 1000
+
+    def on_name_lost(self, connection, name):
+        sys.exit(f"could not own {name} on the session bus")
+
+    def add_access_point(self, access_point):
+        access_point.registration = self.connection.register_object(
+            access_point.path, self.interface("org.freedesktop.NetworkManager.AccessPoint"),
+            None, self.on_get_property, None)
+        self.access_points[access_point.path] = access_point
+
+    def remove_access_point(self, access_point):
+        self.connection.unregister_object(access_point.registration)
+        del self.access_points[access_point.path]
+
+    def on_method_call(self, connection, sender, object_path, interface_name, method_name,
+                       parameters, invocation):
+        if method_name == "GetDevices":
+            invocation.return_value(GLib.Variant("(ao)", ([DEVICE_PATH],)))
+        elif method_name == "GetAllAccessPoints":
+            invocation.return_value(GLib.Variant("(ao)", (list(self.access_points),)))
+        elif method_name == "RequestScan":
+            if self.scan_source is not None:
+                invocation.return_dbus_error("org.freedesktop.NetworkManager.Device.NotAllowed",
+                                             "Scanning not allowed while already scanning")
+                return
+            self.scan_source = GLib.timeout_add(self.scan_delay_ms, self.on_scan_done)
+            invocation.return_value(None)
+        elif method_name == "AddAndActivateConnection":
+            settings, device, specific_object = parameters.unpack()
+            settings_path = f"{SETTINGS_PATH_PREFIX}{self.next_connection}"
+            self.active_connection = f"{ACTIVE_PATH_PREFIX}{self.next_connection}"
+            self.next_connection += 1
+            self.run_script(self.connection_script(settings))
+            invocation.return_value(GLib.Variant("(oo)", (settings_path, self.active_connection)))
+        elif method_name == "DeactivateConnection":
+            if parameters.unpack()[0] != self.active_connection:
+                invocation.return_dbus_error("org.freedesktop.NetworkManager.ConnectionNotActive",
+                                             "The connection was not active")
+                return
+            self.active_connection = None
+            self.run_script([(DEACTIVATING, REASON_USER_REQUESTED),
+                             (DISCONNECTED, REASON_USER_REQUESTED)])
+            invocation.return_value(None)
+
+    def on_get_property(self, connection, sender, object_path, interface_name, property_name):
+        if object_path in self.access_points:
+            return self.access_points[object_path].properties()[property_name]
+        return {
+            "DeviceType": GLib.Variant("u", 2),
+            "Interface": GLib.Variant("s", "wlan0"),
+            "State": GLib.Variant("u", self.state),
+            "AccessPoints": GLib.Variant("ao", list(self.access_points)),
+            "LastScan": GLib.Variant("x", self.last_scan),
+        }[property_name]
+
+    def connection_script(self, settings):
+        """The device states an activation with these settings goes through"""
+        ssid = bytes(settings["802-11-wireless"]["ssid"]).decode("utf-8", "replace")
+        security = settings.get("802-11-wireless-security", {})
+        script = []
+        if self.state not in (DISCONNECTED, FAILED):
+            script += [(DEACTIVATING, REASON_NONE), (DISCONNECTED, REASON_NONE)]
+        script.append((PREPARE, REASON_NONE))
+        access_point = next((access_point for access_point in self.access_points.values()
+                             if access_point.ssid == ssid), None)
+        if access_point is None:
+            return script + [(FAILED, REASON_SSID_NOT_FOUND)]
+        script.append((CONFIG, REASON_NONE))
+        password = security.get("psk", security.get("wep-key0"))
+        if access_point.security != "Open" and password != self.password:
+            return script + [(NEED_AUTH, REASON_NONE), (FAILED, REASON_NO_SECRETS)]
+        script.append((IP_CONFIG, REASON_NONE))
+        if ssid in self.dhcp_fail:
+            return script + [(FAILED, REASON_DHCP_FAILED)]
+        return script + [(IP_CHECK, REASON_NONE), (ACTIVATED, REASON_NONE)]
+
+    def run_script(self, script):
+        """Replace the pending transitions and step through them"""
+        if self.script_source is not None:
+            GLib.source_remove(self.script_source)
+        self.script = list(script)
+        self.script_source = GLib.timeout_add(self.step_delay_ms, self.on_script_step)
+
+    def on_script_step(self):
+        state, reason = self.script.pop(0)
+        old_state, self.state = self.state, state
+        self.connection.emit_signal(None, DEVICE_PATH, "org.freedesktop.NetworkManager.Device",
+                                    "StateChanged", GLib.Variant("(uuu)", (state, old_state, reason)))
+        self.connection.emit_signal(
+            None, DEVICE_PATH, "org.freedesktop.DBus.Properties", "PropertiesChanged",
+            GLib.Variant("(sa{sv}as)", ("org.freedesktop.NetworkManager.Device", {
+                "State": GLib.Variant("u", state),
+            }, [])))
+        if self.script:
+            return True
+        self.script_source = None
+        return False  # Don't repeat timeout
+
+    def on_scan_done(self):
+        """Move the radio environment on a little and publish the scan"""
+        self.scan_source = None
+        for access_point in list(self.access_points.values()):
+            if self.random.random() < self.churn:
+                self.remove_access_point(access_point)
+            else:
+                access_point.strength = max(1, min(100, access_point.strength
+                                                   + self.random.randint(-12, 12)))
+        for _ in range(self.random.randint(0, max(1, int(len(self.access_points) * self.churn)))):
+            template = self.random.choice(list(self.access_points.values()) or
+                                          self.pending_access_points)
+            self.add_access_point(AccessPoint(self.next_number, template.ssid, template.security,
+                                              self.random.randint(5, 90),
+                                              self.random.choice(FREQUENCIES)))
+            self.next_number += 1
+        self.last_scan = GLib.get_monotonic_time() // 1000
+        self.connection.emit_signal(
+            None, DEVICE_PATH, "org.freedesktop.DBus.Properties", "PropertiesChanged",
+            GLib.Variant("(sa{sv}as)", ("org.freedesktop.NetworkManager.Device.Wireless", {
+                "LastScan": GLib.Variant("x", self.last_scan),
+                "AccessPoints": GLib.Variant("ao", list(self.access_points)),
+            }, [])))
+        return False  # Don't repeat timeout
+
+
+def generate_access_points(count, seed):
+    """count BSSIDs spread over about count / 3 SSIDs, several per SSID"""
+    rng = random.Random(seed)
+    if count <= 0:
+        return [AccessPoint(number, ssid, security, strength, rng.choice(FREQUENCIES))
+                for number, (ssid, security, strength) in enumerate(DEFAULT_NETWORKS, 1)]
+    networks = {f"Office-{index:02d}": rng.choice(list(SECURITY_FLAGS))
+                for index in range(max(1, count // 3))}
+    access_points = []
+    for number in range(1, count + 1):
+        ssid = rng.choice(list(networks))
+        security = networks[ssid]
+        access_points.append(AccessPoint(number, ssid, security, rng.randint(5, 95),
+                                         rng.choice(FREQUENCIES)))
+    return access_points
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--aps", type=int, default=0,
+                        help="generate this many access points (default: a small home list)")
+    parser.add_argument("--scan-delay", type=float, default=1.5, help="seconds per scan")
+    parser.add_argument("--churn", type=float, default=0.05,
+                        help="share of access points that come and go per scan")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--password", default="password",
+                        help="the password every secured network accepts")
+    parser.add_argument("--dhcp-fail", action="append", default=[], metavar="SSID",
+                        help="never hand out an address on this network (repeatable)")
+    parser.add_argument("--step-delay", type=float, default=0.8,
+                        help="seconds between device state changes while connecting")
+    args = parser.parse_args()
+
+    service = FakeNetworkManager(generate_access_points(args.aps, args.seed),
+                                 int(args.scan_delay * 1000), args.churn, args.seed,
+                                 args.password, args.dhcp_fail, int(args.step_delay * 1000))
+    Gio.bus_own_name(Gio.BusType.SESSION, NM_BUS_NAME, Gio.BusNameOwnerFlags.NONE,
+                     service.on_bus_acquired, None, service.on_name_lost)
+    GLib.MainLoop().run()
+
+
+if __name__ == "__main__":
+    main()
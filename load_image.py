@@ -1,31 +1,107 @@
-import gi
+"""
+Shared image loading for installer pages
+
+Asset paths are resolved once and every image is decoded into a Gdk.Texture
+a single time. Textures are kept in a bounded LRU keyed by path, size and
+scale, so every widget showing the same image shares one pixel buffer.
+"""
+
 import os
+from collections import OrderedDict
+
+import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, GLib, Gio
+from gi.repository import Gtk, Gdk, GLib
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+class AssetCache:
+    def __init__(self, assets_dir=ASSETS_DIR, max_entries=32):
+        self.assets_dir = assets_dir
+        self.max_entries = max_entries
+        self.paths = None
+        self.textures = OrderedDict()
+
+    def resolve(self, name):
+        """Return the absolute path of an asset name or path, or None if missing"""
+        if os.path.isabs(name):
+            return name if os.path.isfile(name) else None
+        if self.paths is None:
+            # One directory scan replaces an exists() check per lookup
+            try:
+                self.paths = {entry.name: entry.path for entry in os.scandir(self.assets_dir)
+                              if entry.is_file()}
+            except OSError as e:
+                print(f"Error: Could not read assets directory {self.assets_dir}: {e}")
+                self.paths = {}
+        return self.paths.get(name)
+
+    def get_texture(self, name, size=None, scale=1):
+        """Return the shared texture for an asset, decoding it on first use
+
+        size is an optional (width, height) in logical pixels; the image is
+        then decoded at size * scale device pixels instead of its natural size.
+        """
+        path = self.resolve(name)
+        if path is None:
+            print(f"Error: Image file not found: {name}")
+            return None
+
+        key = (path, size, scale)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.textures.move_to_end(key)
+            return texture
+
+        texture = self.decode(path, size, scale)
+        if texture is None:
+            return None
+        self.textures[key] = texture
+        if len(self.textures) > self.max_entries:
+            self.textures.popitem(last=False)
+        return texture
+
+    def decode(self, path, size, scale):
+        """Decode an image file into a texture"""
+        try:
+            if size is None:
+                return Gdk.Texture.new_from_filename(path)
+            # Only scaled decodes need GdkPixbuf, so load it on demand
+            gi.require_version('GdkPixbuf', '2.0')
+            from gi.repository import GdkPixbuf
+            width, height = size
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, width * scale, height * scale, True)
+            return Gdk.Texture.new_for_pixbuf(pixbuf)
+        except GLib.Error as e:
+            print(f"Error loading image {path}: {e.message}")
+            return None
+
+    def clear(self):
+        """Drop all cached textures"""
+        self.textures.clear()
+
+asset_cache = AssetCache()
+
+def display_scale():
+    """Largest scale factor among the default display's monitors"""
+    display = Gdk.Display.get_default()
+    if display is None:
+        return 1
+    monitors = display.get_monitors()
+    scales = [monitors.get_item(i).get_scale_factor() for i in range(monitors.get_n_items())]
+    return max(scales, default=1)
+
+def get_paintable(name, size=None, scale=None):
+    """Return the shared paintable for an asset name or path"""
+    if size is not None and scale is None:
+        scale = display_scale()
+    return asset_cache.get_texture(name, size, scale or 1)
 
-def load_image_from_path(path):
+def load_image_from_path(path, size=None, scale=None):
     """
     Helper function to load an image from a path
     """
-    if not os.path.exists(path):
-        print(f"Error: Image file not found at {path}")
+    paintable = get_paintable(path, size, scale)
+    if paintable is None:
         return None
-        
-    try:
-        # Try Gio.File method
-        file = Gio.File.new_for_path(path)
-        file_icon = Gio.FileIcon.new(file)
-        image = Gtk.Image.new_from_gicon(file_icon)
-        return image
-    except Exception as e:
-        print(f"Error loading image with Gio: {e}")
-        
-    try:
-        # Try direct file method
-        image = Gtk.Image.new_from_file(path)
-        return image
-    except Exception as e:
-        print(f"Error loading image directly: {e}")
-        
-    # All methods failed
-    return None
+    return Gtk.Image.new_from_paintable(paintable)
@@ -4,114 +4,174 @@ GTK4 Installer - Main Application
 A modern installer interface with multiple configuration pages
 """
 
-# Debug helpers
-import os
-print(f"Current working directory: {os.getcwd()}")
-print(f"Script directory: {os.path.dirname(os.path.abspath(__file__))}")
-print(f"Assets directory exists: {os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'))}")
-print(f"Assets directory contents: {os.listdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'))}")
-print("DEBUG: Attempting to import GTK and Adwaita...")
-
-import gi
-gi.require_version('Gtk', '4.0')
-gi.require_version('Adw', '1')
-print("DEBUG: GTK and Adwaita versions required.")
-
-from gi.repository import Gtk, Adw, Gio, GLib, Gdk # Added Gdk
-print("DEBUG: GTK and Adwaita modules imported.")
+from startup_profile import profiler
+
 import sys
 
-print("DEBUG: Importing page modules...")
-from pages.language_page import LanguagePage
-from pages.timezone_page import TimezonePage
-from pages.keyboard_page import KeyboardPage
-from pages.disk_page import DiskPage
-from pages.wifi_page import WifiPage
-from pages.user_page import UserPage
-from pages.welcome_page import WelcomePage # Import WelcomePage
-print("DEBUG: Page modules imported successfully.")
+with profiler.span("import-gi"):
+    import gi
+
+with profiler.span("require-version"):
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+
+with profiler.span("import-gi-namespaces"):
+    from gi.repository import Gtk, Adw, Gio, GLib
+
+import pages
+import theme
+
+# Installer flow in navigation order, as (page name, class name in pages).
+# Page modules are imported and pages constructed the first time they are
+# requested, so startup only pays for the welcome page.
+PAGE_REGISTRY = [
+    ("welcome", "WelcomePage"),
+    ("language", "LanguagePage"),
+    ("timezone", "TimezonePage"),
+    ("keyboard", "KeyboardPage"),
+    ("disk", "DiskPage"),
+    ("partition", "PartitionPage"),
+    ("wifi", "WifiPage"),
+    ("user", "UserPage"),
+    ("install", "InstallPage"),
+]
 
 class InstallerWindow(Adw.ApplicationWindow):
-    def __init__(self, **kwargs):
-        print("DEBUG: InstallerWindow __init__ - ENTERED CONSTRUCTOR.") # Print at very start
+    def __init__(self, prefetch_pages=True, **kwargs):
         super().__init__(**kwargs)
-        print("DEBUG: InstallerWindow __init__ - Adw.ApplicationWindow super().__init__() COMPLETED.")
+        self.prefetch_pages = prefetch_pages
 
         # Window properties
         self.set_title("System Installer")
-        print("DEBUG: InstallerWindow __init__ - Title SET.")
-        
+
         # Remove titlebar for clean rounded look
         self.set_decorated(False)
-        print("DEBUG: InstallerWindow __init__ - Decoration SET to False.")
-        
+
         # Load custom CSS
         self.load_css()
-        print("DEBUG: InstallerWindow __init__ - CSS LOADED.")
-        
+
         # Create main stack for pages
         self.stack = Gtk.Stack()
         self.stack.set_transition_type(Gtk.StackTransitionType.SLIDE_LEFT_RIGHT)
         self.stack.set_transition_duration(300)
-        print("DEBUG: InstallerWindow __init__ - Stack CREATED.")
-        
+        self.stack.connect("notify::visible-child", self.on_visible_page_changed)
+        self.current_page = None
+
         # Initialize pages
         self.init_pages()
-        print("DEBUG: InstallerWindow __init__ - Pages INITIALIZED.")
-        
+
         # Create main layout
         self.setup_layout()
-        print("DEBUG: InstallerWindow __init__ - Layout SETUP.")
-        
+
         # Show first page
         self.stack.set_visible_child_name("welcome") # Start with welcome page
-        print("DEBUG: InstallerWindow __init__ - Visible child SET to 'welcome'.")
-        print("DEBUG: InstallerWindow __init__ - END (CONSTRUCTOR FINISHED)")
-    
+        self.prefetch_next("welcome")
+
+        # Record when the first frame has been painted
+        if profiler.enabled:
+            self.connect("realize", self.on_realize_profile)
+
     def load_css(self):
-        """Load custom CSS styling"""
+        """Load the built theme, falling back to parsing style.css directly"""
         css_provider = Gtk.CssProvider()
-        css_path = os.path.join(os.path.dirname(__file__), "style.css")
-        
+        css_provider.connect("parsing-error", self.on_css_parsing_error)
+
         try:
-            css_provider.load_from_path(css_path)
-            Gtk.StyleContext.add_provider_for_display(
-                self.get_display(),
-                css_provider,
-                Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
-            )
-        except Exception as e:
-            print(f"Warning: Could not load CSS: {e}")
-    
+            with profiler.span("build-theme"):
+                css = theme.load_theme()
+            with profiler.span("load-css"):
+                if hasattr(css_provider, "load_from_bytes"):
+                    css_provider.load_from_bytes(GLib.Bytes.new(css.encode("utf-8")))
+                else:
+                    css_provider.load_from_data(css, -1)
+        except (OSError, theme.ThemeError) as e:
+            print(f"Warning: Could not build theme, loading style.css as is: {e}")
+            with profiler.span("load-css"):
+                css_provider.load_from_path(theme.STYLE_PATH)
+
+        Gtk.StyleContext.add_provider_for_display(
+            self.get_display(),
+            css_provider,
+            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+        )
+
+    def on_css_parsing_error(self, provider, section, error):
+        """Report CSS errors with their location"""
+        print(f"Warning: CSS error at {section.to_string()}: {error.message}")
+
     def init_pages(self):
-        """Initialize all installer pages"""
-        self.pages = {
-            "welcome": WelcomePage(self.navigate_to), # Add welcome page
-            "language": LanguagePage(self.navigate_to),
-            "timezone": TimezonePage(self.navigate_to),
-            "keyboard": KeyboardPage(self.navigate_to),
-            "disk": DiskPage(self.navigate_to),
-            "wifi": WifiPage(self.navigate_to),
-            "user": UserPage(self.navigate_to)        }
-        
-        # Add pages to stack
-        for name, page in self.pages.items():
-            self.stack.add_named(page, name)
-    
+        """Register installer pages; only the welcome page is built up front"""
+        self.page_classes = dict(PAGE_REGISTRY)
+        self.page_order = [name for name, _ in PAGE_REGISTRY]
+        self.pages = {}
+        self.state = {}
+        self.get_page("welcome")
+
+    def get_page(self, page_name):
+        """Return the named page, constructing it on first use"""
+        page = self.pages.get(page_name)
+        if page is None:
+            with profiler.span(f"import-page:{page_name}"):
+                page_class = getattr(pages, self.page_classes[page_name])
+            with profiler.span(f"construct-page:{page_name}"):
+                page = page_class(self.navigate_to, self.state)
+            self.pages[page_name] = page
+            self.stack.add_named(page, page_name)
+        return page
+
+    def prefetch_next(self, page_name):
+        """Build the page following page_name in the flow once the main loop is idle"""
+        if not self.prefetch_pages:
+            return
+        index = self.page_order.index(page_name) + 1
+        if index < len(self.page_order) and self.page_order[index] not in self.pages:
+            GLib.idle_add(self.on_prefetch_idle, self.page_order[index],
+                          priority=GLib.PRIORITY_LOW)
+
+    def on_prefetch_idle(self, page_name):
+        """Construct a prefetched page from an idle callback"""
+        self.get_page(page_name)
+        return False  # Don't repeat idle callback
+
+    def on_visible_page_changed(self, stack, param):
+        """Notify pages when they are shown or hidden"""
+        page = stack.get_visible_child()
+        if page is self.current_page:
+            return
+        if self.current_page is not None:
+            self.current_page.on_hidden()
+        self.current_page = page
+        if page is not None:
+            page.on_shown()
+
+    def on_realize_profile(self, widget):
+        """Hook the frame clock to record the first painted frame"""
+        frame_clock = self.get_frame_clock()
+        self.first_frame_handler = frame_clock.connect("after-paint", self.on_first_frame)
+
+    def on_first_frame(self, frame_clock):
+        """Record the first frame and write the startup report"""
+        frame_clock.disconnect(self.first_frame_handler)
+        profiler.mark("first-frame")
+        profiler.write_report()
+        if profiler.exit_after_first_frame:
+            GLib.idle_add(self.get_application().quit)
+
     def setup_layout(self):
         """Setup main layout"""
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         main_box.add_css_class("main-window")
         main_box.append(self.stack)
         self.set_content(main_box)
-    
+
     def navigate_to(self, page_name):
         """Navigate to specified page"""
-        if page_name in self.pages:
-            self.stack.set_visible_child_name(page_name)
+        if page_name in self.page_classes:
+            self.stack.set_visible_child(self.get_page(page_name))
+            self.prefetch_next(page_name)
         elif page_name == "finish":
             self.finish_installation()
-    
+
     def finish_installation(self):
         """Handle installation completion"""
         dialog = Adw.MessageDialog.new(
@@ -125,44 +185,26 @@ class InstallerWindow(Adw.ApplicationWindow):
 
 class InstallerApp(Adw.Application):
     def __init__(self):
-        print("DEBUG: InstallerApp __init__ - START")
-        # Try with application_id=None again, but with the original on_activate
-        super().__init__(application_id=None, # Changed back to None
+        super().__init__(application_id=None,
                          flags=Gio.ApplicationFlags.FLAGS_NONE)
-        print("DEBUG: InstallerApp __init__ - Adw.Application super().__init__() COMPLETED (id=None, flags=NONE).")
-        
+
         self.win = None
-        
-        self.connect('activate', self.on_activate) # Connect to original on_activate
-        print("DEBUG: InstallerApp __init__ - 'activate' signal CONNECTED to self.on_activate.")
-        print("DEBUG: InstallerApp __init__ - END")
-
-    def on_activate(self, app_instance): 
-        print("DEBUG: InstallerApp on_activate (ORIGINAL) - CALLED.")
-        
+
+        self.connect('activate', self.on_activate)
+
+    def on_activate(self, app_instance):
         if not self.win:
-            print("DEBUG: InstallerApp on_activate - Creating InstallerWindow.")
-            self.win = InstallerWindow(application=app_instance)
-            print("DEBUG: InstallerApp on_activate - InstallerWindow INSTANTIATED.")
-        else:
-            print("DEBUG: InstallerApp on_activate - InstallerWindow ALREADY EXISTS.")
-        
-        if self.win:
-            self.win.present()
-            print("DEBUG: InstallerApp on_activate - InstallerWindow PRESENTED.")
-        else:
-            print("ERROR: InstallerApp on_activate - self.win is None, cannot present.")
-        print("DEBUG: InstallerApp on_activate (ORIGINAL) - END.")
+            with profiler.span("construct-window"):
+                self.win = InstallerWindow(application=app_instance)
+
+        self.win.present()
+        profiler.mark("window-presented")
 
 def main():
-    print("DEBUG: main() function called.")
     app = InstallerApp()
-    print("DEBUG: InstallerApp instantiated in main().")
     exit_code = 1 # Default to error
     try:
-        print("DEBUG: Attempting to run app.run(sys.argv)...")
-        exit_code = app.run(sys.argv) # Use standard app.run()
-        print(f"DEBUG: app.run() finished with exit_code: {exit_code}")
+        exit_code = app.run(profiler.strip_args(sys.argv))
     except GLib.Error as e:
         print(f"GLib Error during app.run(): {e}")
         import traceback
@@ -174,11 +216,8 @@ def main():
         traceback.print_exc()
         exit_code = 1
     finally:
-        print(f"DEBUG: main() function returning {exit_code}.")
-        return exit_code
+        profiler.write_report()
+    return exit_code
 
 if __name__ == "__main__":
-    print("DEBUG: Script entry point (__name__ == '__main__').")
-    final_exit_code = main()
-    print(f"DEBUG: Script exiting with code: {final_exit_code}.")
-    sys.exit(final_exit_code)
+    sys.exit(main())
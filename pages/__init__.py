@@ -1,19 +1,32 @@
 """
 Pages package for GTK4 Installer
+
+Page classes are resolved on first attribute access so that importing the
+package does not import (and load the GI namespaces of) every page.
 """
 
-from .language_page import LanguagePage
-from .timezone_page import TimezonePage
-from .keyboard_page import KeyboardPage
-from .disk_page import DiskPage
-from .wifi_page import WifiPage
-from .user_page import UserPage
+import importlib
+
+_PAGE_MODULES = {
+    'WelcomePage': 'welcome_page',
+    'LanguagePage': 'language_page',
+    'TimezonePage': 'timezone_page',
+    'KeyboardPage': 'keyboard_page',
+    'DiskPage': 'disk_page',
+    'PartitionPage': 'partition_page',
+    'WifiPage': 'wifi_page',
+    'UserPage': 'user_page',
+    'InstallPage': 'install_page',
+}
+
+__all__ = list(_PAGE_MODULES)
+
+def __getattr__(name):
+    module_name = _PAGE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{module_name}", __name__)
+    return getattr(module, name)
 
-__all__ = [
-    'LanguagePage',
-    'TimezonePage', 
-    'KeyboardPage',
-    'DiskPage',
-    'WifiPage',
-    'UserPage'
-]
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -7,9 +7,11 @@ gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk
 
 class BasePage(Gtk.Box):
-    def __init__(self, navigate_callback, **kwargs):
+    def __init__(self, navigate_callback, state=None, **kwargs):
         super().__init__(orientation=Gtk.Orientation.VERTICAL, **kwargs)
         self.navigate = navigate_callback
+        # Choices shared between pages (selected locale, disk, ...)
+        self.state = state if state is not None else {}
         self.add_css_class("installer-page")
         
         # Main content area
@@ -39,6 +41,14 @@ class BasePage(Gtk.Box):
         
         self.overlay.add_overlay(self.nav_box)
     
+    def on_shown(self):
+        """Called when the page becomes the visible page"""
+        pass
+    
+    def on_hidden(self):
+        """Called when the page stops being the visible page"""
+        pass
+    
     def create_header(self, title, subtitle, description):
         """Create page header with title, subtitle and description"""
         header_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
@@ -2,14 +2,35 @@
 Disk Selection Page
 """
 
+import bisect
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, Gio, GLib, GObject
 from .base_page import BasePage
+from backend.disks import submit_scan, submit_read, format_size, describe_kind, describe_model
+from backend.hotplug import HotplugWatcher
+from backend.partitioning import plan_erase, read_memory_size, PlanError
+
+# Uevents arrive in bursts (a disk, then each partition); re-read once per burst
+HOTPLUG_SETTLE_MS = 200
+
+class DiskItem(GObject.Object):
+    """List model item wrapping a backend.disks.Disk"""
+    def __init__(self, disk):
+        super().__init__()
+        self.disk = disk
 
 class DiskPage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        self.hotplug = HotplugWatcher(self.on_disk_changed)
+        # Disk names with pending uevents, re-read together after a short delay
+        self.changed_disks = set()
+        self.settle_source = 0
+        self.watched_before = False
+        # Read once so re-planning on every option change does no I/O
+        self.memory_size = read_memory_size()
+        self.plan = None
         self.setup_page()
         
     def setup_page(self):
@@ -71,6 +92,14 @@ class DiskPage(BasePage):
         self.install_type_group.append(manual_radio)
         options_box.append(manual_radio)
         
+        erase_radio.connect("toggled", lambda radio: self.update_plan())
+        
+        # Swap partition sized from RAM
+        self.swap_check = Gtk.CheckButton(label="Create a swap partition")
+        self.swap_check.set_active(True)
+        self.swap_check.connect("toggled", lambda check: self.update_plan())
+        options_box.append(self.swap_check)
+        
         main_box.append(options_box)
         
         # Encryption option
@@ -98,6 +127,24 @@ class DiskPage(BasePage):
         
         main_box.append(encrypt_box)
         
+        # Live preview of the partitions the erase install will create
+        plan_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        plan_box.set_spacing(8)
+        
+        plan_title = Gtk.Label(label="Partition Layout:")
+        plan_title.add_css_class("form-label")
+        plan_title.set_halign(Gtk.Align.START)
+        plan_box.append(plan_title)
+        
+        self.plan_label = Gtk.Label()
+        self.plan_label.add_css_class("info-text")
+        self.plan_label.set_halign(Gtk.Align.START)
+        self.plan_label.set_xalign(0)
+        plan_box.append(self.plan_label)
+        
+        main_box.append(plan_box)
+        self.update_plan()
+        
         # Warning message
         warning_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
         warning_box.set_spacing(8)
@@ -116,66 +163,139 @@ class DiskPage(BasePage):
         
     def create_disk_list(self):
         """Create disk selection list"""
+        disks_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        
+        # Shown in place of the list while scanning or when nothing was found
+        self.disk_status_label = Gtk.Label(label="🔄 Detecting disks...")
+        self.disk_status_label.add_css_class("info-text")
+        self.disk_status_label.set_margin_top(12)
+        self.disk_status_label.set_margin_bottom(12)
+        disks_box.append(self.disk_status_label)
+        
         scrolled = Gtk.ScrolledWindow()
         scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scrolled.set_min_content_height(150)
         
-        self.disk_listbox = Gtk.ListBox()
-        self.disk_listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        
-        # Mock disk data (in real app, this would come from system)
-        disks = [
-            {
-                "name": "/dev/sda",
-                "size": "500 GB",
-                "type": "SSD",
-                "model": "Samsung SSD 850 EVO"
-            },
-            {
-                "name": "/dev/sdb",
-                "size": "1 TB",
-                "type": "HDD",
-                "model": "Western Digital Blue"
-            },
-            {
-                "name": "/dev/nvme0n1",
-                "size": "256 GB",
-                "type": "NVMe SSD",
-                "model": "Intel SSD 660p"
-            }
-        ]
-        
-        for disk in disks:
-            row = Gtk.ListBoxRow()
-            row.set_margin_start(12)
-            row.set_margin_end(12)
-            row.set_margin_top(8)
-            row.set_margin_bottom(8)
-            
-            disk_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            disk_box.set_spacing(4)
-            
-            # Disk name and size
-            name_label = Gtk.Label(label=f"{disk['name']} - {disk['size']}")
-            name_label.set_halign(Gtk.Align.START)
-            name_label.add_css_class("page-subtitle")
-            disk_box.append(name_label)
-            
-            # Disk details
-            details_label = Gtk.Label(label=f"{disk['type']} - {disk['model']}")
-            details_label.set_halign(Gtk.Align.START)
-            details_label.add_css_class("info-text")
-            disk_box.append(details_label)
-            
-            row.set_child(disk_box)
-            row.disk_info = disk
-            self.disk_listbox.append(row)
+        self.disk_store = Gio.ListStore(item_type=DiskItem)
+        self.disk_selection = Gtk.SingleSelection(model=self.disk_store)
+        self.disk_selection.connect("notify::selected-item",
+                                    lambda selection, param: self.update_plan())
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_disk_item_setup)
+        factory.connect("bind", self.on_disk_item_bind)
         
-        # Select first disk by default
-        self.disk_listbox.select_row(self.disk_listbox.get_row_at_index(0))
+        self.disk_listview = Gtk.ListView(model=self.disk_selection, factory=factory)
         
-        scrolled.set_child(self.disk_listbox)
-        return scrolled
+        scrolled.set_child(self.disk_listview)
+        disks_box.append(scrolled)
+        
+        # Enumerate on a worker thread; the first disk gets selected by
+        # the selection model once results arrive
+        self.submit_full_scan()
+        
+        return disks_box
+        
+    def on_disk_item_setup(self, factory, list_item):
+        """Create the widgets for a disk row"""
+        disk_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        disk_box.set_spacing(4)
+        disk_box.set_margin_start(12)
+        disk_box.set_margin_end(12)
+        disk_box.set_margin_top(8)
+        disk_box.set_margin_bottom(8)
+        
+        # Disk name and size
+        name_label = Gtk.Label()
+        name_label.set_halign(Gtk.Align.START)
+        name_label.add_css_class("page-subtitle")
+        disk_box.append(name_label)
+        
+        # Disk details
+        details_label = Gtk.Label()
+        details_label.set_halign(Gtk.Align.START)
+        details_label.add_css_class("info-text")
+        disk_box.append(details_label)
+        
+        list_item.set_child(disk_box)
+        
+    def on_disk_item_bind(self, factory, list_item):
+        """Fill a recycled row with the disk it now shows"""
+        disk = list_item.get_item().disk
+        name_label = list_item.get_child().get_first_child()
+        name_label.set_text(f"{disk.path} - {format_size(disk.size)}")
+        name_label.get_next_sibling().set_text(f"{describe_kind(disk)} - {describe_model(disk)}")
+        
+    def submit_full_scan(self):
+        """Enumerate all disks in the background"""
+        future = submit_scan()
+        future.add_done_callback(lambda future: GLib.idle_add(self.on_disks_scanned, future))
+        
+    def on_disks_scanned(self, future):
+        """Show the result of the background disk scan"""
+        try:
+            disks = future.result()
+        except OSError as e:
+            print(f"Warning: Disk scan failed: {e}")
+            disks = []
+        # Sync rather than replace so an existing selection survives a rescan
+        updates = {item.disk.name: None for item in self.disk_store}
+        updates.update((disk.name, disk) for disk in disks)
+        self.apply_disk_updates(updates)
+        return False  # Don't repeat idle callback
+        
+    def on_shown(self):
+        """Follow hotplug events while the page is visible"""
+        if self.hotplug.start() and self.watched_before:
+            # Catch up on anything plugged in while we were not listening
+            self.submit_full_scan()
+        self.watched_before = True
+        
+    def on_hidden(self):
+        """Stop following hotplug events"""
+        self.hotplug.stop()
+        
+    def on_disk_changed(self, name, action):
+        """Queue a disk named by a uevent for re-reading"""
+        self.changed_disks.add(name)
+        if not self.settle_source:
+            self.settle_source = GLib.timeout_add(HOTPLUG_SETTLE_MS, self.on_hotplug_settled)
+        
+    def on_hotplug_settled(self):
+        """Re-read every disk touched by the last burst of uevents"""
+        self.settle_source = 0
+        future = submit_read(self.changed_disks)
+        self.changed_disks = set()
+        future.add_done_callback(lambda future: GLib.idle_add(self.on_disks_read, future))
+        return False  # Don't repeat timeout
+        
+    def on_disks_read(self, future):
+        """Apply re-read disks to the list"""
+        try:
+            self.apply_disk_updates(future.result())
+        except OSError as e:
+            print(f"Warning: Could not re-read disks: {e}")
+        return False  # Don't repeat idle callback
+        
+    def apply_disk_updates(self, updates):
+        """Insert, replace or remove rows for {name: Disk or None} in place"""
+        for name, disk in sorted(updates.items()):
+            names = [item.disk.name for item in self.disk_store]
+            position = bisect.bisect_left(names, name)
+            present = position < len(names) and names[position] == name
+            if disk is None:
+                if present:
+                    self.disk_store.remove(position)
+            elif present:
+                self.disk_store.splice(position, 1, [DiskItem(disk)])
+            else:
+                self.disk_store.insert(position, DiskItem(disk))
+        
+        if self.disk_store.get_n_items():
+            self.disk_status_label.set_visible(False)
+        else:
+            self.disk_status_label.set_text("No installable disks found")
+            self.disk_status_label.set_visible(True)
         
     def create_password_entry(self):
         """Create encryption password entry"""
@@ -194,21 +314,54 @@ class DiskPage(BasePage):
     def on_encrypt_toggled(self, checkbox):
         """Handle encryption checkbox toggle"""
         self.encrypt_password_box.set_visible(checkbox.get_active())
+        self.update_plan()
+        
+    def get_install_type(self):
+        """Return the selected installation type"""
+        for radio in self.install_type_group:
+            if radio.get_active():
+                return radio.install_type
+        return "erase"
+        
+    def update_plan(self):
+        """Re-plan the erase layout for the current disk and options"""
+        self.plan = None
+        selected_disk = self.disk_selection.get_selected_item()
+        if self.get_install_type() != "erase":
+            self.plan_label.set_text("Partitions are set up in the manual partitioning editor.")
+            return
+        if selected_disk is None:
+            self.plan_label.set_text("Select a disk to see its new layout.")
+            return
+        try:
+            self.plan = plan_erase(selected_disk.disk, swap=self.swap_check.get_active(),
+                                   encrypt=self.encrypt_check.get_active(),
+                                   memory_size=self.memory_size)
+        except PlanError as e:
+            self.plan_label.set_text(str(e))
+            return
+        lines = []
+        for partition in self.plan.partitions:
+            filesystem = partition.filesystem + (" (encrypted)" if partition.encrypted else "")
+            line = f"{partition.path}  {partition.label} - {format_size(partition.size)} {filesystem}"
+            if partition.mountpoint:
+                line += f" on {partition.mountpoint}"
+            lines.append(line)
+        self.plan_label.set_text("\n".join(lines))
         
     def on_continue(self, button):
         """Handle continue button click"""
-        selected_disk = self.disk_listbox.get_selected_row()
+        selected_disk = self.disk_selection.get_selected_item()
         if not selected_disk:
             return
             
-        disk_info = selected_disk.disk_info
+        disk = selected_disk.disk
         
         # Get selected installation type
-        install_type = "erase"
-        for radio in self.install_type_group:
-            if radio.get_active():
-                install_type = radio.install_type
-                break
+        install_type = self.get_install_type()
+        if install_type == "erase" and self.plan is None:
+            self.show_error(self.plan_label.get_text())
+            return
         
         # Check encryption
         encrypt = self.encrypt_check.get_active()
@@ -225,11 +378,17 @@ class DiskPage(BasePage):
                 self.show_error("Passwords do not match.")
                 return
         
-        print(f"Selected disk: {disk_info['name']} ({disk_info['size']})")
+        self.state["disk"] = disk.path
+        self.state["install_type"] = install_type
+        self.state["encrypt"] = encrypt
+        self.state["encryption_password"] = self.encrypt_password.get_text() if encrypt else None
+        self.state["partition_plan"] = self.plan if install_type == "erase" else None
+        
+        print(f"Selected disk: {disk.path} ({format_size(disk.size)})")
         print(f"Installation type: {install_type}")
         print(f"Encryption: {encrypt}")
         
-        self.navigate("wifi")
+        self.navigate("partition" if install_type == "manual" else "wifi")
         
     def show_error(self, message):
         """Show error dialog"""
@@ -0,0 +1,135 @@
+"""
+Installation Progress Page
+"""
+
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, GLib
+from .base_page import BasePage
+from backend.disks import format_size
+from backend.installer import start_install
+
+# How often the progress channel is polled
+POLL_INTERVAL_MS = 250
+
+def format_duration(seconds):
+    """Short human duration such as '4 min 10 s'"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes} min"
+
+class InstallPage(BasePage):
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        self.channel = None
+        self.poll_source = None
+        self.setup_page()
+        
+    def setup_page(self):
+        # Create header
+        self.create_header(
+            "Installation",
+            "Installing the System",
+            "The system is being written to the selected disk. This may take a few minutes."
+        )
+        
+        # Progress display
+        self.setup_progress()
+        
+        # Setup navigation
+        self.back_btn.connect("clicked", self.on_back)
+        self.continue_btn.connect("clicked", self.on_continue)
+        
+    def setup_progress(self):
+        """Setup progress bar and status labels"""
+        progress_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        progress_box.set_spacing(12)
+        
+        self.phase_label = Gtk.Label()
+        self.phase_label.add_css_class("page-subtitle")
+        self.phase_label.set_halign(Gtk.Align.START)
+        progress_box.append(self.phase_label)
+        
+        self.progress_bar = Gtk.ProgressBar()
+        progress_box.append(self.progress_bar)
+        
+        self.status_label = Gtk.Label()
+        self.status_label.add_css_class("info-text")
+        self.status_label.set_halign(Gtk.Align.START)
+        self.status_label.set_wrap(True)
+        progress_box.append(self.status_label)
+        
+        self.content_box.append(progress_box)
+        
+    def on_shown(self):
+        """Start the installation when the page is first shown"""
+        if self.channel is None or self.channel.snapshot().error:
+            self.start()
+        
+    def start(self):
+        """Start (or retry) the installation on a worker thread"""
+        self.channel = start_install(self.state)
+        self.back_btn.set_label("Cancel")
+        self.back_btn.set_sensitive(True)
+        self.continue_btn.set_sensitive(False)
+        self.progress_bar.set_fraction(0)
+        self.status_label.set_text("")
+        self.poll_source = GLib.timeout_add(POLL_INTERVAL_MS, self.on_poll)
+        
+    def on_poll(self):
+        """Show the latest progress snapshot"""
+        progress = self.channel.snapshot()
+        self.phase_label.set_text(progress.phase)
+        if progress.total:
+            self.progress_bar.set_fraction(min(progress.done / progress.total, 1.0))
+        else:
+            self.progress_bar.pulse()
+        
+        if progress.finished:
+            self.poll_source = None
+            self.on_finished(progress)
+            return False  # Stop polling
+        
+        details = [f"{format_size(progress.written)} written"]
+        if progress.rate:
+            details.append(f"{format_size(progress.rate)}/s")
+        if progress.eta is not None:
+            details.append(f"about {format_duration(progress.eta)} left")
+        self.status_label.set_text(" - ".join(details))
+        return True
+        
+    def on_finished(self, progress):
+        """Offer to finish, or to go back after an error"""
+        self.back_btn.set_label("Back")
+        if progress.error:
+            self.phase_label.set_text("Installation failed")
+            self.status_label.set_text(progress.error)
+            self.continue_btn.set_label("Retry")
+        else:
+            self.progress_bar.set_fraction(1.0)
+            self.phase_label.set_text("Installation finished")
+            self.status_label.set_text(f"{format_size(progress.written)} written")
+            self.continue_btn.set_label("Finish")
+            self.back_btn.set_sensitive(False)
+        self.continue_btn.set_sensitive(True)
+        
+    def on_back(self, button):
+        """Cancel a running installation, or go back after a failure"""
+        if self.poll_source is not None:
+            self.channel.cancel()
+            self.back_btn.set_sensitive(False)
+            self.phase_label.set_text("Cancelling...")
+        else:
+            self.navigate("user")
+        
+    def on_continue(self, button):
+        """Handle continue button click"""
+        if self.channel.snapshot().error:
+            self.start()
+        else:
+            self.navigate("finish")
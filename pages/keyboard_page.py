@@ -4,12 +4,39 @@ Keyboard Layout Selection Page
 
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, Gio, GObject
 from .base_page import BasePage
+from .keyboard_preview import KeyboardPreview
+from backend.xkb import load_index, DEFAULT_LANGUAGE
+from backend.search import fold_text
+
+class KeyboardLanguageItem(GObject.Object):
+    """List model item for one XKB language"""
+    def __init__(self, code, name):
+        super().__init__()
+        self.code = code
+        self.label = name
+
+class LayoutItem(GObject.Object):
+    """List model item for one layout/variant entry of the XKB index"""
+    def __init__(self, position, layout, variant, description):
+        super().__init__()
+        self.position = position
+        self.layout = layout
+        self.variant = variant
+        self.label = description
 
 class KeyboardPage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        self.keyboard_index = load_index()
+        # Folded query and its (language codes, entry positions) matches;
+        # None while the search is empty
+        self.search_text = ""
+        self.search_matches = None
+        self.current_language = None
+        # Created after the lists, which select a layout while being built
+        self.preview = None
         self.setup_page()
         
     def setup_page(self):
@@ -69,6 +96,12 @@ class KeyboardPage(BasePage):
         
         main_box.append(layout_box)
         
+        # Preview of the selected layout's key caps
+        self.preview = KeyboardPreview()
+        self.preview.set_halign(Gtk.Align.START)
+        main_box.append(self.preview)
+        self.show_preview()
+        
         # Test area
         test_row = self.create_form_row("Test your keyboard:", self.create_test_entry())
         main_box.append(test_row)
@@ -77,9 +110,11 @@ class KeyboardPage(BasePage):
         
     def create_search_entry(self):
         """Create search entry"""
-        self.search_entry = Gtk.Entry()
+        # search-changed is debounced by the entry, so a burst of keystrokes
+        # refilters once
+        self.search_entry = Gtk.SearchEntry()
         self.search_entry.set_placeholder_text("Search for keyboard layout...")
-        self.search_entry.connect("changed", self.on_search_changed)
+        self.search_entry.connect("search-changed", self.on_search_changed)
         return self.search_entry
         
     def create_language_list(self):
@@ -89,41 +124,22 @@ class KeyboardPage(BasePage):
         scrolled.set_min_content_height(200)
         scrolled.set_hexpand(True)
         
-        self.lang_listbox = Gtk.ListBox()
-        self.lang_listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        self.lang_listbox.connect("row-selected", self.on_language_selected)
-        
-        # Language options
-        languages = [
-            ("English (US)", "us"),
-            ("English (UK)", "gb"),
-            ("Spanish", "es"),
-            ("French", "fr"),
-            ("German", "de"),
-            ("Italian", "it"),
-            ("Portuguese", "pt"),
-            ("Russian", "ru"),
-            ("Chinese", "cn"),
-            ("Japanese", "jp"),
-            ("Korean", "kr"),
-            ("Arabic", "ar")
-        ]
-        
-        for lang_name, lang_code in languages:
-            row = Gtk.ListBoxRow()
-            label = Gtk.Label(label=lang_name)
-            label.set_halign(Gtk.Align.START)
-            label.set_margin_start(12)
-            label.set_margin_end(12)
-            label.set_margin_top(8)
-            label.set_margin_bottom(8)
-            row.set_child(label)
-            row.lang_code = lang_code
-            self.lang_listbox.append(row)
-        
-        # Select first by default
-        self.lang_listbox.select_row(self.lang_listbox.get_row_at_index(0))
-        scrolled.set_child(self.lang_listbox)
+        self.language_store = Gio.ListStore(item_type=KeyboardLanguageItem)
+        self.language_store.splice(0, 0, [KeyboardLanguageItem(code, name)
+                                          for code, name in self.keyboard_index.languages])
+        self.language_filter = Gtk.CustomFilter.new(self.filter_language)
+        self.language_model = Gtk.FilterListModel(model=self.language_store,
+                                                  filter=self.language_filter)
+        
+        self.language_selection = Gtk.SingleSelection(model=self.language_model)
+        self.language_selection.connect("notify::selected-item", self.on_language_selected)
+        
+        # List views realize rows for the visible items only and rebind
+        # them as the filter or scroll position changes
+        self.language_listview = Gtk.ListView(model=self.language_selection,
+                                              factory=self.create_row_factory())
+        
+        scrolled.set_child(self.language_listview)
         return scrolled
     
     def create_layout_list(self):
@@ -133,16 +149,45 @@ class KeyboardPage(BasePage):
         scrolled.set_min_content_height(200)
         scrolled.set_hexpand(True)
         
-        self.layout_listbox = Gtk.ListBox()
-        self.layout_listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
+        self.layout_store = Gio.ListStore(item_type=LayoutItem)
+        self.layout_filter = Gtk.CustomFilter.new(self.filter_layout)
+        self.layout_model = Gtk.FilterListModel(model=self.layout_store, filter=self.layout_filter)
+        self.layout_selection = Gtk.SingleSelection(model=self.layout_model)
+        self.layout_selection.connect("notify::selected-item", self.on_layout_selected)
         
-        scrolled.set_child(self.layout_listbox)
+        self.layout_listview = Gtk.ListView(model=self.layout_selection,
+                                            factory=self.create_row_factory())
         
-        # Default layouts for US English - do this after setting up the listbox
-        self.update_layouts("us")
+        scrolled.set_child(self.layout_listview)
+        
+        # Select English by default - do this after setting up both lists
+        default_position = self.keyboard_index.language_positions.get(DEFAULT_LANGUAGE, 0)
+        self.language_selection.set_selected(default_position)
+        self.on_language_selected(self.language_selection, None)
         
         return scrolled
         
+    def create_row_factory(self):
+        """Create a factory for the single-label language and layout rows"""
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_row_setup)
+        factory.connect("bind", self.on_row_bind)
+        return factory
+        
+    def on_row_setup(self, factory, list_item):
+        """Create the label shown in a language or layout row"""
+        label = Gtk.Label()
+        label.set_halign(Gtk.Align.START)
+        label.set_margin_start(12)
+        label.set_margin_end(12)
+        label.set_margin_top(8)
+        label.set_margin_bottom(8)
+        list_item.set_child(label)
+        
+    def on_row_bind(self, factory, list_item):
+        """Fill a recycled row with the item it now shows"""
+        list_item.get_child().set_text(list_item.get_item().label)
+        
     def create_test_entry(self):
         """Create test entry"""
         self.test_entry = Gtk.Entry()
@@ -151,61 +196,69 @@ class KeyboardPage(BasePage):
         
     def update_layouts(self, lang_code):
         """Update layout list based on selected language"""
-        # Clear existing layouts
-        while True:
-            row = self.layout_listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.layout_listbox.remove(row)
-        
-        # Layout options based on language
-        layout_options = {
-            "us": ["QWERTY", "Dvorak", "Colemak"],
-            "gb": ["QWERTY", "Dvorak"],
-            "es": ["QWERTY", "Spanish"],
-            "fr": ["AZERTY", "QWERTY", "Bépo"],
-            "de": ["QWERTZ", "QWERTY"],
-            "ru": ["Русская", "QWERTY"],
-            "ar": ["Arabic", "QWERTY"]
-        }
-        
-        layouts = layout_options.get(lang_code, ["QWERTY"])
-        
-        for layout_name in layouts:
-            row = Gtk.ListBoxRow()
-            label = Gtk.Label(label=layout_name)
-            label.set_halign(Gtk.Align.START)
-            label.set_margin_start(12)
-            label.set_margin_end(12)
-            label.set_margin_top(8)
-            label.set_margin_bottom(8)
-            row.set_child(label)
-            row.layout_name = layout_name
-            self.layout_listbox.append(row)
+        self.current_language = lang_code
+        entries = self.keyboard_index.language_entries.get(lang_code, ())
+        items = [LayoutItem(position, *self.keyboard_index.entries[position])
+                 for position in entries]
+        self.layout_store.splice(0, self.layout_store.get_n_items(), items)
         
         # Select first layout
-        self.layout_listbox.select_row(self.layout_listbox.get_row_at_index(0))
+        self.layout_selection.set_selected(0)
         
-    def on_language_selected(self, listbox, row):
+    def on_language_selected(self, selection, param):
         """Handle language selection"""
-        if row:
-            lang_code = row.lang_code
-            self.update_layouts(lang_code)
+        item = selection.get_selected_item()
+        if item is not None and item.code != self.current_language:
+            self.update_layouts(item.code)
+            
+    def on_layout_selected(self, selection, param):
+        """Handle layout selection"""
+        self.show_preview()
+        
+    def show_preview(self):
+        """Point the preview at the selected layout"""
+        layout = self.layout_selection.get_selected_item()
+        if layout is not None and self.preview is not None:
+            self.preview.show_layout(layout.layout, layout.variant)
             
+    def filter_language(self, item):
+        """Keep languages matching the search by name or by one of their layouts"""
+        return self.search_matches is None or item.code in self.search_matches[0]
+        
+    def filter_layout(self, item):
+        """Keep matching layouts; a language found by name keeps all of them"""
+        if self.search_matches is None or item.position in self.search_matches[1]:
+            return True
+        return self.keyboard_index.language_matches(self.current_language, self.search_text)
+        
     def on_search_changed(self, entry):
-        """Handle search text change"""
-        search_text = entry.get_text().lower()
-        # Simple search implementation - in real app, this would filter the lists
-        print(f"Searching for: {search_text}")
+        """Refilter both lists; extending the query only re-checks current matches"""
+        previous = self.search_text
+        self.search_text = fold_text(entry.get_text().strip())
+        if self.search_text == previous:
+            return
+        if not self.search_text:
+            self.search_matches = None
+            change = Gtk.FilterChange.LESS_STRICT
+        elif previous and previous in self.search_text:
+            self.search_matches = self.keyboard_index.search(self.search_text, self.search_matches)
+            change = Gtk.FilterChange.MORE_STRICT
+        else:
+            self.search_matches = self.keyboard_index.search(self.search_text)
+            change = (Gtk.FilterChange.LESS_STRICT if self.search_text in previous
+                      else Gtk.FilterChange.DIFFERENT)
+        # The selections autoselect, so a filtered-out language or layout
+        # hands its selection to a remaining one
+        self.language_filter.changed(change)
+        self.layout_filter.changed(change)
         
     def on_continue(self, button):
         """Handle continue button click"""
-        selected_lang = self.lang_listbox.get_selected_row()
-        selected_layout = self.layout_listbox.get_selected_row()
+        layout = self.layout_selection.get_selected_item()
         
-        if selected_lang and selected_layout:
-            lang_code = selected_lang.lang_code
-            layout_name = selected_layout.layout_name
-            print(f"Selected keyboard: {lang_code} - {layout_name}")
+        if layout:
+            self.state["keyboard_layout"] = layout.layout
+            self.state["keyboard_variant"] = layout.variant
+            print(f"Selected keyboard: {layout.layout} {layout.variant}".rstrip())
             
         self.navigate("disk")
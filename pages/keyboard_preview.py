@@ -0,0 +1,125 @@
+"""
+Keyboard layout preview widget
+
+Draws the key caps of the selected layout into a Gdk.Texture. Keymap
+compilation and drawing both run on the keymap worker thread; finished
+textures are kept in an LRU, so returning to a layout only swaps the
+picture's paintable.
+"""
+
+import math
+from collections import OrderedDict
+
+import cairo
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Pango', '1.0')
+gi.require_version('PangoCairo', '1.0')
+from gi.repository import Gtk, Gdk, GLib, Pango, PangoCairo
+from backend.xkbcommon import keymap_compiler, KEY_ROWS, XkbError
+
+# Logical pixel sizes
+KEY_SIZE = 40
+KEY_GAP = 4
+KEY_RADIUS = 6
+# Row indents in key widths, as on a physical ISO keyboard
+ROW_OFFSETS = (0, 1.5, 1.75, 1.25)
+
+PREVIEW_WIDTH = round(max(offset + len(row) for offset, row in zip(ROW_OFFSETS, KEY_ROWS))
+                      * (KEY_SIZE + KEY_GAP))
+PREVIEW_HEIGHT = len(KEY_ROWS) * (KEY_SIZE + KEY_GAP)
+
+MAX_TEXTURES = 16
+_textures = OrderedDict()
+
+def rounded_rectangle(cr, x, y, width, height, radius):
+    """Add a rounded rectangle path"""
+    cr.new_sub_path()
+    cr.arc(x + width - radius, y + radius, radius, -math.pi / 2, 0)
+    cr.arc(x + width - radius, y + height - radius, radius, 0, math.pi / 2)
+    cr.arc(x + radius, y + height - radius, radius, math.pi / 2, math.pi)
+    cr.arc(x + radius, y + radius, radius, math.pi, 3 * math.pi / 2)
+    cr.close_path()
+
+def draw_label(cr, layout, text, x, y):
+    """Draw text with its top-left corner at (x, y)"""
+    layout.set_text(text, -1)
+    cr.move_to(x, y)
+    PangoCairo.show_layout(cr, layout)
+
+def render_key_caps(key_caps, scale=1):
+    """Draw key caps; return (width, height, stride, BGRA premultiplied bytes)"""
+    width = PREVIEW_WIDTH * scale
+    height = PREVIEW_HEIGHT * scale
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    cr = cairo.Context(surface)
+    cr.scale(scale, scale)
+
+    layout = PangoCairo.create_layout(cr)
+    base_font = Pango.FontDescription.from_string("Inter 13")
+    shift_font = Pango.FontDescription.from_string("Inter 9")
+
+    unit = KEY_SIZE + KEY_GAP
+    for row, (offset, row_caps) in enumerate(zip(ROW_OFFSETS, key_caps)):
+        y = row * unit
+        for column, (base, shifted) in enumerate(row_caps):
+            x = (offset + column) * unit
+            rounded_rectangle(cr, x, y, KEY_SIZE, KEY_SIZE, KEY_RADIUS)
+            cr.set_source_rgb(0.102, 0.102, 0.102)
+            cr.fill_preserve()
+            cr.set_source_rgb(0.2, 0.2, 0.2)
+            cr.set_line_width(1)
+            cr.stroke()
+
+            # Shifted symbol on top only when it is not just the capital
+            if shifted and shifted != base.upper():
+                layout.set_font_description(shift_font)
+                cr.set_source_rgb(0.6, 0.6, 0.6)
+                draw_label(cr, layout, shifted, x + 6, y + 3)
+            layout.set_font_description(base_font)
+            cr.set_source_rgb(1, 1, 1)
+            draw_label(cr, layout, base.upper() if shifted == base.upper() else base,
+                       x + 6, y + KEY_SIZE - 22)
+
+    surface.flush()
+    return width, height, surface.get_stride(), bytes(surface.get_data())
+
+class KeyboardPreview(Gtk.Picture):
+    def __init__(self):
+        super().__init__()
+        self.set_size_request(PREVIEW_WIDTH, PREVIEW_HEIGHT)
+        self.set_can_shrink(True)
+        # Latest requested texture key; older renders are cached but not shown
+        self.requested = None
+
+    def show_layout(self, layout, variant=""):
+        """Show a layout, rendering it in the background on first use"""
+        scale = self.get_scale_factor()
+        key = (layout, variant, scale)
+        self.requested = key
+        texture = _textures.get(key)
+        if texture is not None:
+            _textures.move_to_end(key)
+            self.set_paintable(texture)
+            return
+        future = keymap_compiler.submit(layout, variant,
+                                        lambda key_caps: render_key_caps(key_caps, scale))
+        future.add_done_callback(lambda future: GLib.idle_add(self.on_rendered, key, future))
+
+    def on_rendered(self, key, future):
+        """Wrap a finished render in a texture on the main thread"""
+        try:
+            width, height, stride, data = future.result()
+        except (XkbError, cairo.Error) as e:
+            print(f"Warning: Could not render keyboard layout {key[0]} {key[1]}: {e}")
+            if key == self.requested:
+                self.set_paintable(None)
+            return False
+        texture = Gdk.MemoryTexture.new(width, height, Gdk.MemoryFormat.B8G8R8A8_PREMULTIPLIED,
+                                        GLib.Bytes.new(data), stride)
+        _textures[key] = texture
+        if len(_textures) > MAX_TEXTURES:
+            _textures.popitem(last=False)
+        if key == self.requested:
+            self.set_paintable(texture)
+        return False  # Don't repeat idle callback
@@ -3,19 +3,22 @@ Language Selection Page
 """
 
 import gi
-import os
-import sys
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, Gio, GLib
+from gi.repository import Gtk, Gio, GObject
 from .base_page import BasePage
+from load_image import get_paintable
+from backend.locales import load_locales, DEFAULT_LOCALE
+from backend.search import fold_text
 
-# Import helper function to load images
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from load_image import load_image_from_path
+class LanguageItem(GObject.Object):
+    """List model item wrapping a backend.locales.Locale"""
+    def __init__(self, locale):
+        super().__init__()
+        self.locale = locale
 
 class LanguagePage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
         self.setup_page()
     
     def setup_page(self):
@@ -32,23 +35,13 @@ class LanguagePage(BasePage):
         title_label.add_css_class("language-title")
         title_label.set_halign(Gtk.Align.START)
         left_panel.append(title_label)       
-        # Language icon using image file       
-        # Get absolute path to icon file (multiple ways to ensure we find it)
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        icon_path = os.path.join(base_dir, "assets", "language_icon.png") # Corrected path
-            
-            
-        # Print debug info
-        print(f"Language icon path: {icon_path}, exists: {os.path.exists(icon_path)}") # Updated debug message
-        # Try to load with the primary path
-        if os.path.exists(icon_path):
-            # Create image widget
-            image = Gtk.Image()
-            image.set_from_file(icon_path)
+        # Language icon, decoded once at the size it is shown at
+        icon = get_paintable("language_icon.png", size=(64, 64))
+        if icon is not None:
+            image = Gtk.Image.new_from_paintable(icon)
             image.set_size_request(64, 64)
             image.add_css_class("language-icon")
             left_panel.append(image)
-                   
                 
         # Right panel with selection - moved more to the right
         right_panel = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
@@ -86,63 +79,98 @@ class LanguagePage(BasePage):
         self.continue_btn.connect("clicked", self.on_continue)
     
     def setup_language_selection(self, parent_container):
-        """Setup language selection list"""
+        """Setup the searchable language list"""
         # Create container for the selection
         selection_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         selection_container.add_css_class("language-selection-container")
         
+        # Type-ahead search; typing anywhere on the page lands here
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search languages...")
+        self.search_entry.set_key_capture_widget(self)
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        selection_container.append(self.search_entry)
+        self.search_text = ""
+        
         # Create scrolled window for language list
         scrolled = Gtk.ScrolledWindow()
         scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scrolled.set_vexpand(True)
         
-        # Create list box
-        self.language_list = Gtk.ListBox()
-        self.language_list.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        
-        # Language options without flag emojis
-        languages = [
-            ("English", "en"),
-            ("Español", "es"),
-            ("Français", "fr"),
-            ("Deutsch", "de"),
-            ("Italiano", "it"),
-            ("Português", "pt"),
-            ("Русский", "ru"),
-            ("中文", "zh"),
-            ("日本語", "ja"),
-            ("한국어", "ko"),
-            ("العربية", "ar"),
-            ("हिन्दी", "hi")
-        ]
-        
-        for lang_name, lang_code in languages:
-            row = Gtk.ListBoxRow()
-            row.add_css_class("language-list-item")
-            
-            label = Gtk.Label(label=lang_name)
-            label.set_halign(Gtk.Align.START)
-            label.set_margin_start(16)
-            label.set_margin_end(16)
-            label.set_margin_top(12)
-            label.set_margin_bottom(12)
-            label.set_markup(f'<span font="14">{lang_name}</span>')
-            
-            row.set_child(label)
-            row.lang_code = lang_code
-            self.language_list.append(row)
-        
-        # Select English by default
-        self.language_list.select_row(self.language_list.get_row_at_index(0))
+        # Full locale catalog in one model; the list view only realizes
+        # rows for the visible items and recycles them while scrolling
+        self.language_store = Gio.ListStore(item_type=LanguageItem)
+        locales = load_locales()
+        self.language_store.splice(0, 0, [LanguageItem(locale) for locale in locales])
+        
+        self.language_filter = Gtk.CustomFilter.new(self.filter_language)
+        filter_model = Gtk.FilterListModel(model=self.language_store, filter=self.language_filter)
+        self.language_selection = Gtk.SingleSelection(model=filter_model)
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_language_item_setup)
+        factory.connect("bind", self.on_language_item_bind)
+        
+        self.language_list = Gtk.ListView(model=self.language_selection, factory=factory)
+        
+        # Select English (US) by default
+        codes = [locale.code for locale in locales]
+        if DEFAULT_LOCALE in codes:
+            self.language_selection.set_selected(codes.index(DEFAULT_LOCALE))
         
         scrolled.set_child(self.language_list)
         selection_container.append(scrolled)
         parent_container.append(selection_container)
         
+    def on_language_item_setup(self, factory, list_item):
+        """Create the widgets for a language row"""
+        row_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        row_box.add_css_class("language-list-item")
+        
+        name_label = Gtk.Label()
+        name_label.set_halign(Gtk.Align.START)
+        name_label.add_css_class("language-name")
+        row_box.append(name_label)
+        
+        territory_label = Gtk.Label()
+        territory_label.set_halign(Gtk.Align.START)
+        territory_label.add_css_class("info-text")
+        row_box.append(territory_label)
+        
+        list_item.set_child(row_box)
+        
+    def on_language_item_bind(self, factory, list_item):
+        """Fill a recycled row with the item it now shows"""
+        locale = list_item.get_item().locale
+        name_label = list_item.get_child().get_first_child()
+        name_label.set_text(locale.name)
+        name_label.get_next_sibling().set_text(locale.territory_name)
+        
+    def filter_language(self, item):
+        """Match an item against the folded search text"""
+        return self.search_text in item.locale.search_key
+        
+    def on_search_changed(self, entry):
+        """Refilter the list; extending the query only re-checks current matches"""
+        previous = self.search_text
+        self.search_text = fold_text(entry.get_text().strip())
+        if self.search_text == previous:
+            return
+        if self.search_text.startswith(previous):
+            change = Gtk.FilterChange.MORE_STRICT
+        elif previous.startswith(self.search_text):
+            change = Gtk.FilterChange.LESS_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self.language_filter.changed(change)
+        
     def on_continue(self, button):
         """Handle continue button click"""
-        selected_row = self.language_list.get_selected_row()
-        if selected_row:
-            selected_lang = selected_row.lang_code
-            print(f"Selected language: {selected_lang}")
+        selected_item = self.language_selection.get_selected_item()
+        if selected_item:
+            locale = selected_item.locale
+            self.state["locale"] = locale.code
+            self.state["language"] = locale.language
+            self.state["territory"] = locale.territory
+            print(f"Selected language: {locale.code}")
             self.navigate("timezone")
@@ -0,0 +1,286 @@
+"""
+Manual Partitioning Page
+"""
+
+import gi
+gi.require_version('Gtk', '4.0')
+from gi.repository import Gtk, Gio, GLib, GObject
+from .base_page import BasePage
+from backend.disks import format_size
+from backend.partitioning import MiB, partition_path
+from backend.gpt import GptError
+from backend.partition_table import submit_read_table, type_label, PARTITION_TYPES, TableError
+
+SCHEME_LABELS = {"gpt": "GPT", "mbr": "MBR (will be converted to GPT)"}
+
+class PartitionItem(GObject.Object):
+    """List model item wrapping a backend.partition_table.TablePartition"""
+    def __init__(self, partition):
+        super().__init__()
+        self.partition = partition
+
+class PartitionPage(BasePage):
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        self.table = None
+        # Disk the current table was read from
+        self.table_disk = None
+        self.largest_free = 0
+        self.setup_page()
+        
+    def setup_page(self):
+        # Create header
+        self.create_header(
+            "Storage",
+            "Manual Partitioning",
+            "Create, delete and resize partitions. Nothing is written until the installation starts."
+        )
+        
+        # Partition editor
+        self.setup_partition_editor()
+        
+        # Setup navigation
+        self.back_btn.connect("clicked", lambda x: self.navigate("disk"))
+        self.continue_btn.connect("clicked", self.on_continue)
+        
+    def setup_partition_editor(self):
+        """Setup partition list and edit controls"""
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        main_box.set_spacing(20)
+        
+        # Disk summary / read status
+        self.disk_label = Gtk.Label()
+        self.disk_label.add_css_class("info-text")
+        self.disk_label.set_halign(Gtk.Align.START)
+        main_box.append(self.disk_label)
+        
+        # Partition list
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_min_content_height(180)
+        
+        self.partition_store = Gio.ListStore(item_type=PartitionItem)
+        self.partition_selection = Gtk.SingleSelection(model=self.partition_store)
+        self.partition_selection.connect("notify::selected-item", self.on_partition_selected)
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_partition_item_setup)
+        factory.connect("bind", self.on_partition_item_bind)
+        
+        partition_list = Gtk.ListView(model=self.partition_selection, factory=factory)
+        scrolled.set_child(partition_list)
+        main_box.append(scrolled)
+        
+        self.free_label = Gtk.Label()
+        self.free_label.add_css_class("info-text")
+        self.free_label.set_halign(Gtk.Align.START)
+        main_box.append(self.free_label)
+        
+        # Size and type for new or resized partitions
+        controls_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        controls_box.set_spacing(12)
+        
+        self.size_spin = Gtk.SpinButton.new_with_range(1, 1, 1)
+        self.size_spin.set_digits(0)
+        controls_box.append(self.create_form_row("Size (MiB):", self.size_spin))
+        
+        self.type_dropdown = Gtk.DropDown.new_from_strings([label for label, _ in PARTITION_TYPES])
+        controls_box.append(self.create_form_row("Type:", self.type_dropdown))
+        
+        main_box.append(controls_box)
+        
+        # Edit buttons
+        buttons_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        buttons_box.set_spacing(12)
+        
+        self.add_btn = Gtk.Button(label="Add")
+        self.add_btn.add_css_class("btn-secondary")
+        self.add_btn.connect("clicked", self.on_add_clicked)
+        buttons_box.append(self.add_btn)
+        
+        self.resize_btn = Gtk.Button(label="Resize")
+        self.resize_btn.add_css_class("btn-secondary")
+        self.resize_btn.connect("clicked", self.on_resize_clicked)
+        buttons_box.append(self.resize_btn)
+        
+        self.delete_btn = Gtk.Button(label="Delete")
+        self.delete_btn.add_css_class("btn-secondary")
+        self.delete_btn.connect("clicked", self.on_delete_clicked)
+        buttons_box.append(self.delete_btn)
+        
+        self.undo_btn = Gtk.Button(label="Undo")
+        self.undo_btn.add_css_class("btn-secondary")
+        self.undo_btn.connect("clicked", self.on_undo_clicked)
+        buttons_box.append(self.undo_btn)
+        
+        main_box.append(buttons_box)
+        
+        # Pending edits
+        self.pending_label = Gtk.Label()
+        self.pending_label.add_css_class("info-text")
+        self.pending_label.set_halign(Gtk.Align.START)
+        main_box.append(self.pending_label)
+        
+        self.content_box.append(main_box)
+        self.refresh()
+        
+    def on_partition_item_setup(self, factory, list_item):
+        """Create the widgets for a partition row"""
+        row_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        row_box.set_spacing(4)
+        row_box.set_margin_start(12)
+        row_box.set_margin_end(12)
+        row_box.set_margin_top(8)
+        row_box.set_margin_bottom(8)
+        
+        name_label = Gtk.Label()
+        name_label.set_halign(Gtk.Align.START)
+        name_label.add_css_class("page-subtitle")
+        row_box.append(name_label)
+        
+        details_label = Gtk.Label()
+        details_label.set_halign(Gtk.Align.START)
+        details_label.add_css_class("info-text")
+        row_box.append(details_label)
+        
+        list_item.set_child(row_box)
+        
+    def on_partition_item_bind(self, factory, list_item):
+        """Fill a recycled row with the partition it now shows"""
+        partition = list_item.get_item().partition
+        name_label = list_item.get_child().get_first_child()
+        name_label.set_text(f"{partition_path(self.table_disk, partition.number)} - "
+                            f"{format_size(partition.size)}")
+        details = type_label(partition.type_guid)
+        if partition.name:
+            details += f" - {partition.name}"
+        name_label.get_next_sibling().set_text(details)
+        
+    def on_shown(self):
+        """Read the chosen disk's table the first time it is shown"""
+        disk = self.state.get("disk")
+        if disk and disk != self.table_disk:
+            self.table = None
+            self.table_disk = disk
+            self.disk_label.set_text(f"Reading the partition table of {disk}...")
+            self.refresh()
+            future = submit_read_table(disk)
+            future.add_done_callback(lambda future: GLib.idle_add(self.on_table_read, disk, future))
+        
+    def on_table_read(self, disk, future):
+        """Show a table read in the background"""
+        if disk != self.table_disk:
+            return False  # Another disk was chosen meanwhile
+        try:
+            self.table = future.result()
+        except (OSError, TableError, GptError) as e:
+            self.disk_label.set_text(f"Could not read {disk}: {e}")
+            return False
+        scheme = SCHEME_LABELS.get(self.table.scheme, "no partition table")
+        self.disk_label.set_text(f"{disk} - {format_size(self.table.disk_size)} - {scheme}")
+        self.refresh()
+        return False  # Don't repeat idle callback
+        
+    def refresh(self):
+        """Show the current table and the pending edit count"""
+        partitions = self.table.partitions if self.table else []
+        self.partition_store.splice(0, self.partition_store.get_n_items(),
+                                    [PartitionItem(partition) for partition in partitions])
+        
+        editable = self.table is not None
+        free_regions = self.table.free_regions() if editable else []
+        largest_free = max((size for _, size in free_regions), default=0)
+        if editable:
+            total_free = sum(size for _, size in free_regions)
+            self.free_label.set_text(f"Free space: {format_size(total_free)}")
+            pending = len(self.table.journal)
+            self.pending_label.set_text(f"{pending} pending change{'s' if pending != 1 else ''}")
+        else:
+            self.free_label.set_text("")
+            self.pending_label.set_text("")
+        self.add_btn.set_sensitive(largest_free > 0)
+        self.undo_btn.set_sensitive(editable and bool(self.table.journal))
+        self.largest_free = largest_free
+        self.on_partition_selected(self.partition_selection, None)
+        
+    def selected_partition(self):
+        """Return the selected TablePartition, or None"""
+        item = self.partition_selection.get_selected_item()
+        return item.partition if item else None
+        
+    def on_partition_selected(self, selection, param):
+        """Enable the edits that apply to the selection and bound the size"""
+        partition = self.selected_partition()
+        self.resize_btn.set_sensitive(partition is not None)
+        self.delete_btn.set_sensitive(partition is not None)
+        limit = self.largest_free
+        if partition is not None:
+            limit = max(limit, self.table.max_size(partition.number))
+        self.size_spin.set_range(1, max(limit // MiB, 1))
+        
+    def edit(self, operation, *args):
+        """Run a table edit, reporting validation errors"""
+        try:
+            operation(*args)
+        except TableError as e:
+            self.show_error(str(e))
+            return
+        self.refresh()
+        
+    def on_add_clicked(self, button):
+        """Add a partition at the start of the first free region it fits in"""
+        size = int(self.size_spin.get_value()) * MiB
+        for start, free in self.table.free_regions():
+            if free >= size:
+                break
+        else:
+            self.show_error(f"There is no free region of {format_size(size)}.")
+            return
+        _, type_guid = PARTITION_TYPES[self.type_dropdown.get_selected()]
+        self.edit(self.table.create, start, size, type_guid)
+        
+    def on_resize_clicked(self, button):
+        """Resize the selected partition to the chosen size"""
+        partition = self.selected_partition()
+        if partition is not None:
+            self.edit(self.table.resize, partition.number, int(self.size_spin.get_value()) * MiB)
+        
+    def on_delete_clicked(self, button):
+        """Delete the selected partition"""
+        partition = self.selected_partition()
+        if partition is not None:
+            self.edit(self.table.delete, partition.number)
+        
+    def on_undo_clicked(self, button):
+        """Drop the last pending edit"""
+        if self.table is not None:
+            self.edit(self.table.undo)
+        
+    def on_continue(self, button):
+        """Handle continue button click"""
+        if self.table is None:
+            self.show_error("The partition table has not been read yet.")
+            return
+        try:
+            self.table.validate()
+        except TableError as e:
+            self.show_error(str(e))
+            return
+        
+        self.state["partition_table"] = self.table
+        print(f"Partition edits for {self.table_disk}: {len(self.table.journal)}")
+        
+        self.navigate("wifi")
+        
+    def show_error(self, message):
+        """Show error dialog"""
+        dialog = Gtk.MessageDialog(
+            transient_for=self.get_root(),
+            modal=True,
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.OK,
+            text=message
+        )
+        dialog.connect("response", lambda d, r: d.destroy())
+        dialog.present()
+        
\ No newline at end of file
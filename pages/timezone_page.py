@@ -3,13 +3,24 @@ Timezone Selection Page
 """
 
 import gi
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 from .base_page import BasePage
+from backend.timezones import load_catalog, DEFAULT_TIMEZONE
 
 class TimezonePage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        self.catalog = load_catalog()
+        # One persistent city model per region, swapped in on region change
+        self.city_models = {}
+        # Resolved once per selection, not per clock tick
+        self.zone = None
+        self.clock_source = 0
+        # Locale the current selection was derived from
+        self.preselected_locale = None
         self.setup_page()
         
     def setup_page(self):
@@ -32,6 +43,10 @@ class TimezonePage(BasePage):
         main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         main_box.set_spacing(16)
         
+        # Fuzzy search over all zones and their aliases
+        search_row = self.create_form_row("Search:", self.create_search_box())
+        main_box.append(search_row)
+        
         # Region selection
         region_row = self.create_form_row("Region:", self.create_region_dropdown())
         main_box.append(region_row)
@@ -49,7 +64,7 @@ class TimezonePage(BasePage):
         time_label.set_halign(Gtk.Align.START)
         time_box.append(time_label)
         
-        self.current_time = Gtk.Label(label="12:34:56 PM")
+        self.current_time = Gtk.Label()
         self.current_time.set_halign(Gtk.Align.START)
         self.current_time.add_css_class("page-subtitle")
         time_box.append(self.current_time)
@@ -58,78 +73,174 @@ class TimezonePage(BasePage):
         
         self.content_box.append(main_box)
         
+    def create_search_box(self):
+        """Create search entry with a ranked result list"""
+        search_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        search_box.set_spacing(8)
+        
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search for a city, country or timezone...")
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        self.search_entry.connect("activate", self.on_search_activate)
+        search_box.append(self.search_entry)
+        
+        self.search_results = Gtk.StringList()
+        self.results_list = Gtk.ListBox()
+        self.results_list.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.results_list.bind_model(self.search_results, self.create_result_row)
+        self.results_list.connect("row-activated", self.on_result_activated)
+        self.results_list.set_visible(False)
+        search_box.append(self.results_list)
+        
+        return search_box
+        
+    def create_result_row(self, item):
+        """Create the widget for one search result"""
+        zone = self.catalog.get(item.get_string())
+        label = Gtk.Label(label=f"{zone.city} ({zone.region})")
+        label.set_halign(Gtk.Align.START)
+        label.set_margin_start(12)
+        label.set_margin_end(12)
+        label.set_margin_top(8)
+        label.set_margin_bottom(8)
+        return label
+        
+    def on_search_changed(self, entry):
+        """Show the best matches for the search text"""
+        results = [zone.name for zone in self.catalog.search(entry.get_text())]
+        self.search_results.splice(0, self.search_results.get_n_items(), results)
+        self.results_list.set_visible(bool(results))
+        
+    def on_search_activate(self, entry):
+        """Pick the top result when Enter is pressed"""
+        if self.search_results.get_n_items():
+            self.pick_search_result(self.search_results.get_string(0))
+        
+    def on_result_activated(self, listbox, row):
+        """Pick a clicked search result"""
+        self.pick_search_result(self.search_results.get_string(row.get_index()))
+        
+    def pick_search_result(self, name):
+        """Select a zone from the search results and clear the search"""
+        self.select_timezone(name)
+        self.search_entry.set_text("")
+        
     def create_region_dropdown(self):
         """Create region dropdown"""
         self.region_dropdown = Gtk.DropDown()
-        
-        # Region options
-        regions = Gtk.StringList()
-        region_names = [
-            "Africa", "America", "Antarctica", "Arctic", "Asia", 
-            "Atlantic", "Australia", "Europe", "Indian", "Pacific"
-        ]
-        
-        for region in region_names:
-            regions.append(region)
-            
-        self.region_dropdown.set_model(regions)
-        self.region_dropdown.set_selected(7)  # Europe by default
-        self.region_dropdown.connect("notify::selected", self.on_region_changed)
-        
+        self.region_dropdown.set_model(Gtk.StringList(strings=self.catalog.regions))
         return self.region_dropdown
         
     def create_city_dropdown(self):
         """Create city dropdown"""
         self.city_dropdown = Gtk.DropDown()
         
-        # Default cities for Europe
-        cities = Gtk.StringList()
-        city_names = [
-            "London", "Paris", "Berlin", "Rome", "Madrid", 
-            "Amsterdam", "Brussels", "Vienna", "Prague", "Warsaw"
-        ]
-        
-        for city in city_names:
-            cities.append(city)
-            
-        self.city_dropdown.set_model(cities)
-        self.city_dropdown.set_selected(0)  # London by default
+        # Select the default zone, then follow region changes
+        region_idx, city_idx = self.catalog.locate(DEFAULT_TIMEZONE) or (0, 0)
+        self.region_dropdown.set_selected(region_idx)
+        self.city_dropdown.set_model(self.get_city_model(self.catalog.regions[region_idx]))
+        self.city_dropdown.set_selected(city_idx)
+        self.region_dropdown.connect("notify::selected", self.on_region_changed)
+        self.city_dropdown.connect("notify::selected", self.on_city_changed)
         
         return self.city_dropdown
         
+    def get_city_model(self, region):
+        """Return the city list for a region, building it on first use"""
+        model = self.city_models.get(region)
+        if model is None:
+            model = Gtk.StringList(strings=[zone.city for zone in self.catalog.cities(region)])
+            self.city_models[region] = model
+        return model
+        
     def on_region_changed(self, dropdown, param):
         """Handle region selection change"""
         selected = dropdown.get_selected()
-        region_model = dropdown.get_model()
-        region_name = region_model.get_string(selected)
-        
-        # Update cities based on region (simplified)
-        cities = Gtk.StringList()
-        city_lists = {
-            "Europe": ["London", "Paris", "Berlin", "Rome", "Madrid"],
-            "America": ["New_York", "Los_Angeles", "Chicago", "Toronto", "Mexico_City"],
-            "Asia": ["Tokyo", "Shanghai", "Mumbai", "Seoul", "Singapore"],
-            "Australia": ["Sydney", "Melbourne", "Brisbane", "Perth", "Adelaide"],
-            "Africa": ["Cairo", "Cape_Town", "Lagos", "Nairobi", "Casablanca"]
-        }
-        
-        city_names = city_lists.get(region_name, ["GMT"])
-        for city in city_names:
-            cities.append(city)
-            
-        self.city_dropdown.set_model(cities)
+        if selected >= len(self.catalog.regions):
+            return
+        region = self.catalog.regions[selected]
+        self.city_dropdown.set_model(self.get_city_model(region))
         self.city_dropdown.set_selected(0)
-        
-    def on_continue(self, button):
-        """Handle continue button click"""
+        self.update_zone()
+        
+    def on_city_changed(self, dropdown, param):
+        """Handle city selection change"""
+        self.update_zone()
+        
+    def update_zone(self):
+        """Resolve the selected zone and refresh the clock"""
+        timezone = self.get_selected_timezone()
+        try:
+            self.zone = ZoneInfo(timezone.name) if timezone else None
+        except (ZoneInfoNotFoundError, ValueError):
+            self.zone = None
+        self.update_clock()
+        
+    def update_clock(self):
+        """Show the current time in the selected zone"""
+        if self.zone is None:
+            now = datetime.now().astimezone()
+        else:
+            now = datetime.now(self.zone)
+        self.current_time.set_text(now.strftime("%I:%M:%S %p %Z"))
+        
+    def select_timezone(self, name):
+        """Point both dropdowns at a zone"""
+        location = self.catalog.locate(name)
+        if location is None:
+            return
+        region_idx, city_idx = location
+        self.region_dropdown.set_selected(region_idx)
+        self.city_dropdown.set_model(self.get_city_model(self.catalog.regions[region_idx]))
+        self.city_dropdown.set_selected(city_idx)
+        
+    def on_shown(self):
+        """Preselect from the chosen language and run the clock while visible"""
+        locale = self.state.get("locale")
+        if locale and locale != self.preselected_locale:
+            self.preselected_locale = locale
+            self.select_timezone(self.catalog.timezone_for_locale(
+                self.state.get("language", ""), self.state.get("territory", "")))
+        self.update_zone()
+        if not self.clock_source:
+            self.schedule_clock_tick()
+        
+    def on_hidden(self):
+        """Stop the clock when navigating away"""
+        if self.clock_source:
+            GLib.source_remove(self.clock_source)
+            self.clock_source = 0
+        
+    def schedule_clock_tick(self):
+        """Arm a one-shot timer for just after the next wall-clock second
+
+        timeout_add_seconds() would shift every tick by GLib's per-session
+        offset, so each tick re-arms against the clock instead.
+        """
+        delay = 1000 - datetime.now().microsecond // 1000
+        self.clock_source = GLib.timeout_add(delay, self.on_clock_tick)
+        
+    def on_clock_tick(self):
+        """Per-second clock update"""
+        self.update_clock()
+        self.schedule_clock_tick()
+        return False  # Don't repeat timeout
+        
+    def get_selected_timezone(self):
+        """Return the selected backend.timezones.Timezone, or None"""
         region_idx = self.region_dropdown.get_selected()
         city_idx = self.city_dropdown.get_selected()
+        if region_idx >= len(self.catalog.regions):
+            return None
+        cities = self.catalog.cities(self.catalog.regions[region_idx])
+        if city_idx >= len(cities):
+            return None
+        return cities[city_idx]
         
-        region_model = self.region_dropdown.get_model()
-        city_model = self.city_dropdown.get_model()
-        
-        region = region_model.get_string(region_idx)
-        city = city_model.get_string(city_idx)
-        
-        print(f"Selected timezone: {region}/{city}")
+    def on_continue(self, button):
+        """Handle continue button click"""
+        timezone = self.get_selected_timezone()
+        if timezone:
+            self.state["timezone"] = timezone.name
+            print(f"Selected timezone: {timezone.name}")
         self.navigate("keyboard")
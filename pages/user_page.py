@@ -4,12 +4,12 @@ User Account Creation Page
 
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, GdkPixbuf
+from gi.repository import Gtk
 from .base_page import BasePage
 
 class UserPage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
         self.setup_page()
         
     def setup_page(self):
@@ -293,5 +293,6 @@ class UserPage(BasePage):
             if key != "password":  # Don't print password
                 print(f"  {key}: {value}")
                 
-        # Navigate to finish (or next step)
-        self.navigate("finish")
+        self.state["user"] = user_data
+        
+        self.navigate("install")
@@ -5,11 +5,11 @@ import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk
 from .base_page import BasePage
-import os
+from load_image import get_paintable
 
 class WelcomePage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
         self.setup_page()
 
     def setup_page(self):
@@ -36,10 +36,7 @@ class WelcomePage(BasePage):
         centered_box.append(subtitle)
 
         # Laptop Icon
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        icon_path = os.path.join(base_dir, "assets", "laptop-wave-icon.png")
-        laptop_icon = Gtk.Image()
-        laptop_icon.set_from_file(icon_path)
+        laptop_icon = Gtk.Image.new_from_paintable(get_paintable("laptop-wave-icon.png"))
         laptop_icon.add_css_class("welcome-laptop-icon")
         centered_box.append(laptop_icon)
 
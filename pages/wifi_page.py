@@ -2,14 +2,51 @@
 WiFi Setup Page
 """
 
+import bisect
 import gi
 gi.require_version('Gtk', '4.0')
-from gi.repository import Gtk, GLib
+from gi.repository import Gtk, Gio, GLib, GObject
 from .base_page import BasePage
+from backend.network import (open_backend, signal_bars, ScanScheduler, STAGE_ASSOCIATING,
+                             STAGE_AUTHENTICATING, STAGE_OBTAINING_IP, STAGE_CONNECTED,
+                             STAGE_FAILED)
+from backend.access_points import NetworkAggregator
+from backend.connectivity import submit_check
+
+# Status line for each connection stage
+STAGE_MESSAGES = {
+    STAGE_ASSOCIATING: "Connecting to {ssid}...",
+    STAGE_AUTHENTICATING: "Checking the password for {ssid}...",
+    STAGE_OBTAINING_IP: "Getting an address from {ssid}...",
+    STAGE_CONNECTED: "Connected to {ssid}",
+    STAGE_FAILED: "Could not connect to {ssid}: {reason}",
+}
+
+class NetworkItem(GObject.Object):
+    """List model item wrapping a backend.access_points.Network"""
+    def __init__(self, network):
+        super().__init__()
+        self.network = network
+        # Row currently bound to this item, refreshed in place on rescans
+        self.row = None
 
 class WifiPage(BasePage):
-    def __init__(self, navigate_callback):
-        super().__init__(navigate_callback)
+    def __init__(self, navigate_callback, state=None):
+        super().__init__(navigate_callback, state)
+        # NetworkBackend, found asynchronously the first time the page is shown
+        self.backend = None
+        self.backend_requested = False
+        # Scans in the background only while the page is visible
+        self.scheduler = None
+        self.visible = False
+        # Latest backend.network.ConnectionState, and the Cancellable of
+        # the attempt in progress
+        self.connection_state = None
+        self.connect_cancellable = None
+        # Merges scans into one entry per network; network_keys holds the
+        # sorted keys of the items in networks_store, position for position
+        self.aggregator = NetworkAggregator()
+        self.network_keys = []
         self.setup_page()
         
     def setup_page(self):
@@ -24,7 +61,8 @@ class WifiPage(BasePage):
         self.setup_wifi_interface()
         
         # Setup navigation
-        self.back_btn.connect("clicked", lambda x: self.navigate("disk"))
+        self.back_btn.connect("clicked", lambda x: self.navigate(
+            "partition" if self.state.get("install_type") == "manual" else "disk"))
         self.continue_btn.connect("clicked", self.on_continue)
         
         # Skip button for wired connections
@@ -108,21 +146,132 @@ class WifiPage(BasePage):
         
         self.content_box.append(main_box)
         
-        # Start network scan
-        self.scan_networks()
+    def on_shown(self):
+        """Scan in the background while visible; find the backend first"""
+        self.visible = True
+        if not self.backend_requested:
+            self.backend_requested = True
+            self.scanning_label.set_visible(True)
+            open_backend(self.on_backend_ready)
+        elif self.scheduler is not None and self.wifi_switch.get_active():
+            self.scheduler.start()
+        
+    def on_hidden(self):
+        """Stop scanning, cancelling a scan in flight"""
+        self.visible = False
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        
+    def on_backend_ready(self, backend):
+        """Start scanning once NetworkManager (or the demo backend) is found"""
+        self.backend = backend
+        self.scheduler = ScanScheduler(backend, self.on_scan_started, self.on_scan_finished)
+        self.scanning_label.set_visible(False)
+        if self.visible and self.wifi_switch.get_active():
+            self.scheduler.start()
         
     def create_networks_list(self):
         """Create WiFi networks list"""
+        networks_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        
+        # Shown in place of the list while a scan is running
+        self.scanning_label = Gtk.Label(label="🔄 Scanning for networks...")
+        self.scanning_label.set_margin_start(12)
+        self.scanning_label.set_margin_end(12)
+        self.scanning_label.set_margin_top(12)
+        self.scanning_label.set_margin_bottom(12)
+        self.scanning_label.set_visible(False)
+        networks_box.append(self.scanning_label)
+        
         scrolled = Gtk.ScrolledWindow()
         scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scrolled.set_min_content_height(200)
         
-        self.networks_listbox = Gtk.ListBox()
-        self.networks_listbox.set_selection_mode(Gtk.SelectionMode.SINGLE)
-        self.networks_listbox.connect("row-selected", self.on_network_selected)
-        
-        scrolled.set_child(self.networks_listbox)
-        return scrolled
+        # Rescans insert and remove only the networks that came and went;
+        # the others keep their item and have their row updated in place
+        self.networks_store = Gio.ListStore(item_type=NetworkItem)
+        self.networks_selection = Gtk.SingleSelection(model=self.networks_store)
+        self.networks_selection.set_autoselect(False)
+        self.networks_selection.set_can_unselect(True)
+        self.networks_selection.connect("notify::selected-item", self.on_network_selected)
+        
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_network_item_setup)
+        factory.connect("bind", self.on_network_item_bind)
+        factory.connect("unbind", self.on_network_item_unbind)
+        
+        self.networks_listview = Gtk.ListView(model=self.networks_selection, factory=factory)
+        
+        scrolled.set_child(self.networks_listview)
+        networks_box.append(scrolled)
+        return networks_box
+        
+    def on_network_item_setup(self, factory, list_item):
+        """Create the widgets for a network row"""
+        network_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        network_box.set_spacing(12)
+        network_box.set_margin_start(12)
+        network_box.set_margin_end(12)
+        network_box.set_margin_top(8)
+        network_box.set_margin_bottom(8)
+        
+        # Network info
+        info_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        info_box.set_spacing(2)
+        info_box.set_hexpand(True)
+        
+        # SSID
+        ssid_label = Gtk.Label()
+        ssid_label.set_halign(Gtk.Align.START)
+        ssid_label.add_css_class("page-subtitle")
+        info_box.append(ssid_label)
+        
+        # Security info
+        security_label = Gtk.Label()
+        security_label.set_halign(Gtk.Align.START)
+        security_label.add_css_class("info-text")
+        info_box.append(security_label)
+        
+        network_box.append(info_box)
+        
+        # Signal strength
+        signal_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        signal_box.set_valign(Gtk.Align.CENTER)
+        
+        signal_label = Gtk.Label()
+        signal_label.add_css_class("page-subtitle")
+        signal_box.append(signal_label)
+        
+        strength_label = Gtk.Label()
+        strength_label.add_css_class("info-text")
+        signal_box.append(strength_label)
+        
+        network_box.append(signal_box)
+        
+        list_item.set_child(network_box)
+        
+    def on_network_item_bind(self, factory, list_item):
+        """Fill a recycled row with the network it now shows"""
+        item = list_item.get_item()
+        item.row = list_item.get_child()
+        self.fill_network_row(item.row, item.network)
+        
+    def on_network_item_unbind(self, factory, list_item):
+        """Stop updating a row that is being recycled"""
+        list_item.get_item().row = None
+        
+    def fill_network_row(self, row, network):
+        """Set a row's labels from a Network"""
+        info_box = row.get_first_child()
+        ssid_label = info_box.get_first_child()
+        ssid_label.set_text(network.ssid)
+        details = f"Security: {network.security}"
+        if network.bands:
+            details += f" · {', '.join(network.bands)}"
+        ssid_label.get_next_sibling().set_text(details)
+        signal_label = info_box.get_next_sibling().get_first_child()
+        signal_label.set_text(signal_bars(network.strength))
+        signal_label.get_next_sibling().set_text(f"{network.strength}%")
         
     def create_password_entry(self):
         """Create WiFi password entry"""
@@ -132,123 +281,71 @@ class WifiPage(BasePage):
         self.wifi_password.connect("activate", lambda x: self.on_connect_wifi(None))
         return self.wifi_password
         
-    def scan_networks(self):
-        """Simulate network scanning"""
-        # Clear existing networks
-        while True:
-            row = self.networks_listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.networks_listbox.remove(row)
-        
-        # Add loading indicator
-        loading_row = Gtk.ListBoxRow()
-        loading_label = Gtk.Label(label="🔄 Scanning for networks...")
-        loading_label.set_margin_start(12)
-        loading_label.set_margin_end(12)
-        loading_label.set_margin_top(12)
-        loading_label.set_margin_bottom(12)
-        loading_row.set_child(loading_label)
-        self.networks_listbox.append(loading_row)
-        
-        # Simulate scan delay
-        GLib.timeout_add_seconds(2, self.populate_networks)
-        
-    def populate_networks(self):
-        """Populate with mock network data"""
-        # Remove loading indicator
-        while True:
-            row = self.networks_listbox.get_row_at_index(0)
-            if row is None:
-                break
-            self.networks_listbox.remove(row)
-        
-        # Mock WiFi networks
-        networks = [
-            {"ssid": "HomeNetwork_5G", "signal": "▂▄▆█", "security": "WPA2", "strength": 85},
-            {"ssid": "CoffeeShop_WiFi", "signal": "▂▄▆▇", "security": "Open", "strength": 70},
-            {"ssid": "Neighbor_WiFi", "signal": "▂▄▇", "security": "WPA3", "strength": 60},
-            {"ssid": "Office_Guest", "signal": "▂▄", "security": "WPA2", "strength": 45},
-            {"ssid": "Mobile_Hotspot", "signal": "▂", "security": "WPA2", "strength": 30},
-        ]
-        
-        for network in networks:
-            row = Gtk.ListBoxRow()
-            row.set_margin_start(12)
-            row.set_margin_end(12)
-            row.set_margin_top(8)
-            row.set_margin_bottom(8)
-            
-            network_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-            network_box.set_spacing(12)
-            
-            # Network info
-            info_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            info_box.set_spacing(2)
-            
-            # SSID
-            ssid_label = Gtk.Label(label=network["ssid"])
-            ssid_label.set_halign(Gtk.Align.START)
-            ssid_label.add_css_class("page-subtitle")
-            info_box.append(ssid_label)
-            
-            # Security info
-            security_label = Gtk.Label(label=f"Security: {network['security']}")
-            security_label.set_halign(Gtk.Align.START)
-            security_label.add_css_class("info-text")
-            info_box.append(security_label)
-            
-            network_box.append(info_box)
-            
-            # Signal strength
-            signal_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
-            signal_box.set_valign(Gtk.Align.CENTER)
-            
-            signal_label = Gtk.Label(label=network["signal"])
-            signal_label.add_css_class("page-subtitle")
-            signal_box.append(signal_label)
-            
-            strength_label = Gtk.Label(label=f"{network['strength']}%")
-            strength_label.add_css_class("info-text")
-            signal_box.append(strength_label)
-            
-            network_box.append(signal_box)
-            
-            row.set_child(network_box)
-            row.network_info = network
-            self.networks_listbox.append(row)
-        
-        return False  # Don't repeat timeout
+    def on_scan_started(self):
+        """Show the scanning placeholder while the list is still empty"""
+        if not self.networks_store.get_n_items():
+            self.scanning_label.set_visible(True)
+        
+    def on_scan_finished(self, access_points, error):
+        """Show the access points found by a scan; return whether any changed"""
+        self.scanning_label.set_visible(False)
+        if error:
+            self.status_label.set_text(f"Scan failed: {error}")
+            return False
+        updates = self.aggregator.update(access_points)
+        self.apply_network_updates(updates)
+        return bool(updates)
+        
+    def apply_network_updates(self, updates):
+        """Insert, update or remove rows for {key: Network or None} in place"""
+        for key, network in sorted(updates.items()):
+            position = bisect.bisect_left(self.network_keys, key)
+            present = (position < len(self.network_keys)
+                       and self.network_keys[position] == key)
+            if network is None:
+                if present:
+                    del self.network_keys[position]
+                    self.networks_store.remove(position)
+            elif present:
+                item = self.networks_store.get_item(position)
+                item.network = network
+                if item.row is not None:
+                    self.fill_network_row(item.row, network)
+            else:
+                self.network_keys.insert(position, key)
+                self.networks_store.insert(position, NetworkItem(network))
         
     def on_wifi_toggled(self, switch, state):
         """Handle WiFi toggle"""
         if state:
-            self.scan_networks()
+            if self.scheduler is not None:
+                self.scheduler.start()
+                self.scheduler.request_scan()
             self.status_label.set_text("WiFi enabled, scanning...")
         else:
             # Clear networks list
-            while True:
-                row = self.networks_listbox.get_row_at_index(0)
-                if row is None:
-                    break
-                self.networks_listbox.remove(row)
+            if self.scheduler is not None:
+                self.scheduler.stop()
+            self.apply_network_updates(self.aggregator.reset())
+            self.scanning_label.set_visible(False)
             
             self.status_label.set_text("WiFi disabled")
             self.password_box.set_visible(False)
         
     def on_refresh_networks(self, button):
         """Handle refresh button click"""
-        if self.wifi_switch.get_active():
-            self.scan_networks()
+        if self.scheduler is not None and self.wifi_switch.get_active():
+            self.scheduler.request_scan()
             
-    def on_network_selected(self, listbox, row):
+    def on_network_selected(self, selection, param):
         """Handle network selection"""
-        if not row or not hasattr(row, 'network_info'):
+        item = selection.get_selected_item()
+        if item is None:
             return
             
-        network = row.network_info
+        network = item.network
         
-        if network["security"] == "Open":
+        if network.security == "Open":
             # Open network, connect immediately
             self.password_box.set_visible(False)
             self.connect_to_network(network, "")
@@ -260,14 +357,14 @@ class WifiPage(BasePage):
             
     def on_connect_wifi(self, button):
         """Handle connect button click"""
-        selected_row = self.networks_listbox.get_selected_row()
-        if not selected_row or not hasattr(selected_row, 'network_info'):
+        item = self.networks_selection.get_selected_item()
+        if item is None:
             return
             
-        network = selected_row.network_info
+        network = item.network
         password = self.wifi_password.get_text()
         
-        if network["security"] != "Open" and not password:
+        if network.security != "Open" and not password:
             self.show_error("Please enter the WiFi password.")
             return
             
@@ -275,27 +372,61 @@ class WifiPage(BasePage):
         
     def on_cancel_connection(self, button):
         """Handle cancel button click"""
+        if self.connect_cancellable is not None:
+            self.connect_cancellable.cancel()
+            self.connect_cancellable = None
+            self.connection_state = None
+            self.status_label.set_text("Not connected")
+            self.connect_btn.set_sensitive(True)
         self.password_box.set_visible(False)
-        self.networks_listbox.unselect_all()
+        self.networks_selection.unselect_all()
         
     def connect_to_network(self, network, password):
-        """Simulate network connection"""
-        self.status_label.set_text(f"Connecting to {network['ssid']}...")
+        """Start connecting; progress arrives in on_connection_state"""
+        if self.backend is None:
+            return
+        if self.connect_cancellable is not None:
+            self.connect_cancellable.cancel()
+        self.connect_cancellable = Gio.Cancellable()
+        self.connection_state = None
+        self.status_label.set_text(f"Connecting to {network.ssid}...")
         self.connect_btn.set_sensitive(False)
-        
-        # Simulate connection delay
-        GLib.timeout_add_seconds(3, self.on_connection_complete, network)
-        
-    def on_connection_complete(self, network):
-        """Handle connection completion"""
-        self.status_label.set_text(f"Connected to {network['ssid']}")
-        self.password_box.set_visible(False)
-        self.connect_btn.set_sensitive(True)
-        
-        # Enable continue button
-        self.continue_btn.set_sensitive(True)
-        
-        return False  # Don't repeat timeout
+        self.backend.activate(network, password, self.on_connection_state,
+                              self.connect_cancellable)
+        
+    def on_connection_state(self, connection_state):
+        """Show the progress of the connection attempt"""
+        self.connection_state = connection_state
+        self.status_label.set_text(STAGE_MESSAGES[connection_state.stage].format(
+            ssid=connection_state.ssid, reason=connection_state.reason))
+        if connection_state.stage == STAGE_CONNECTED:
+            self.connect_cancellable = None
+            self.password_box.set_visible(False)
+            self.connect_btn.set_sensitive(True)
+            self.continue_btn.set_sensitive(True)
+            # Rank the update mirrors for the install step
+            future = submit_check()
+            future.add_done_callback(
+                lambda future: GLib.idle_add(self.on_mirrors_checked, future, connection_state))
+        elif connection_state.stage == STAGE_FAILED:
+            self.connect_cancellable = None
+            self.connect_btn.set_sensitive(True)
+            if self.scheduler is not None:
+                self.scheduler.connection_failed()
+        
+    def on_mirrors_checked(self, future, connection_state):
+        """Keep the mirror ranking and say whether updates can be fetched"""
+        try:
+            ranking = future.result()
+        except OSError as e:
+            print(f"Warning: Could not check the update mirrors: {e}")
+            return False  # Don't repeat idle callback
+        self.state["mirrors"] = ranking
+        if connection_state is self.connection_state and not ranking.online:
+            self.status_label.set_text(
+                f"Connected to {connection_state.ssid}, but updates are unavailable: "
+                f"{ranking.reason}")
+        return False  # Don't repeat idle callback
         
     def show_error(self, message):
         """Show error dialog"""
@@ -311,11 +442,9 @@ class WifiPage(BasePage):
         
     def on_continue(self, button):
         """Handle continue button click"""
-        # Check if connected
-        status_text = self.status_label.get_text()
-        if "Connected to" in status_text:
-            network_name = status_text.replace("Connected to ", "")
-            print(f"Connected to WiFi: {network_name}")
+        connection_state = self.connection_state
+        if connection_state is not None and connection_state.stage == STAGE_CONNECTED:
+            print(f"Connected to WiFi: {connection_state.ssid}")
         else:
             print("Continuing without WiFi connection")
             
@@ -0,0 +1,111 @@
+"""
+Startup profiler for the installer
+
+Records monotonic timestamps for the phases of a cold start (GI import,
+page imports, CSS parsing, page construction, first frame) and writes
+them as a JSON report. Profiling is enabled with --profile-startup or by
+setting ZENOS_PROFILE_STARTUP to 1 or to the path of the report file.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENV_VAR = "ZENOS_PROFILE_STARTUP"
+PROFILE_FLAG = "--profile-startup"
+EXIT_FLAG = "--exit-after-first-frame"
+DEFAULT_REPORT_PATH = "startup-profile.json"
+
+
+def process_uptime():
+    """Return seconds since this process was started, or None if unknown"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces, so split after it
+            fields = f.read().rsplit(")", 1)[1].split()
+        start_ticks = int(fields[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfiler:
+    def __init__(self, argv=None, environ=None):
+        self.origin = time.monotonic()
+        self.origin_uptime = process_uptime()
+        argv = sys.argv if argv is None else argv
+        environ = os.environ if environ is None else environ
+
+        env_value = environ.get(ENV_VAR, "")
+        self.enabled = PROFILE_FLAG in argv or env_value not in ("", "0")
+        self.exit_after_first_frame = EXIT_FLAG in argv
+        if env_value not in ("", "0", "1"):
+            self.report_path = env_value
+        else:
+            self.report_path = DEFAULT_REPORT_PATH
+
+        self.events = []
+        self.report_written = False
+
+    def strip_args(self, argv):
+        """Return argv without the profiler's own command line flags"""
+        return [arg for arg in argv if arg not in (PROFILE_FLAG, EXIT_FLAG)]
+
+    def now(self):
+        """Seconds elapsed since the profiler was created"""
+        return time.monotonic() - self.origin
+
+    def mark(self, name):
+        """Record a point in time"""
+        if self.enabled:
+            self.events.append({"name": name, "t": self.now()})
+
+    @contextmanager
+    def span(self, name):
+        """Record the start time and duration of a block"""
+        if not self.enabled:
+            yield
+            return
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.events.append({"name": name, "t": start, "duration": self.now() - start})
+
+    def get_event(self, name):
+        """Return the first recorded event with the given name"""
+        for event in self.events:
+            if event["name"] == name:
+                return event
+        return None
+
+    def build_report(self):
+        """Build the JSON-serialisable report"""
+        first_frame = self.get_event("first-frame")
+        report = {
+            "interpreter_startup": self.origin_uptime,
+            "time_to_first_frame": first_frame["t"] if first_frame else None,
+            "events": self.events,
+        }
+        try:
+            import resource
+            report["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            pass
+        return report
+
+    def write_report(self):
+        """Write the report once; later calls are ignored"""
+        if not self.enabled or self.report_written:
+            return
+        self.report_written = True
+        try:
+            with open(self.report_path, "w") as f:
+                json.dump(self.build_report(), f, indent=2)
+        except OSError as e:
+            print(f"Warning: Could not write startup profile: {e}")
+
+
+profiler = StartupProfiler()
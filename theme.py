@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Theme build step for style.css
+
+Validates the stylesheet, drops rules whose selectors reference CSS classes
+that no widget uses (found by scanning add_css_class calls in the sources)
+and declarations GTK does not support, and minifies the result. The built
+theme is cached keyed by a hash of its inputs, and the classes found in the
+sources are cached keyed by their paths, sizes and mtimes, so launches
+after the first read style.css and stat the sources, then load the theme.
+
+Run directly to write a prebuilt theme for the live image:
+
+    python3 theme.py --output style.min.css
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+
+from backend import cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STYLE_PATH = os.path.join(BASE_DIR, "style.css")
+PREBUILT_PATH = os.path.join(BASE_DIR, "style.min.css")
+SOURCE_PATTERNS = ["main.py", "pages/*.py"]
+
+# Bump when the build output changes for identical inputs
+THEME_VERSION = 1
+
+# Properties understood by GTK 4's CSS engine; -gtk-* and custom
+# properties are accepted as well
+GTK_PROPERTIES = frozenset([
+    "all", "animation", "animation-delay", "animation-direction",
+    "animation-duration", "animation-fill-mode", "animation-iteration-count",
+    "animation-name", "animation-play-state", "animation-timing-function",
+    "background", "background-blend-mode", "background-clip",
+    "background-color", "background-image", "background-origin",
+    "background-position", "background-repeat", "background-size",
+    "border", "border-bottom", "border-bottom-color",
+    "border-bottom-left-radius", "border-bottom-right-radius",
+    "border-bottom-style", "border-bottom-width", "border-color",
+    "border-image", "border-image-repeat", "border-image-slice",
+    "border-image-source", "border-image-width", "border-left",
+    "border-left-color", "border-left-style", "border-left-width",
+    "border-radius", "border-right", "border-right-color",
+    "border-right-style", "border-right-width", "border-spacing",
+    "border-style", "border-top", "border-top-color",
+    "border-top-left-radius", "border-top-right-radius", "border-top-style",
+    "border-top-width", "border-width", "box-shadow", "caret-color", "color",
+    "filter", "font", "font-family", "font-feature-settings", "font-kerning",
+    "font-size", "font-stretch", "font-style", "font-variant",
+    "font-variant-alternates", "font-variant-caps", "font-variant-east-asian",
+    "font-variant-ligatures", "font-variant-numeric", "font-variant-position",
+    "font-variation-settings", "font-weight", "letter-spacing", "line-height",
+    "margin", "margin-bottom", "margin-left", "margin-right", "margin-top",
+    "min-height", "min-width", "opacity", "outline", "outline-color",
+    "outline-offset", "outline-style", "outline-width", "padding",
+    "padding-bottom", "padding-left", "padding-right", "padding-top",
+    "text-decoration", "text-decoration-color", "text-decoration-line",
+    "text-decoration-style", "text-shadow", "text-transform", "transform",
+    "transform-origin", "transition", "transition-delay",
+    "transition-duration", "transition-property",
+    "transition-timing-function",
+])
+
+CSS_CLASS_CALL_RE = re.compile(r"""add_css_class\(\s*["']([\w-]+)["']""")
+CSS_CLASSES_KWARG_RE = re.compile(r"css_classes\s*=\s*\[([^\]]*)\]")
+STRING_RE = re.compile(r"""["']([\w-]+)["']""")
+SELECTOR_CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+WHITESPACE_RE = re.compile(r"\s+")
+COMBINATOR_RE = re.compile(r"\s*([>+~,])\s*")
+
+
+class ThemeError(Exception):
+    """Raised when style.css cannot be parsed"""
+    pass
+
+
+def source_paths(base_dir=BASE_DIR, patterns=SOURCE_PATTERNS):
+    """Return the sources that may assign CSS classes, in a stable order"""
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(os.path.join(base_dir, pattern))))
+    return paths
+
+
+def collect_used_classes(base_dir=BASE_DIR, patterns=SOURCE_PATTERNS):
+    """Return the set of CSS class names assigned anywhere in the sources"""
+    used = set()
+    for path in source_paths(base_dir, patterns):
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        used.update(CSS_CLASS_CALL_RE.findall(source))
+        for names in CSS_CLASSES_KWARG_RE.findall(source):
+            used.update(STRING_RE.findall(names))
+    return used
+
+
+def load_used_classes(base_dir=BASE_DIR, patterns=SOURCE_PATTERNS):
+    """Return the used CSS classes, rescanning the sources only if one changed"""
+    key = [THEME_VERSION, cache.source_key(*source_paths(base_dir, patterns))]
+    names = cache.load("theme-classes", key)
+    if names is not None:
+        return set(names)
+    used = collect_used_classes(base_dir, patterns)
+    cache.store("theme-classes", key, sorted(used))
+    return used
+
+
+def split_top_level(text, separator):
+    """Split text on separator, ignoring separators nested in parentheses"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse_blocks(css, line_offset=1):
+    """Parse css into a list of (prelude, body, line) tuples
+
+    Statements without a block (such as @define-color) have a body of None.
+    """
+    blocks = []
+    depth = 0
+    start = 0
+    body_start = None
+    line = line_offset
+    prelude_line = line
+    for i, char in enumerate(css):
+        if char == "\n":
+            line += 1
+        elif char == "{":
+            if depth == 0:
+                body_start = i + 1
+                prelude_line = line - css[start:i].lstrip().count("\n")
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                raise ThemeError(f"line {line}: unexpected '}}'")
+            if depth == 0:
+                prelude = css[start:body_start - 1].strip()
+                if not prelude:
+                    raise ThemeError(f"line {prelude_line}: block without a selector")
+                blocks.append((prelude, css[body_start:i], prelude_line))
+                start = i + 1
+        elif char == ";" and depth == 0:
+            statement = css[start:i].strip()
+            if statement:
+                blocks.append((statement, None, line))
+            start = i + 1
+    if depth != 0:
+        raise ThemeError(f"line {line}: unterminated block")
+    if css[start:].strip():
+        raise ThemeError(f"line {line}: unexpected trailing text")
+    return blocks
+
+
+def minify_selector(selector):
+    """Collapse whitespace in a selector"""
+    selector = WHITESPACE_RE.sub(" ", selector.strip())
+    return COMBINATOR_RE.sub(r"\1", selector)
+
+
+def build_rule(prelude, body, line, used_classes, warnings):
+    """Return the minified rule, or None if nothing in it is needed"""
+    selectors = []
+    for selector in split_top_level(prelude, ","):
+        selector = minify_selector(selector)
+        if not selector:
+            raise ThemeError(f"line {line}: empty selector in '{prelude}'")
+        if all(name in used_classes for name in SELECTOR_CLASS_RE.findall(selector)):
+            selectors.append(selector)
+    if not selectors:
+        return None
+
+    declarations = []
+    for declaration in split_top_level(body, ";"):
+        declaration = declaration.strip()
+        if not declaration:
+            continue
+        if ":" not in declaration:
+            raise ThemeError(f"line {line}: malformed declaration '{declaration}'")
+        name, value = declaration.split(":", 1)
+        name = name.strip().lower()
+        value = WHITESPACE_RE.sub(" ", value.strip())
+        if not value:
+            raise ThemeError(f"line {line}: property '{name}' has no value")
+        if name not in GTK_PROPERTIES and not name.startswith(("-gtk-", "--")):
+            warnings.append(f"line {line}: dropping unsupported property '{name}'")
+            continue
+        declarations.append(f"{name}:{value}")
+    if not declarations:
+        return None
+
+    return ",".join(selectors) + "{" + ";".join(declarations) + "}"
+
+
+def build_blocks(blocks, used_classes, warnings):
+    """Build the minified output for a list of parsed blocks"""
+    output = []
+    for prelude, body, line in blocks:
+        if body is None:
+            output.append(WHITESPACE_RE.sub(" ", prelude) + ";")
+        elif prelude.startswith("@media"):
+            if "prefers-" not in prelude:
+                warnings.append(f"line {line}: dropping unsupported '{WHITESPACE_RE.sub(' ', prelude)}'")
+                continue
+            inner = build_blocks(parse_blocks(body, line), used_classes, warnings)
+            if inner:
+                output.append(WHITESPACE_RE.sub(" ", prelude) + "{" + inner + "}")
+        elif prelude.startswith("@"):
+            output.append(WHITESPACE_RE.sub(" ", prelude) + "{" + WHITESPACE_RE.sub(" ", body.strip()) + "}")
+        else:
+            rule = build_rule(prelude, body, line, used_classes, warnings)
+            if rule:
+                output.append(rule)
+    return "".join(output)
+
+
+def build_theme(css, used_classes):
+    """Validate and minify css; returns (theme text, list of warnings)"""
+    # Blank out comments while keeping line numbers intact
+    css = COMMENT_RE.sub(lambda m: "\n" * m.group().count("\n"), css)
+    warnings = []
+    theme = build_blocks(parse_blocks(css), used_classes, warnings)
+    return theme, warnings
+
+
+def theme_key(css, used_classes):
+    """Hash of everything the built theme depends on"""
+    digest = hashlib.sha256()
+    digest.update(f"{THEME_VERSION}\n".encode())
+    digest.update(css.encode("utf-8"))
+    digest.update("\n".join(sorted(used_classes)).encode())
+    return digest.hexdigest()[:32]
+
+
+def theme_header(key):
+    return f"/* zenos-theme {key} */\n"
+
+
+def read_if_current(path, header):
+    """Return the theme stored at path if it was built for header"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.readline() == header.rstrip("\n") + "\n":
+                return f.read()
+    except OSError:
+        pass
+    return None
+
+
+def write_theme(path, header, theme):
+    """Atomically write a built theme"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(header)
+        f.write(theme)
+    os.replace(tmp_path, path)
+
+
+def load_theme(style_path=STYLE_PATH):
+    """Return the built theme for style_path, building and caching it if needed"""
+    with open(style_path, encoding="utf-8") as f:
+        css = f.read()
+    used_classes = load_used_classes()
+    key = theme_key(css, used_classes)
+    header = theme_header(key)
+
+    # A prebuilt theme shipped next to style.css wins if it is current
+    theme = read_if_current(PREBUILT_PATH, header)
+    if theme is not None:
+        return theme
+
+    cache_path = os.path.join(cache.cache_dir(), f"theme-{key}.css")
+    theme = read_if_current(cache_path, header)
+    if theme is not None:
+        return theme
+
+    theme, warnings = build_theme(css, used_classes)
+    for warning in warnings:
+        print(f"Warning: style.css {warning}")
+    try:
+        write_theme(cache_path, header, theme)
+    except OSError as e:
+        print(f"Warning: Could not cache theme: {e}")
+    return theme
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and minify style.css")
+    parser.add_argument("-o", "--output", default=PREBUILT_PATH, help="where to write the built theme")
+    parser.add_argument("--style", default=STYLE_PATH, help="stylesheet to build")
+    args = parser.parse_args()
+
+    with open(args.style, encoding="utf-8") as f:
+        css = f.read()
+    used_classes = collect_used_classes()
+    try:
+        theme, warnings = build_theme(css, used_classes)
+    except ThemeError as e:
+        sys.exit(f"{args.style}: {e}")
+    for warning in warnings:
+        print(f"{args.style}: {warning}")
+    write_theme(os.path.abspath(args.output), theme_header(theme_key(css, used_classes)), theme)
+    print(f"Wrote {args.output}: {len(css)} -> {len(theme)} bytes")
+
+
+if __name__ == "__main__":
+    main()